@@ -1,10 +1,60 @@
 from django.contrib import admin
-from .models import Order
+from .models import FlashSale, Order, OrderItem
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    raw_id_fields = ('product',)
+    readonly_fields = ('unit_price',)
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'buyer', 'product', 'quantity', 'total_price', 'status', 'created_at')
-    list_filter = ('status', 'created_at', 'product__shop')
-    search_fields = ('buyer__username', 'product__name')
+    list_display = ('id', 'buyer', 'shop', 'product', 'quantity', 'total_price', 'status', 'created_at')
+    list_filter = ('status', 'created_at', 'shop')
+    list_select_related = ('buyer', 'shop', 'product')
+    raw_id_fields = ('buyer', 'shop', 'product')
+    search_fields = ('buyer__username', 'product__name', 'items__product__name')
     ordering = ('-created_at',)
     readonly_fields = ('total_price', 'created_at', 'updated_at')
+    inlines = [OrderItemInline]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'status' in form.changed_data:
+            from .analytics import record_status_change
+            record_status_change({obj.pk: form.initial['status']}, obj.status)
+
+    def save_related(self, request, form, formsets, change):
+        # Runs after save_model, so the rollup already holds the old lines under the new status
+        from .analytics import record_item_changes, record_new_orders
+        order = form.instance
+        if not change:
+            super().save_related(request, form, formsets, change)
+            record_new_orders([(order, order.items.all())])
+            return
+        before = list(order.items.all())
+        super().save_related(request, form, formsets, change)
+        record_item_changes(order, before, order.items.all())
+
+
+@admin.register(FlashSale)
+class FlashSaleAdmin(admin.ModelAdmin):
+    list_display = ('product', 'is_active', 'created_at', 'updated_at')
+    list_filter = ('is_active',)
+    search_fields = ('product__name',)
+    # Toggling goes through the actions so the cache counter and claim log stay in step
+    readonly_fields = ('product', 'is_active', 'created_at', 'updated_at')
+    actions = ['end_sales']
+
+    def has_add_permission(self, request):
+        # Sales are started from the API so the counter is loaded with the product's stock
+        return False
+
+    @admin.action(description='End selected flash sales')
+    def end_sales(self, request, queryset):
+        from .flash_sale import end_flash_sale
+        for sale in queryset.select_related('product'):
+            end_flash_sale(sale.product)
+        self.message_user(request, f'Ended {queryset.count()} flash sales.')
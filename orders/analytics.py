@@ -0,0 +1,276 @@
+"""
+Seller sales analytics over DailySalesRollup.
+
+Writes add signed deltas to the rollup rows of the affected (shop, product, day, status)
+keys. A placed order adds to its current status; a status change subtracts from the old
+status and adds to the new one; a deleted order or an edited line subtracts what it added.
+order_count counts order lines per product, so summing it across products counts an order
+once per product it contains. Every batch costs one INSERT OR IGNORE for missing keys and
+one conditional UPDATE, however many keys it touches. The dashboard reads at most two
+periods of rollup rows and does the series work in NumPy.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySalesRollup, OrderItem
+
+# Statuses that count as sales; cancelled orders stay in the rollup but not in the totals
+SALES_STATUSES = ['pending', 'confirmed', 'shipped', 'delivered']
+ANALYTICS_RANGES = (90, 365)
+MOVING_AVERAGE_WINDOWS = (7, 28)
+
+REVENUE = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _zero():
+    return [0, 0, Decimal('0')]
+
+
+def add_order_sales(deltas, order_items, sign=1, status=None):
+    """
+    Accumulate rollup deltas for (order, items) pairs; status overrides the order's own.
+    Returns deltas, a dict keyed by (shop_id, product_id, day, status).
+    """
+    for order, items in order_items:
+        day = timezone.localdate(order.created_at)
+        for item in items:
+            row = deltas[(order.shop_id, item.product_id, day, status or order.status)]
+            row[0] += sign
+            row[1] += sign * item.quantity
+            row[2] += sign * item.quantity * item.unit_price
+    return deltas
+
+
+def apply_sales_deltas(deltas, create_missing=True):
+    """
+    Add the accumulated deltas to the rollup rows, creating missing rows first unless
+    create_missing is False (a delete may be cascading from the row's shop or product).
+    """
+    deltas = {key: row for key, row in deltas.items() if any(row)}
+    if not deltas:
+        return
+    keys = sorted(deltas)
+    if create_missing:
+        DailySalesRollup.objects.bulk_create([
+            DailySalesRollup(shop_id=shop_id, product_id=product_id, day=day, status=status)
+            for shop_id, product_id, day, status in keys
+        ], ignore_conflicts=True)
+
+    conditions = [
+        Q(shop_id=shop_id, product_id=product_id, day=day, status=status)
+        for shop_id, product_id, day, status in keys
+    ]
+
+    def increment(index, output_field):
+        return Case(
+            *[When(condition, then=Value(deltas[key][index])) for key, condition in zip(keys, conditions)],
+            default=Value(0),
+            output_field=output_field
+        )
+
+    DailySalesRollup.objects.filter(reduce(or_, conditions)).update(
+        order_count=F('order_count') + increment(0, IntegerField()),
+        units=F('units') + increment(1, IntegerField()),
+        revenue=F('revenue') + increment(2, REVENUE),
+    )
+
+
+def record_new_orders(order_items):
+    """Roll up freshly placed orders, given as (order, items) pairs"""
+    apply_sales_deltas(add_order_sales(defaultdict(_zero), order_items))
+
+
+def record_deleted_orders(order_items):
+    """Take deleted orders, given as (order, items) pairs, back out of the rollup"""
+    apply_sales_deltas(add_order_sales(defaultdict(_zero), order_items, sign=-1), create_missing=False)
+
+
+def record_item_changes(order, before, after):
+    """Replace an order's old lines with its edited ones in the rollup, under its current status"""
+    deltas = add_order_sales(defaultdict(_zero), [(order, before)], sign=-1)
+    apply_sales_deltas(add_order_sales(deltas, [(order, after)]))
+
+
+def record_status_change(previous_statuses, new_status, order_items=None):
+    """
+    Move orders' sales from their previous status to new_status.
+    previous_statuses maps order id to the status the caller's conditional update replaced;
+    call it in the same transaction as that update. Pass order_items, (order, items) pairs,
+    when the lines are already loaded.
+    """
+    moved = {order_id: status for order_id, status in previous_statuses.items() if status != new_status}
+    if not moved:
+        return
+    if order_items is None:
+        rows = OrderItem.objects.filter(order_id__in=list(moved)).values_list(
+            'order_id', 'order__shop_id', 'product_id', 'order__created_at', 'quantity', 'unit_price'
+        )
+    else:
+        rows = [
+            (order.pk, order.shop_id, item.product_id, order.created_at, item.quantity, item.unit_price)
+            for order, items in order_items if order.pk in moved
+            for item in items
+        ]
+
+    deltas = defaultdict(_zero)
+    for order_id, shop_id, product_id, created_at, quantity, unit_price in rows:
+        day = timezone.localdate(created_at)
+        for key_status, sign in ((moved[order_id], -1), (new_status, 1)):
+            row = deltas[(shop_id, product_id, day, key_status)]
+            row[0] += sign
+            row[1] += sign * quantity
+            row[2] += sign * quantity * unit_price
+    apply_sales_deltas(deltas)
+
+
+def rebuild_rollups(shop_ids=None, batch_size=2000):
+    """Regenerate rollup rows from order history, for some shops or all; returns rows written"""
+    items = OrderItem.objects.all()
+    rollups = DailySalesRollup.objects.all()
+    if shop_ids:
+        items = items.filter(order__shop_id__in=shop_ids)
+        rollups = rollups.filter(shop_id__in=shop_ids)
+    rows = items.annotate(day=TruncDate('order__created_at')).values(
+        'order__shop_id', 'product_id', 'day', 'order__status'
+    ).annotate(
+        order_count=Count('order_id', distinct=True),
+        total_units=Sum('quantity'),
+        total_revenue=Sum(F('quantity') * F('unit_price'), output_field=REVENUE),
+    ).order_by()
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(DailySalesRollup(
+                shop_id=row['order__shop_id'],
+                product_id=row['product_id'],
+                day=row['day'],
+                status=row['order__status'],
+                order_count=row['order_count'],
+                units=row['total_units'],
+                revenue=row['total_revenue'],
+            ))
+            if len(batch) >= batch_size:
+                DailySalesRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        DailySalesRollup.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def moving_average(values, window):
+    """Trailing mean; values carries window - 1 leading days before the first output day"""
+    sums = np.cumsum(values, dtype=float)
+    sums[window:] = sums[window:] - sums[:-window]
+    return sums[window - 1:] / window
+
+
+def _change(current, previous):
+    """Percentage change per element, None where the previous period had nothing"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.round((current - previous) / previous * 100, 1)
+    return [None if prev == 0 else float(value) for value, prev in zip(change, previous)]
+
+
+def sales_summary(shop_id, days, statuses=SALES_STATUSES, today=None, top_products=20):
+    """
+    Totals, daily series with moving averages and per-product figures for the last `days`
+    days, each compared with the `days` before them. Reads the rollup only.
+    Totals and the daily series report order_lines, not orders: an order of three products
+    counts three. Per product, orders is the number of orders containing it.
+    """
+    from products.models import Product
+
+    today = today or timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    previous_start = start - timedelta(days=days)
+
+    rows = list(
+        DailySalesRollup.objects.filter(
+            shop_id=shop_id, status__in=statuses, day__gte=previous_start, day__lte=today
+        ).values_list('day', 'product_id').annotate(
+            orders=Sum('order_count'), total_units=Sum('units'), total_revenue=Sum('revenue')
+        ).order_by()
+    )
+
+    span = 2 * days
+    offsets = np.array([(row[0] - previous_start).days for row in rows], dtype=np.int64)
+    product_ids = np.array([row[1] for row in rows], dtype=np.int64)
+    # metrics[0] orders, [1] units, [2] revenue; one column per rollup row
+    metrics = np.array([[row[2], row[3], float(row[4])] for row in rows], dtype=float).reshape(-1, 3).T
+
+    daily = np.vstack([np.bincount(offsets, weights=metric, minlength=span) for metric in metrics])
+    current, previous = daily[:, days:], daily[:, :days]
+    current_totals, previous_totals = current.sum(axis=1), previous.sum(axis=1)
+
+    averages = {
+        window: (moving_average(daily[1, days - window + 1:], window), moving_average(daily[2, days - window + 1:], window))
+        for window in MOVING_AVERAGE_WINDOWS
+    }
+    series = []
+    for index in range(days):
+        point = {
+            'date': start + timedelta(days=index),
+            'order_lines': int(current[0, index]),
+            'units': int(current[1, index]),
+            'revenue': round(float(current[2, index]), 2),
+        }
+        for window, (units_average, revenue_average) in averages.items():
+            point[f'units_ma{window}'] = round(float(units_average[index]), 2)
+            point[f'revenue_ma{window}'] = round(float(revenue_average[index]), 2)
+        series.append(point)
+
+    products = []
+    if rows:
+        unique_ids, slots = np.unique(product_ids, return_inverse=True)
+        in_current = offsets >= days
+        by_product = {
+            period: np.vstack([
+                np.bincount(slots[mask], weights=metric[mask], minlength=len(unique_ids)) for metric in metrics
+            ])
+            for period, mask in (('current', in_current), ('previous', ~in_current))
+        }
+        ranked = np.argsort(-by_product['current'][2], kind='stable')[:top_products]
+        revenue_change = _change(by_product['current'][2][ranked], by_product['previous'][2][ranked])
+        names = dict(Product.objects.filter(pk__in=unique_ids[ranked].tolist()).values_list('id', 'name'))
+        for position, slot in enumerate(ranked):
+            product_id = int(unique_ids[slot])
+            products.append({
+                'product': product_id,
+                'name': names.get(product_id),
+                'orders': int(by_product['current'][0][slot]),
+                'units': int(by_product['current'][1][slot]),
+                'revenue': round(float(by_product['current'][2][slot]), 2),
+                'previous_revenue': round(float(by_product['previous'][2][slot]), 2),
+                'revenue_change_pct': revenue_change[position],
+            })
+
+    labels = ['order_lines', 'units', 'revenue']
+
+    def totals(values):
+        return {'order_lines': int(values[0]), 'units': int(values[1]), 'revenue': round(float(values[2]), 2)}
+
+    return {
+        'shop': shop_id,
+        'range_days': days,
+        'start': start,
+        'end': today,
+        'statuses': list(statuses),
+        'totals': totals(current_totals),
+        'previous_totals': totals(previous_totals),
+        'change_pct': dict(zip(labels, _change(current_totals, previous_totals))),
+        'daily': series,
+        'products': products,
+    }
@@ -0,0 +1,93 @@
+"""
+Multi-item checkout.
+
+The cart is validated against a single product query. Stock for every line is then taken in
+product id order inside one transaction, and the cart becomes one order per shop. Its items,
+reservations and seller notifications are written with bulk_create, and the sales rollup
+is updated in the same transaction.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import record_new_orders
+from .models import Order, OrderItem, SellerNotification, StockReservation
+from .notifications import create_notifications
+from .reservations import take_stock_many
+
+MAX_CHECKOUT_LINES = 100
+
+
+def merge_lines(lines):
+    """Map product id to total quantity, summing repeated lines in first-seen order"""
+    quantities = {}
+    for line in lines:
+        quantities[line['product']] = quantities.get(line['product'], 0) + line['quantity']
+    return quantities
+
+
+def _notification(order, buyer, lines):
+    if len(lines) == 1:
+        title = f'New Order for {lines[0][0].name}'
+    else:
+        title = f'New Order #{order.pk} - {len(lines)} items'
+    summary = ', '.join(f'{quantity} x {product.name}' for product, quantity in lines)
+    return SellerNotification(
+        seller_id=lines[0][0].shop.owner_id,
+        order=order,
+        notification_type='new_order',
+        title=title,
+        message=f'You have received a new order from {buyer.username}: {summary}. Contact: {order.buyer_phone}'
+    )
+
+
+def place_orders(buyer, products, quantities, buyer_phone='', buyer_message=''):
+    """
+    Place a cart as one order per shop.
+    products maps product id to Product (shop loaded), quantities maps product id to units.
+    Raises InsufficientStock, leaving nothing written.
+    """
+    now = timezone.now()
+    by_shop = defaultdict(list)
+    for product_id, quantity in quantities.items():
+        product = products[product_id]
+        by_shop[product.shop_id].append((product, quantity))
+    shop_lines = [by_shop[shop_id] for shop_id in sorted(by_shop)]
+
+    with transaction.atomic():
+        take_stock_many(quantities)
+
+        orders = Order.objects.bulk_create([
+            Order(
+                buyer=buyer,
+                shop=lines[0][0].shop,
+                product=lines[0][0] if len(lines) == 1 else None,
+                quantity=sum(quantity for _, quantity in lines),
+                total_price=sum(product.price * quantity for product, quantity in lines),
+                buyer_phone=buyer_phone,
+                buyer_message=buyer_message,
+                seller_notified=True,
+                notification_sent_at=now,
+            )
+            for lines in shop_lines
+        ])
+
+        for order, lines in zip(orders, shop_lines):
+            # Prime the prefetch cache so rendering the orders needs no further queries
+            order._prefetched_objects_cache = {'items': [
+                OrderItem(order=order, product=product, quantity=quantity, unit_price=product.price)
+                for product, quantity in lines
+            ]}
+        OrderItem.objects.bulk_create([item for order in orders for item in order._prefetched_objects_cache['items']])
+        StockReservation.objects.bulk_create([
+            StockReservation(order=order, product=product, quantity=quantity, status='committed')
+            for order, lines in zip(orders, shop_lines)
+            for product, quantity in lines
+        ])
+        create_notifications([
+            _notification(order, buyer, lines) for order, lines in zip(orders, shop_lines)
+        ])
+        record_new_orders((order, order._prefetched_objects_cache['items']) for order in orders)
+
+    return orders
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .flash_sale import LOCAL_CACHE_BACKENDS, cache_is_supported
+
+
+@register(Tags.caches)
+def check_flash_sale_cache(app_configs, **kwargs):
+    """The flash_sale cache can hold stock counters for every process that takes orders"""
+    backend = settings.CACHES['flash_sale']['BACKEND']
+    if backend in LOCAL_CACHE_BACKENDS:
+        return [Warning(
+            'Flash-sale counters and claims are in local memory: each process sells the full stock '
+            'and claims not yet flushed are lost on restart',
+            hint='Fine for a single process such as runserver; set FLASH_SALE_CACHE_BACKEND to Redis in production',
+            id='orders.W001',
+        )]
+    if not cache_is_supported():
+        return [Warning(
+            f'Flash sales cannot start on {backend}',
+            hint='Set FLASH_SALE_CACHE_BACKEND to Redis, or to local memory for a single process',
+            id='orders.W002',
+        )]
+    return []
@@ -0,0 +1,413 @@
+"""
+Flash-sale ("hot item") checkout.
+
+Stock for a product on flash sale lives in a cache counter that checkouts claim with an
+atomic decr, so they never queue on the product row. Every claim is appended to a log in
+the cache (``flash:claim:<seq>``) and a flusher turns batches of claims into Order,
+StockReservation and SellerNotification rows plus one stock decrement per product. How far
+the log has been written is kept in the database (FlashSaleLog), in the same transaction as
+each batch, so a flusher that dies before cleaning up the cache never writes a batch twice.
+
+Stock that leaves or returns to the database any other way (inquiry holds, cancellations,
+admin and import edits) goes through take_from_counters/adjust_counters, so the counter stays
+database stock minus unflushed claims.
+
+The "flash_sale" cache must never evict and needs atomic incr/decr. In production it must
+also be shared by every process and survive a restart: Redis with persistence and no eviction
+policy, with `manage.py flush_flash_sales --loop` as the flusher. Local memory works for a
+single process (runserver, benchmarks); the flusher then runs as a thread in that process
+(ensure_flusher), and the system check orders.W001 warns. Sales do not start on any other
+backend, and checkouts of products already on sale then go through the database. A cold
+counter is rebuilt from the database stock minus claims not flushed yet, which is also what
+`--reconcile` does.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from weshop.cache import invalidate_catalog
+
+from .analytics import record_new_orders
+from .models import FlashSale, FlashSaleLog, Order, OrderItem, SellerNotification, StockReservation
+from .notifications import create_notifications
+from .reservations import InsufficientStock
+
+logger = logging.getLogger(__name__)
+
+SEQUENCE_KEY = 'flash:seq'
+FLUSH_LOCK_KEY = 'flash:flush-lock'
+ACTIVE_KEY = 'flash:active'
+ACTIVE_TIMEOUT = 5
+# A claim number taken but never written (its worker died) is skipped after this long
+GAP_TIMEOUT = 10
+# What flush_claims returns when every logged claim has been written
+DRAINED = 'drained'
+# Backends one counter can live in for every process
+SHARED_CACHE_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django_redis.cache.RedisCache',
+)
+# Per process and lost on restart: a single-process stand-in with an in-process flusher
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+_flusher = None
+_flusher_lock = threading.Lock()
+_gaps = {}
+
+
+class FlashSaleUnavailable(Exception):
+    """The flash_sale cache cannot hold counters (no atomic incr/decr, or it evicts)"""
+
+
+def _cache():
+    return caches['flash_sale']
+
+
+def cache_is_shared():
+    return settings.CACHES['flash_sale']['BACKEND'] in SHARED_CACHE_BACKENDS
+
+
+def cache_is_supported():
+    return cache_is_shared() or settings.CACHES['flash_sale']['BACKEND'] in LOCAL_CACHE_BACKENDS
+
+
+def counter_key(product_id):
+    return f'flash:stock:{product_id}'
+
+
+def claim_key(seq):
+    return f'flash:claim:{seq}'
+
+
+def active_flash_sale_ids():
+    """Ids of products on flash sale, cached for a few seconds; none on an unsupported cache"""
+    if not cache_is_supported():
+        return set()
+    cache = _cache()
+    ids = cache.get(ACTIVE_KEY)
+    if ids is None:
+        ids = set(FlashSale.objects.filter(is_active=True).values_list('product_id', flat=True))
+        cache.set(ACTIVE_KEY, ids, ACTIVE_TIMEOUT)
+    return ids
+
+
+def _flushed_seq():
+    return FlashSaleLog.objects.values_list('flushed_seq', flat=True).first() or 0
+
+
+def _pending_claims():
+    cache = _cache()
+    flushed = _flushed_seq()
+    head = cache.get(SEQUENCE_KEY, 0)
+    if head <= flushed:
+        return []
+    return list(cache.get_many([claim_key(seq) for seq in range(flushed + 1, head + 1)]).values())
+
+
+def reconcile_counter(product_id, force=False):
+    """Set the counter to database stock minus claims still waiting to be flushed"""
+    from products.models import Product
+
+    stock = Product.objects.filter(pk=product_id).values_list('stock_quantity', flat=True).first() or 0
+    pending = sum(claim['quantity'] for claim in _pending_claims() if claim['product_id'] == product_id)
+    available = max(stock - pending, 0)
+    cache = _cache()
+    if force:
+        cache.set(counter_key(product_id), available, timeout=None)
+    else:
+        cache.add(counter_key(product_id), available, timeout=None)
+    return available
+
+
+def _take_from_counter(product_id, quantity):
+    cache = _cache()
+    key = counter_key(product_id)
+    try:
+        remaining = cache.decr(key, quantity)
+    except ValueError:
+        reconcile_counter(product_id)
+        remaining = cache.decr(key, quantity)
+    if remaining < 0:
+        cache.incr(key, quantity)
+        return False
+    return True
+
+
+def give_back_to_counters(quantities):
+    """Add signed amounts to the counters that exist; a missing one is rebuilt from the database"""
+    cache = _cache()
+    for product_id, quantity in quantities.items():
+        try:
+            cache.incr(counter_key(product_id), quantity)
+        except ValueError:
+            pass
+
+
+def take_from_counters(quantities):
+    """
+    Take stock that is about to leave the database outside a claim (an inquiry hold, a
+    checkout) off the counters of products on flash sale, so no claim sells it again.
+    quantities maps product id to amount; returns what was taken, to give back if the database
+    update fails. Raises InsufficientStock, taking nothing, when a counter is short.
+    Units taken by a transaction that later rolls back stay off the counter (undersold, never
+    oversold) until `flush_flash_sales --reconcile`.
+    """
+    on_sale = active_flash_sale_ids()
+    taken = {}
+    for product_id, quantity in sorted(quantities.items()):
+        if product_id not in on_sale:
+            continue
+        if not _take_from_counter(product_id, quantity):
+            give_back_to_counters(taken)
+            raise InsufficientStock(f'Insufficient stock for product {product_id}', product_id=product_id)
+        taken[product_id] = quantity
+    return taken
+
+
+def adjust_counters(deltas):
+    """
+    Carry database stock changes made outside the claim log (stock given back, admin and
+    import edits) to the counters of products on flash sale once the transaction commits.
+    deltas maps product id to a signed amount.
+    """
+    on_sale = active_flash_sale_ids()
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta and product_id in on_sale}
+    if deltas:
+        transaction.on_commit(lambda: give_back_to_counters(deltas))
+
+
+def claim(product, quantity, buyer, buyer_phone='', buyer_message=''):
+    """
+    Atomically claim quantity units of a flash-sale product for buyer.
+    Returns the claim number; raises InsufficientStock when the counter runs out.
+    """
+    cache = _cache()
+    if not _take_from_counter(product.pk, quantity):
+        raise InsufficientStock(f'Insufficient stock for product {product.pk}', product_id=product.pk)
+
+    try:
+        seq = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        # A cold cache numbers on from the last flushed claim, never reusing a written number
+        cache.add(SEQUENCE_KEY, _flushed_seq(), timeout=None)
+        seq = cache.incr(SEQUENCE_KEY)
+    cache.set(claim_key(seq), {
+        'seq': seq,
+        'product_id': product.pk,
+        'quantity': quantity,
+        'buyer_id': buyer.pk,
+        'buyer_phone': buyer_phone,
+        'buyer_message': buyer_message,
+        'claimed_at': timezone.now(),
+    }, timeout=None)
+    return seq
+
+
+def _next_batch(flushed, batch_size):
+    """
+    Contiguous run of logged claims after the flushed seq, the seq it ends at and the last
+    claim number handed out
+    """
+    cache = _cache()
+    newest = cache.get(SEQUENCE_KEY, 0)
+    head = min(newest, flushed + batch_size)
+    found = cache.get_many([claim_key(seq) for seq in range(flushed + 1, head + 1)])
+
+    # Every missing number in the batch starts its timeout now, so a run of them times out together
+    now = time.monotonic()
+    for seq in range(flushed + 1, head + 1):
+        if claim_key(seq) not in found:
+            _gaps.setdefault(seq, now)
+
+    claims, last = [], flushed
+    for seq in range(flushed + 1, head + 1):
+        claim_data = found.get(claim_key(seq))
+        if claim_data is None:
+            if now - _gaps[seq] < GAP_TIMEOUT:
+                break
+            logger.warning('Skipping flash-sale claim %s that was never written', seq)
+        else:
+            claims.append(claim_data)
+        _gaps.pop(seq, None)
+        last = seq
+    return claims, last, newest
+
+
+def _write_claims(claims):
+    from products.models import Product
+
+    now = timezone.now()
+    by_product = defaultdict(list)
+    for claim_data in claims:
+        by_product[claim_data['product_id']].append(claim_data)
+    products = Product.objects.select_related('shop').in_bulk(list(by_product))
+
+    orders, accepted = [], []
+    for product_id in sorted(by_product):
+        product = products.get(product_id)
+        product_claims = by_product[product_id]
+        if product is None:
+            continue
+        wanted = sum(claim_data['quantity'] for claim_data in product_claims)
+        taken = Product.objects.filter(pk=product_id, stock_quantity__gte=wanted).update(
+            stock_quantity=F('stock_quantity') - wanted, updated_at=now
+        )
+        if not taken:
+            # The counter drifted above the database; honour claims in order while stock lasts
+            stock = Product.objects.select_for_update().get(pk=product_id).stock_quantity
+            fits = []
+            for claim_data in product_claims:
+                if claim_data['quantity'] <= stock:
+                    stock -= claim_data['quantity']
+                    fits.append(claim_data)
+            Product.objects.filter(pk=product_id).update(stock_quantity=stock, updated_at=now)
+        else:
+            fits = product_claims
+
+        fitting_seqs = {claim_data['seq'] for claim_data in fits}
+        for claim_data in product_claims:
+            ok = claim_data['seq'] in fitting_seqs
+            order = Order(
+                buyer_id=claim_data['buyer_id'],
+                shop_id=product.shop_id,
+                product=product,
+                quantity=claim_data['quantity'],
+                total_price=product.price * claim_data['quantity'],
+                status='pending' if ok else 'cancelled',
+                buyer_phone=claim_data['buyer_phone'],
+                buyer_message=claim_data['buyer_message'],
+                seller_notified=ok,
+                notification_sent_at=now if ok else None,
+            )
+            orders.append(order)
+            if ok:
+                accepted.append(order)
+
+    Order.objects.bulk_create(orders)
+    items = OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=order.product, quantity=order.quantity, unit_price=order.product.price)
+        for order in orders
+    ])
+    record_new_orders((order, [item]) for order, item in zip(orders, items))
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, product_id=order.product_id, quantity=order.quantity, status='committed')
+        for order in accepted
+    ])
+    create_notifications([
+        SellerNotification(
+            seller_id=order.product.shop.owner_id,
+            order=order,
+            notification_type='new_order',
+            title=f'New Order for {order.product.name}',
+            message=f'You have received a new flash-sale order for {order.product.name}. Contact: {order.buyer_phone}'
+        )
+        for order in accepted
+    ])
+    invalidate_catalog(product_ids=list(by_product))
+    return len(accepted), len(orders) - len(accepted)
+
+
+def flush_claims(batch_size=None):
+    """
+    Write one batch of logged claims to the database.
+    Returns (orders written, claims cancelled for lack of database stock), which can be
+    (0, 0) for a batch of dead claim numbers or one held up by a claim still being logged;
+    DRAINED when every claim has been written; None when another flusher holds the lock.
+    """
+    cache = _cache()
+    batch_size = batch_size or getattr(settings, 'FLASH_SALE_FLUSH_BATCH', 500)
+    if not cache.add(FLUSH_LOCK_KEY, 1, timeout=60):
+        return None
+    try:
+        with transaction.atomic():
+            log, _ = FlashSaleLog.objects.select_for_update().get_or_create(pk=1)
+            flushed = log.flushed_seq
+            claims, last, newest = _next_batch(flushed, batch_size)
+            if newest <= flushed:
+                return DRAINED
+            if last == flushed:
+                return 0, 0
+            written = cancelled = 0
+            if claims:
+                written, cancelled = _write_claims(claims)
+            log.flushed_seq = last
+            log.save(update_fields=['flushed_seq', 'updated_at'])
+        # Claims at or below flushed_seq are never read again; losing this cleanup only leaves garbage
+        cache.delete_many([claim_key(seq) for seq in range(flushed + 1, last + 1)])
+        return written, cancelled
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def flush_all():
+    """Flush until the log is drained, waiting out any other flusher; returns totals"""
+    written = cancelled = 0
+    while True:
+        result = flush_claims()
+        if result == DRAINED:
+            return written, cancelled
+        if result is None:
+            time.sleep(0.05)
+            continue
+        written += result[0]
+        cancelled += result[1]
+        if not any(result):
+            # Wait for a claim being logged right now, or for its number to time out
+            time.sleep(0.05)
+
+
+def _flush_forever():
+    interval = settings.FLASH_SALE_FLUSH_INTERVAL
+    while True:
+        try:
+            flush_all()
+        except Exception:
+            logger.exception('Flash-sale flush failed; claims stay queued')
+        finally:
+            connection.close()
+        time.sleep(interval)
+
+
+def ensure_flusher():
+    """Start the in-process flusher thread (needed when the counter lives in local memory)"""
+    global _flusher
+    if _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_forever, name='flash-sale-flusher', daemon=True)
+            _flusher.start()
+            atexit.register(flush_all)
+
+
+def start_flash_sale(product):
+    """Move a product to claim-based checkout; raises FlashSaleUnavailable on an unsupported cache"""
+    if not cache_is_supported():
+        raise FlashSaleUnavailable(
+            'Flash sales need FLASH_SALE_CACHE_BACKEND set to Redis, or to local memory for a single process'
+        )
+    sale, _ = FlashSale.objects.update_or_create(product=product, defaults={'is_active': True})
+    reconcile_counter(product.pk, force=True)
+    cache = _cache()
+    cache.add(SEQUENCE_KEY, _flushed_seq(), timeout=None)
+    cache.delete(ACTIVE_KEY)
+    return sale
+
+
+def end_flash_sale(product):
+    """Back to database checkouts: stop claiming, then flush what was claimed"""
+    FlashSale.objects.filter(product=product).update(is_active=False, updated_at=timezone.now())
+    cache = _cache()
+    cache.delete(ACTIVE_KEY)
+    flush_all()
+    cache.delete(counter_key(product.pk))
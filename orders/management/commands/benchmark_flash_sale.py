@@ -0,0 +1,96 @@
+import time
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from orders.flash_sale import claim, end_flash_sale, flush_all, start_flash_sale
+from orders.models import Order
+from orders.serializers import OrderCreateSerializer
+from products.models import Product
+from shops.models import Shop
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare orders per second of plain checkouts and flash-sale claims on one hot product (rolled back). '
+        'Runs on one connection and a private local-memory flash_sale cache, so it measures the cost of each '
+        'checkout; under concurrency plain checkouts also queue on the product row'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000, help='Checkouts per path; also the stock of each')
+
+    def _report(self, label, orders, elapsed):
+        self.stdout.write(f'{label:<24} {orders:6d} orders  {elapsed:7.2f}s  {orders / elapsed:8.0f} orders/s')
+
+    def handle(self, *args, **options):
+        count = options['orders']
+        # Claims must not reach the flush_flash_sales of a running deployment: it cannot see this transaction
+        private_cache = {
+            **settings.CACHES,
+            'flash_sale': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                           'LOCATION': f'flash-sale-benchmark-{uuid.uuid4().hex}',
+                           'OPTIONS': {'MAX_ENTRIES': 10_000_000}},
+        }
+
+        with override_settings(CACHES=private_cache), transaction.atomic():
+            User = get_user_model()
+            prefix = f'flash-bench-{uuid.uuid4().hex[:8]}'
+            seller = User.objects.create_user(
+                username=prefix, email=f'{prefix}@bench.invalid', password=None, role='seller'
+            )
+            buyer = User.objects.create_user(
+                username=f'{prefix}-buyer', email=f'{prefix}-buyer@bench.invalid', password=None, role='buyer'
+            )
+            shop = Shop.objects.create(name='Flash Benchmark', owner=seller, verification_status='verified')
+            plain, hot = [
+                Product.objects.create(shop=shop, name=name, description='x', price=Decimal('1.00'),
+                                       stock_quantity=count)
+                for name in ('Plain item', 'Hot item')
+            ]
+            request = SimpleNamespace(user=buyer)
+
+            started = time.perf_counter()
+            for _ in range(count):
+                serializer = OrderCreateSerializer(
+                    data={'product': plain.pk, 'quantity': 1, 'buyer_phone': '0'}, context={'request': request}
+                )
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+            plain_elapsed = time.perf_counter() - started
+
+            start_flash_sale(hot)
+            started = time.perf_counter()
+            for _ in range(count):
+                serializer = OrderCreateSerializer(
+                    data={'product': hot.pk, 'quantity': 1, 'buyer_phone': '0'}, context={'request': request}
+                )
+                serializer.is_valid(raise_exception=True)
+                claim(hot, 1, buyer, '0')
+            claim_elapsed = time.perf_counter() - started
+            started = time.perf_counter()
+            flush_all()
+            flush_elapsed = time.perf_counter() - started
+            end_flash_sale(hot)
+
+            self._report('plain checkout', count, plain_elapsed)
+            self._report('flash-sale claims', count, claim_elapsed)
+            self._report('flash-sale with flush', count, claim_elapsed + flush_elapsed)
+
+            problems = []
+            for label, product in (('plain', plain), ('flash sale', hot)):
+                product.refresh_from_db(fields=['stock_quantity'])
+                written = Order.objects.filter(product=product, status='pending').count()
+                if (product.stock_quantity, written) != (0, count):
+                    problems.append(f'{label}: stock {product.stock_quantity}, {written} orders')
+            transaction.set_rollback(True)
+
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('Every unit sold exactly once on both paths; benchmark data rolled back'))
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.flash_sale import cache_is_shared, flush_all, reconcile_counter
+from orders.models import FlashSale
+
+
+class Command(BaseCommand):
+    help = 'Write queued flash-sale claims to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconcile', action='store_true',
+                            help='First reset every active sale\'s counter to database stock minus unflushed claims')
+        parser.add_argument('--loop', action='store_true', help='Keep flushing instead of exiting when the log is empty')
+        parser.add_argument('--interval', type=float, default=settings.FLASH_SALE_FLUSH_INTERVAL,
+                            help='Seconds to sleep between flushes in --loop mode')
+
+    def handle(self, *args, **options):
+        if not cache_is_shared():
+            raise CommandError(
+                'FLASH_SALE_CACHE_BACKEND is not a shared cache, so this process cannot see the claims; '
+                'on local memory the web process flushes its own'
+            )
+        if options['reconcile']:
+            for product_id in FlashSale.objects.filter(is_active=True).values_list('product_id', flat=True):
+                available = reconcile_counter(product_id, force=True)
+                self.stdout.write(f'Product {product_id}: counter reset to {available}')
+
+        totals = [0, 0]
+        while True:
+            written, cancelled = flush_all()
+            totals = [totals[0] + written, totals[1] + cancelled]
+            if written or cancelled:
+                self.stdout.write(f'Flushed {written} orders, cancelled {cancelled}')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {totals[0]} orders written, {totals[1]} cancelled'))
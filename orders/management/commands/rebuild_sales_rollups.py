@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from orders.analytics import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the daily sales rollups from order history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', type=int, action='append', dest='shop_ids',
+                            help='Only rebuild the given shop id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(options['shop_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} daily sales rollup rows'))
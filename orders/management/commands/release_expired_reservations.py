@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.reservations import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Return stock held by expired reservations and cancel their pending orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping instead of exiting when nothing is due')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds to sleep between sweeps in --loop mode')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            released = release_expired_reservations(options['batch_size'])
+            total += released
+            if released:
+                self.stdout.write(f'Released {released} expired reservations')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {total} reservations released'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_buyer_message_order_buyer_phone_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sellernotification',
+            name='notification_type',
+            field=models.CharField(choices=[('new_order', 'New Order'), ('order_update', 'Order Update'), ('payment_received', 'Payment Received'), ('shop_verified', 'Shop Verified'), ('shop_rejected', 'Shop Rejected'), ('shop_pending_review', 'Shop Pending Review')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:43
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def backfill_order_items(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    rows = Order.objects.filter(product__isnull=False).values_list('id', 'product_id', 'quantity', 'total_price')
+    batch = []
+    for order_id, product_id, quantity, total_price in rows.iterator(chunk_size=2000):
+        unit_price = (total_price / quantity).quantize(Decimal('0.01')) if quantity else total_price
+        batch.append(OrderItem(order_id=order_id, product_id=product_id, quantity=quantity, unit_price=unit_price))
+        if len(batch) >= 2000:
+            OrderItem.objects.bulk_create(batch)
+            batch = []
+    OrderItem.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_flashsale'),
+        ('products', '0008_product_sku'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='products.product'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='quantity',
+            field=models.PositiveIntegerField(help_text="Total units across the order's items"),
+        ),
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='products.product')),
+            ],
+        ),
+        migrations.RunPython(backfill_order_items, migrations.RunPython.noop),
+    ]
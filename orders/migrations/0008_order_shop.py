@@ -0,0 +1,42 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_order_shop(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    first_item_shop = OrderItem.objects.filter(order=OuterRef('pk')).order_by('id').values('product__shop_id')[:1]
+    Order.objects.filter(shop__isnull=True).update(shop_id=Subquery(first_item_shop))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_orderitem'),
+        ('shops', '0010_shop_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='shop',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='shops.shop'),
+        ),
+        migrations.RunPython(backfill_order_shop, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='order',
+            name='shop',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='shops.shop'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['shop', 'status', '-created_at'], name='order_shop_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['buyer', '-created_at'], name='order_buyer_created_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_sales_rollups(apps, schema_editor):
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    DailySalesRollup = apps.get_model('orders', 'DailySalesRollup')
+    rows = OrderItem.objects.annotate(day=TruncDate('order__created_at')).values(
+        'order__shop_id', 'product_id', 'day', 'order__status'
+    ).annotate(
+        order_count=Count('order_id', distinct=True),
+        total_units=Sum('quantity'),
+        total_revenue=Sum(F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+    ).order_by()
+    DailySalesRollup.objects.bulk_create([
+        DailySalesRollup(
+            shop_id=row['order__shop_id'], product_id=row['product_id'], day=row['day'], status=row['order__status'],
+            order_count=row['order_count'], units=row['total_units'], revenue=row['total_revenue']
+        )
+        for row in rows.iterator(chunk_size=2000)
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_shop'),
+        ('products', '0008_product_sku'),
+        ('shops', '0010_shop_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('order_count', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='products.product')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='shops.shop')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shop', 'day'], name='sales_rollup_shop_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailysalesrollup',
+            constraint=models.UniqueConstraint(fields=('shop', 'product', 'day', 'status'), name='sales_rollup_key_uniq'),
+        ),
+        migrations.RunPython(populate_sales_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_dailysalesrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sellernotification',
+            index=models.Index(fields=['seller', 'is_read', '-created_at'], name='notification_seller_read_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+
+
+def backfill_unread_counts(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    SellerNotification = apps.get_model('orders', 'SellerNotification')
+    unread = (
+        SellerNotification.objects.filter(seller=OuterRef('pk'), is_read=False).order_by().values('seller')
+        .annotate(total=Count('pk')).values('total')
+    )
+    User.objects.filter(notifications__is_read=False).distinct().update(
+        unread_notification_count=Subquery(unread, output_field=IntegerField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_sellernotification_seller_read_idx'),
+        ('users', '0002_user_unread_notification_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
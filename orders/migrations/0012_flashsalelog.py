@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_backfill_unread_notification_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlashSaleLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flushed_seq', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -10,10 +10,21 @@ class Order(models.Model):
         ('delivered', 'Delivered'),
         ('cancelled', 'Cancelled'),
     ]
+    # Statuses each status may move to; delivered and cancelled are final
+    STATUS_TRANSITIONS = {
+        'pending': ['confirmed', 'cancelled'],
+        'confirmed': ['shipped', 'cancelled'],
+        'shipped': ['delivered'],
+        'delivered': [],
+        'cancelled': [],
+    }
     
     buyer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders')
-    product = models.ForeignKey('products.Product', on_delete=models.CASCADE)
-    quantity = models.PositiveIntegerField()
+    # Denormalized from the items (an order never spans shops) so seller views filter one table
+    shop = models.ForeignKey('shops.Shop', on_delete=models.CASCADE, related_name='orders')
+    # Set for single-product orders; every order lists its lines in `items`
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, null=True, blank=True)
+    quantity = models.PositiveIntegerField(help_text="Total units across the order's items")
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=ORDER_STATUS_CHOICES, default='pending')
     
@@ -29,15 +40,121 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def save(self, *args, **kwargs):
-        if not self.total_price:
+        if not self.total_price and self.product_id:
             self.total_price = self.product.price * self.quantity
+        if not self.shop_id and self.product_id:
+            self.shop_id = self.product.shop_id
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"Order #{self.id} - {self.buyer.username} - {self.product.name}"
+        what = self.product.name if self.product_id else f'{self.quantity} items'
+        return f"Order #{self.id} - {self.buyer.username} - {what}"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Seller order pages: one shop, optionally one status, newest first
+            models.Index(fields=['shop', 'status', '-created_at'], name='order_shop_status_created_idx'),
+            # Buyer order history
+            models.Index(fields=['buyer', '-created_at'], name='order_buyer_created_idx'),
+        ]
+
+
+class OrderItem(models.Model):
+    """One product line of an order, priced when the order was placed"""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='order_items')
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    @property
+    def line_total(self):
+        return self.unit_price * self.quantity
+
+    def __str__(self):
+        return f"{self.quantity} x product {self.product_id} on order #{self.order_id}"
+
+
+class StockReservation(models.Model):
+    """
+    Stock taken from a product for an order.
+    Held reservations expire and are given back by `manage.py release_expired_reservations`.
+    """
+    STATUS_CHOICES = [
+        ('held', 'Held'),
+        ('committed', 'Committed'),
+        ('released', 'Released'),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='stock_reservations')
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='stock_reservations')
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='held')
+    expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.quantity} x product {self.product_id} for order #{self.order_id} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # The sweeper's scan for expired holds
+            models.Index(fields=['status', 'expires_at'], name='reservation_due_idx'),
+        ]
+
+
+class DailySalesRollup(models.Model):
+    """
+    Orders, units and revenue per shop, product, day and order status.
+    Kept current by orders.analytics as orders are placed and change status;
+    `manage.py rebuild_sales_rollups` regenerates it from order history.
+    """
+    shop = models.ForeignKey('shops.Shop', on_delete=models.CASCADE, related_name='sales_rollups')
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='sales_rollups')
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.ORDER_STATUS_CHOICES)
+    order_count = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"Shop {self.shop_id} product {self.product_id} on {self.day} ({self.status})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'product', 'day', 'status'], name='sales_rollup_key_uniq'),
+        ]
+        indexes = [
+            # Dashboard ranges: one shop, a span of days
+            models.Index(fields=['shop', 'day'], name='sales_rollup_shop_day_idx'),
+        ]
+
+
+class FlashSale(models.Model):
+    """
+    Opt-in "hot item" mode: checkouts claim stock from a cache counter and their orders
+    are written in batches by the flash-sale flusher (orders.flash_sale).
+    """
+    product = models.OneToOneField('products.Product', on_delete=models.CASCADE, related_name='flash_sale')
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Flash sale for product {self.product_id} ({'active' if self.is_active else 'ended'})"
+
+
+class FlashSaleLog(models.Model):
+    """
+    How far the flash-sale flusher has written the claim log. A single row, advanced in the
+    same transaction as the orders of each batch, so a batch is never written twice.
+    """
+    flushed_seq = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Flash-sale claims flushed up to {self.flushed_seq}"
 
 
 class SellerNotification(models.Model):
@@ -48,6 +165,7 @@ class SellerNotification(models.Model):
         ('payment_received', 'Payment Received'),
         ('shop_verified', 'Shop Verified'),
         ('shop_rejected', 'Shop Rejected'),
+        ('shop_pending_review', 'Shop Pending Review'),
     ]
     
     seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
@@ -60,6 +178,10 @@ class SellerNotification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A user's unread notifications: the ?unread=true feed and the unread counter's recount
+            models.Index(fields=['seller', 'is_read', '-created_at'], name='notification_seller_read_idx'),
+        ]
     
     def __str__(self):
         return f"{self.seller.username} - {self.title}"
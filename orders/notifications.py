@@ -0,0 +1,93 @@
+"""
+Seller notifications and per-user unread counters.
+
+Every path that creates, marks read or deletes notifications goes through this module (or
+the post_delete hook in orders.signals), which moves User.unread_notification_count with
+F() updates in the same transaction. The unread-count endpoint reads the column from the
+authenticated user, so polling never counts rows. Writes that bypass these helpers must
+call recount_unread_counts.
+"""
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import SellerNotification
+
+
+def unread_count(user):
+    """A user's unread notifications, as loaded with the user"""
+    return user.unread_notification_count
+
+
+def adjust_unread_counts(deltas):
+    """Apply {user id: change} to the unread counters, one UPDATE per distinct change"""
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        get_user_model().objects.filter(pk__in=user_ids).update(
+            unread_notification_count=Greatest(F('unread_notification_count') + delta, 0)
+        )
+
+
+def recount_unread_counts(user_ids):
+    """Set the counters of some users from their notification rows"""
+    unread = SellerNotification.objects.filter(seller=OuterRef('pk'), is_read=False).order_by().values('seller')
+    get_user_model().objects.filter(pk__in=set(user_ids)).update(
+        unread_notification_count=Coalesce(
+            Subquery(unread.annotate(total=Count('pk')).values('total'), output_field=IntegerField()), Value(0)
+        )
+    )
+
+
+def create_notifications(notifications):
+    """bulk_create notifications and count them towards their recipients' unread counters"""
+    with transaction.atomic(savepoint=False):
+        created = SellerNotification.objects.bulk_create(notifications)
+        adjust_unread_counts(Counter(notification.seller_id for notification in created if not notification.is_read))
+    return created
+
+
+def mark_read(notifications):
+    """Mark a queryset of notifications read, keeping the unread counters in step; returns rows marked"""
+    unread = notifications.filter(is_read=False)
+    with transaction.atomic(savepoint=False):
+        per_user = dict(unread.values_list('seller_id').annotate(total=Count('pk')).order_by())
+        if not per_user:
+            return 0
+        marked = unread.update(is_read=True)
+        if marked == sum(per_user.values()):
+            adjust_unread_counts({user_id: -total for user_id, total in per_user.items()})
+        else:
+            # Something else changed these rows in between; recount rather than guess
+            recount_unread_counts(per_user)
+    return marked
+
+
+def broadcast_notification(recipients, notification_type, title, message, order=None):
+    """Create the same notification for every recipient with a single bulk insert"""
+    if hasattr(recipients, 'values_list'):
+        recipient_ids = list(recipients.values_list('id', flat=True))
+    else:
+        recipient_ids = [getattr(recipient, 'pk', recipient) for recipient in recipients]
+
+    return create_notifications([
+        SellerNotification(
+            seller_id=recipient_id,
+            order=order,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+        )
+        for recipient_id in recipient_ids
+    ])
+
+
+def notify_admins(notification_type, title, message, order=None):
+    """Fan an alert out to every admin user"""
+    admins = get_user_model().objects.filter(role='admin')
+    return broadcast_notification(admins, notification_type, title, message, order=order)
@@ -0,0 +1,168 @@
+"""
+Stock reservations.
+
+Stock is only ever taken with a conditional UPDATE (``stock_quantity >= n``), so concurrent
+checkouts cannot oversell and never rewrite the rest of the product row. Every decrement is
+recorded as a StockReservation: committed for placed orders, held with an expiry for
+pending orders created from inquiries. For products on flash sale, every take, return and
+edit also moves the sale's stock counter (orders.flash_sale).
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from weshop.cache import invalidate_catalog
+
+from .analytics import record_status_change
+from .models import Order, StockReservation
+
+
+class InsufficientStock(Exception):
+    def __init__(self, message='', product_id=None):
+        super().__init__(message)
+        self.product_id = product_id
+
+
+def take_stock(product_id, quantity):
+    """Atomically decrement an active product's stock; False when there is not enough"""
+    from products.models import Product
+    from .flash_sale import give_back_to_counters, take_from_counters
+
+    try:
+        counted = take_from_counters({product_id: quantity})
+    except InsufficientStock:
+        return False
+    taken = Product.objects.filter(
+        pk=product_id, is_active=True, stock_quantity__gte=quantity
+    ).update(stock_quantity=F('stock_quantity') - quantity, updated_at=timezone.now())
+    if taken:
+        invalidate_catalog(product_ids=[product_id])
+    else:
+        give_back_to_counters(counted)
+    return bool(taken)
+
+
+def take_stock_many(quantities):
+    """
+    Decrement several products inside the caller's transaction; quantities maps product id to amount.
+    Raises InsufficientStock naming the first product short of stock, so the caller rolls back.
+    """
+    from products.models import Product
+    from .flash_sale import give_back_to_counters, take_from_counters
+
+    counted = take_from_counters(quantities)
+    now = timezone.now()
+    # Fixed order so concurrent checkouts lock product rows consistently
+    for product_id, quantity in sorted(quantities.items()):
+        taken = Product.objects.filter(
+            pk=product_id, is_active=True, stock_quantity__gte=quantity
+        ).update(stock_quantity=F('stock_quantity') - quantity, updated_at=now)
+        if not taken:
+            give_back_to_counters(counted)
+            raise InsufficientStock(f'Insufficient stock for product {product_id}', product_id=product_id)
+    invalidate_catalog(product_ids=list(quantities))
+
+
+def return_stock(quantities):
+    """Give stock back; quantities maps product id to amount"""
+    from products.models import Product
+    from .flash_sale import adjust_counters
+
+    now = timezone.now()
+    # Fixed order so concurrent releases lock product rows consistently
+    for product_id, quantity in sorted(quantities.items()):
+        Product.objects.filter(pk=product_id).update(stock_quantity=F('stock_quantity') + quantity, updated_at=now)
+    adjust_counters(quantities)
+    invalidate_catalog(product_ids=list(quantities))
+
+
+def adjust_stock(product_id, delta):
+    """
+    Apply an edit of a product's stock as a signed difference (never below zero), so it does not
+    overwrite stock taken concurrently by orders and flash-sale flushes
+    """
+    from products.models import Product
+    from .flash_sale import adjust_counters
+
+    Product.objects.filter(pk=product_id).update(
+        stock_quantity=Greatest(F('stock_quantity') + delta, 0), updated_at=timezone.now()
+    )
+    adjust_counters({product_id: delta})
+    invalidate_catalog(product_ids=[product_id])
+
+
+def hold_expires_at():
+    """When a hold taken now lapses unless committed (STOCK_RESERVATION_TTL_MINUTES)"""
+    return timezone.now() + timedelta(minutes=getattr(settings, 'STOCK_RESERVATION_TTL_MINUTES', 30))
+
+
+def commit_reservations(order_ids):
+    """Keep the held stock of some orders for good (the seller accepted them)"""
+    return StockReservation.objects.filter(order_id__in=order_ids, status='held').update(
+        status='committed', expires_at=None, updated_at=timezone.now()
+    )
+
+
+def _release(rows):
+    """Release locked reservations given as (id, product id, quantity) rows"""
+    quantities = defaultdict(int)
+    for _, product_id, quantity in rows:
+        quantities[product_id] += quantity
+    released = StockReservation.objects.filter(pk__in=[row[0] for row in rows]).update(
+        status='released', updated_at=timezone.now()
+    )
+    if quantities:
+        return_stock(quantities)
+    return released
+
+
+def release_reservations(order_ids):
+    """Give back all stock still taken by some orders, e.g. when they are cancelled"""
+    # No savepoint of its own: callers such as transition_orders are already atomic
+    with transaction.atomic(savepoint=False):
+        rows = list(
+            StockReservation.objects.select_for_update()
+            .filter(order_id__in=order_ids, status__in=['held', 'committed'])
+            .values_list('pk', 'product_id', 'quantity')
+        )
+        if not rows:
+            return 0
+        return _release(rows)
+
+
+def release_expired_reservations(batch_size=500):
+    """
+    Release one batch of expired holds and cancel their still-pending orders.
+    Returns the number of reservations released.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due_order_ids = set(
+            StockReservation.objects.filter(status='held', expires_at__lte=now)
+            .order_by('expires_at').values_list('order_id', flat=True)[:batch_size]
+        )
+        if not due_order_ids:
+            return 0
+        # Orders before reservations, as in orders.transitions, so a sweep running alongside a
+        # confirm or cancel cannot deadlock; orders another transaction holds wait for the next run
+        statuses = dict(
+            Order.objects.select_for_update(skip_locked=True).filter(pk__in=due_order_ids)
+            .order_by('pk').values_list('pk', 'status')
+        )
+        rows = list(
+            StockReservation.objects.select_for_update(skip_locked=True)
+            .filter(order_id__in=list(statuses), status='held', expires_at__lte=now)
+            .values_list('pk', 'product_id', 'quantity')
+        )
+        if not rows:
+            return 0
+        released = _release(rows)
+        pending = [order_id for order_id, status in statuses.items() if status == 'pending']
+        Order.objects.filter(pk__in=pending).update(status='cancelled', updated_at=timezone.now())
+        record_status_change({order_id: 'pending' for order_id in pending}, 'cancelled')
+    return released
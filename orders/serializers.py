@@ -1,22 +1,46 @@
 from rest_framework import serializers
-from .models import Order, SellerNotification
+from weshop.fieldsets import SparseFieldsetSerializerMixin
+from products.models import Product
+from .models import Order, OrderItem, SellerNotification
+from .checkout import MAX_CHECKOUT_LINES, merge_lines, place_orders
+from .reservations import InsufficientStock
+from .transitions import MAX_TRANSITION_ORDERS, sources_for
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
-    shop_name = serializers.CharField(source='product.shop.name', read_only=True)
+    line_total = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ['product', 'product_name', 'quantity', 'unit_price', 'line_total']
+
+class OrderSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    # Null for multi-item orders; see items
+    product_name = serializers.CharField(source='product.name', read_only=True, allow_null=True)
+    shop_name = serializers.CharField(source='shop.name', read_only=True)
     buyer_username = serializers.CharField(source='buyer.username', read_only=True)
+    items = OrderItemSerializer(many=True, read_only=True)
+    sparse_field_sources = {
+        'product_name': ['product__name'],
+        'shop_name': ['shop__name'],
+        'buyer_username': ['buyer__username'],
+    }
     
     class Meta:
         model = Order
-        fields = ['id', 'buyer', 'buyer_username', 'product', 'product_name', 'shop_name', 
+        fields = ['id', 'buyer', 'buyer_username', 'shop', 'product', 'product_name', 'shop_name', 
                  'quantity', 'total_price', 'status', 'buyer_phone', 'buyer_message', 
-                 'seller_notified', 'notification_sent_at', 'created_at']
-        read_only_fields = ['buyer', 'total_price', 'seller_notified', 'notification_sent_at', 'created_at']
+                 'seller_notified', 'notification_sent_at', 'created_at', 'items']
+        read_only_fields = ['buyer', 'shop', 'total_price', 'seller_notified', 'notification_sent_at', 'created_at']
 
 class OrderCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ['product', 'quantity', 'buyer_phone', 'buyer_message']
+        extra_kwargs = {
+            # The shop comes along for the seller notification
+            'product': {'required': True, 'allow_null': False, 'queryset': Product.objects.select_related('shop')},
+        }
 
     def validate(self, attrs):
         product = attrs['product']
@@ -25,40 +49,92 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         if quantity <= 0:
             raise serializers.ValidationError("Quantity must be greater than 0")
         
+        # Cheap early rejection; the authoritative check is the conditional decrement in place_orders()
         if product.stock_quantity < quantity:
             raise serializers.ValidationError("Insufficient stock")
         
         return attrs
 
     def create(self, validated_data):
-        validated_data['buyer'] = self.context['request'].user
-        order = super().create(validated_data)
-        
-        # Update product stock
-        product = order.product
-        product.stock_quantity -= order.quantity
-        product.save()
-        
-        # Create notification for seller
-        from django.utils import timezone
-        SellerNotification.objects.create(
-            seller=product.shop.owner,
-            order=order,
-            notification_type='new_order',
-            title=f'New Order for {product.name}',
-            message=f'You have received a new order for {product.name} from {order.buyer.username}. Contact: {order.buyer_phone}'
-        )
-        
-        # Mark order as notified
-        order.seller_notified = True
-        order.notification_sent_at = timezone.now()
-        order.save()
-        
-        return order
+        # A one-line cart: every row is written once with its final values
+        product = validated_data['product']
+        try:
+            orders = place_orders(
+                self.context['request'].user,
+                {product.pk: product},
+                {product.pk: validated_data['quantity']},
+                buyer_phone=validated_data.get('buyer_phone', ''),
+                buyer_message=validated_data.get('buyer_message', '')
+            )
+        except InsufficientStock:
+            raise serializers.ValidationError("Insufficient stock")
+        return orders[0]
+
+
+class CheckoutLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class CheckoutSerializer(serializers.Serializer):
+    items = CheckoutLineSerializer(many=True, allow_empty=False, max_length=MAX_CHECKOUT_LINES)
+    buyer_phone = serializers.CharField(max_length=20, required=False, allow_blank=True, default='')
+    buyer_message = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate(self, attrs):
+        from products.models import Product
+        from .flash_sale import active_flash_sale_ids
+
+        quantities = merge_lines(attrs['items'])
+        # Every line is checked against one query
+        products = Product.objects.select_related('shop').filter(is_active=True).in_bulk(list(quantities))
+        missing = [str(product_id) for product_id in quantities if product_id not in products]
+        if missing:
+            raise serializers.ValidationError({'items': f'Unknown or inactive product(s): {", ".join(missing)}'})
+        on_sale = sorted(active_flash_sale_ids().intersection(quantities))
+        if on_sale:
+            names = ', '.join(products[product_id].name for product_id in on_sale)
+            raise serializers.ValidationError({'items': f'On flash sale, order separately: {names}'})
+        short = [products[product_id].name for product_id, quantity in quantities.items()
+                 if products[product_id].stock_quantity < quantity]
+        if short:
+            raise serializers.ValidationError({'items': f'Insufficient stock for: {", ".join(short)}'})
+
+        attrs['products'] = products
+        attrs['quantities'] = quantities
+        return attrs
+
+    def create(self, validated_data):
+        try:
+            return place_orders(
+                self.context['request'].user,
+                validated_data['products'],
+                validated_data['quantities'],
+                buyer_phone=validated_data['buyer_phone'],
+                buyer_message=validated_data['buyer_message']
+            )
+        except InsufficientStock as e:
+            name = validated_data['products'][e.product_id].name
+            raise serializers.ValidationError({'items': f'Insufficient stock for: {name}'})
+
+
+class OrderTransitionSerializer(serializers.Serializer):
+    orders = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=MAX_TRANSITION_ORDERS
+    )
+    status = serializers.ChoiceField(choices=[
+        (value, label) for value, label in Order.ORDER_STATUS_CHOICES if sources_for(value)
+    ])
 
 
-class SellerNotificationSerializer(serializers.ModelSerializer):
+class SellerNotificationSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     order_info = serializers.SerializerMethodField()
+    sparse_field_sources = {
+        'order_info': [
+            'order__buyer_phone', 'order__quantity', 'order__total_price', 'order__status',
+            'order__product__name', 'order__buyer__username',
+        ],
+    }
     
     class Meta:
         model = SellerNotification
@@ -69,7 +145,7 @@ class SellerNotificationSerializer(serializers.ModelSerializer):
         if obj.order:
             return {
                 'id': obj.order.id,
-                'product_name': obj.order.product.name,
+                'product_name': obj.order.product.name if obj.order.product_id else None,
                 'buyer_username': obj.order.buyer.username,
                 'buyer_phone': obj.order.buyer_phone,
                 'quantity': obj.order.quantity,
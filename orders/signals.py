@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from .analytics import record_deleted_orders
+from .models import Order, SellerNotification
+from .notifications import adjust_unread_counts
+
+
+@receiver(pre_delete, sender=Order)
+def uncount_deleted_order(sender, instance, **kwargs):
+    # Direct, admin or cascading (buyer, shop, product) deletes; the lines still exist here
+    record_deleted_orders([(instance, instance.items.all())])
+
+
+@receiver(post_delete, sender=SellerNotification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    # Deleting an order or shop cascades to its notifications
+    if not instance.is_read:
+        adjust_unread_counts({instance.seller_id: -1})
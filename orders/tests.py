@@ -0,0 +1,485 @@
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import caches
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from products.models import Product
+from shops.models import Shop
+from users.models import User
+
+from .analytics import rebuild_rollups, sales_summary
+from .checks import check_flash_sale_cache
+from .flash_sale import SEQUENCE_KEY, claim, counter_key, flush_all, flush_claims
+from .models import DailySalesRollup, FlashSale, Order, SellerNotification, StockReservation
+from .notifications import recount_unread_counts
+from .reservations import InsufficientStock, adjust_stock, release_expired_reservations
+from .views import orders_visible_to
+
+
+def make_user(username, role='buyer'):
+    return User.objects.create_user(username=username, email=f'{username}@example.com', password=None, role=role)
+
+
+class OrderFixtureMixin:
+    """Two verified shops with three products, and a buyer"""
+
+    def setUp(self):
+        super().setUp()
+        self.buyer = make_user('buyer')
+        self.shops = [
+            Shop.objects.create(name=f'Shop {index}', owner=make_user(f'seller{index}', role='seller'),
+                                verification_status='verified')
+            for index in range(2)
+        ]
+        self.products = [
+            Product.objects.create(shop=self.shops[index % 2], name=f'Product {index}', description='d',
+                                   price=10 + index, stock_quantity=100)
+            for index in range(3)
+        ]
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def checkout(self, *quantities):
+        response = self.client_for(self.buyer).post('/api/orders/checkout/', {
+            'items': [{'product': product.pk, 'quantity': quantity}
+                      for product, quantity in zip(self.products, quantities) if quantity]
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return [order['id'] for order in response.data['orders']]
+
+    def inquire(self, product):
+        response = self.client_for(self.buyer).post(f'/api/shops/{product.shop_id}/contact-seller/', {
+            'product': product.pk, 'phone': '555-0100', 'message': 'Still available?'
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Order.objects.filter(buyer=self.buyer, product=product).latest('created_at').pk
+
+    def stock(self, product):
+        return Product.objects.values_list('stock_quantity', flat=True).get(pk=product.pk)
+
+
+class QueryBudgetTests(OrderFixtureMixin, TestCase):
+    """
+    Queries per order write path, excluding authentication. Each budget counts the SAVEPOINT and
+    RELEASE of the view's transaction (BEGIN and COMMIT outside tests are not queries) and the
+    two-statement sales rollup upsert (INSERT OR IGNORE / ON CONFLICT DO NOTHING, then UPDATE).
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.buyer_client = self.client_for(self.buyer)
+        self.seller_client = self.client_for(self.shops[0].owner)
+
+    def transition(self, order_ids, new_status):
+        response = self.seller_client.post('/api/orders/transition/', {'orders': order_ids, 'status': new_status},
+                                           format='json')
+        self.assertEqual(response.data['updated'], len(order_ids), response.data)
+
+    def test_order_create(self):
+        # Product, transaction (2), stock, order, line, reservation, notification and the
+        # seller's unread counter (2), rollup (2)
+        with self.assertNumQueries(11):
+            response = self.buyer_client.post('/api/orders/', {
+                'product': self.products[0].pk, 'quantity': 2, 'buyer_phone': '555-0100'
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def test_checkout(self):
+        # Products, transaction (2), stock per product (3, in id order so carts cannot deadlock),
+        # orders, lines, reservations, notifications and unread counters (2), rollup (2)
+        with self.assertNumQueries(13):
+            self.checkout(1, 1, 1)
+
+    def test_inquiry(self):
+        # Product, transaction (2), inquiry, stock, order, line, reservation, rollup (2),
+        # notification and unread counter (2), queued email
+        with self.assertNumQueries(13):
+            response = self.buyer_client.post(f'/api/shops/{self.shops[0].pk}/contact-seller/', {
+                'product': self.products[0].pk, 'phone': '555-0100', 'message': 'Still available?'
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def test_bulk_confirm(self):
+        order_ids = self.checkout(1, 0, 0) + self.checkout(2, 0, 0) + [self.inquire(self.products[0])]
+        # Transaction (2), locking authorization, update, rollup lines and upsert (3), holds committed
+        with self.assertNumQueries(8):
+            self.transition(order_ids, 'confirmed')
+
+    def fulfil(self, order_id, budget):
+        with self.assertNumQueries(budget):
+            response = self.seller_client.post(f'/api/orders/{order_id}/fulfill/')
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_fulfilment(self):
+        order_id = self.checkout(1, 0, 0)[0]
+        self.transition([order_id], 'confirmed')
+        # Transaction (2), locking authorization, update, rollup (3), unread per seller,
+        # notifications marked read, counters (3), then the order and its lines for the response (2)
+        self.fulfil(order_id, 12)
+
+    def test_fulfilment_from_pending(self):
+        # As above, plus committing any stock still on hold
+        self.fulfil(self.inquire(self.products[0]), 13)
+
+    def test_bulk_cancel(self):
+        order_ids = self.checkout(1, 0, 1) + [self.inquire(self.products[0])]
+        # Transaction (2), locking authorization, update, rollup (3), locked reservations,
+        # released, stock per product (2), unread per seller, notifications marked read, counters (3)
+        with self.assertNumQueries(14):
+            self.transition(order_ids, 'cancelled')
+
+
+class OrderTransitionTests(OrderFixtureMixin, TestCase):
+    def transition(self, user, order_ids, new_status):
+        return self.client_for(user).post('/api/orders/transition/', {'orders': order_ids, 'status': new_status},
+                                          format='json')
+
+    def test_outcomes_per_order(self):
+        mine = self.checkout(2, 0, 0)[0]
+        other = self.checkout(0, 1, 0)[0]
+        response = self.transition(self.shops[0].owner, [mine, other, 999999], 'shipped')
+        outcomes = {row['order']: row['outcome'] for row in response.data['results']}
+        self.assertEqual(outcomes, {mine: 'invalid_transition', other: 'forbidden', 999999: 'not_found'})
+
+        for new_status in ('confirmed', 'shipped', 'delivered'):
+            response = self.transition(self.shops[0].owner, [mine], new_status)
+            self.assertEqual(response.data['updated'], 1, response.data)
+        self.assertEqual(Order.objects.get(pk=mine).status, 'delivered')
+
+    def test_cancel_returns_stock(self):
+        order_ids = self.checkout(3, 0, 2)
+        self.assertEqual(self.stock(self.products[0]), 97)
+        response = self.transition(self.shops[0].owner, order_ids, 'cancelled')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual((self.stock(self.products[0]), self.stock(self.products[2])), (100, 100))
+        self.assertFalse(StockReservation.objects.filter(order_id__in=order_ids).exclude(status='released').exists())
+
+    def test_buyers_cannot_transition(self):
+        order_ids = self.checkout(1, 0, 0)
+        self.assertEqual(self.transition(self.buyer, order_ids, 'cancelled').status_code, 403)
+
+
+class OrderVisibilityTests(OrderFixtureMixin, TestCase):
+    def test_sellers_see_their_shop_orders_without_joining_shops(self):
+        mine = self.checkout(1, 0, 0)
+        self.checkout(0, 1, 0)
+        seller = self.shops[0].owner
+        self.assertNotIn('JOIN', str(orders_visible_to(seller).query))
+        self.assertEqual(list(orders_visible_to(seller).values_list('pk', flat=True)), mine)
+
+        response = self.client_for(seller).get('/api/orders/')
+        self.assertEqual([order['id'] for order in response.data['results']], mine)
+        # A seller without a shop sees nothing
+        self.assertFalse(orders_visible_to(make_user('shopless', role='seller')).exists())
+
+
+class ConcurrentCheckoutTests(OrderFixtureMixin, TransactionTestCase):
+    """Real transactions: buyers race for the last units of one product from separate threads"""
+
+    # A quarter of what 8 threads manage on SQLite here (about 40/s, lock retries included);
+    # catches a checkout path that starts queueing badly
+    MIN_CHECKOUTS_PER_SECOND = 10
+
+    def test_concurrent_checkouts_sell_exactly_the_stock(self):
+        product = self.products[0]
+        Product.objects.filter(pk=product.pk).update(stock_quantity=30)
+        buyers = [make_user(f'racer{index}') for index in range(8)]
+        outcomes = []
+
+        def until_unlocked(operation):
+            # SQLite reports lock contention instead of waiting; Postgres blocks
+            while True:
+                try:
+                    return operation()
+                except OperationalError:
+                    time.sleep(0.005)
+
+        def buy(buyer):
+            client = self.client_for(buyer)
+
+            def attempt(token):
+                try:
+                    return client.post('/api/orders/', {
+                        'product': product.pk, 'quantity': 1, 'buyer_phone': '555-0100', 'buyer_message': token
+                    }, format='json').status_code
+                except OperationalError:
+                    # The lock error may come after the commit, while the response is built
+                    if until_unlocked(Order.objects.filter(buyer_message=token).exists):
+                        return 201
+                    raise
+
+            try:
+                for index in range(10):
+                    token = f'{buyer.username}-{index}'
+                    outcomes.append(until_unlocked(lambda: attempt(token)))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(buyer,)) for buyer in buyers]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        # 80 attempts on 30 units: every unit sells once, the rest of the demand is turned away
+        self.assertEqual(sorted(set(outcomes)), [201, 400])
+        self.assertEqual((outcomes.count(201), outcomes.count(400)), (30, 50))
+        sold = Order.objects.filter(product=product).aggregate(total=Sum('quantity'))['total']
+        reserved = StockReservation.objects.filter(product=product, status='committed').aggregate(
+            total=Sum('quantity')
+        )['total']
+        self.assertEqual((sold, reserved, self.stock(product)), (30, 30, 0))
+        self.assertGreater(len(outcomes) / elapsed, self.MIN_CHECKOUTS_PER_SECOND)
+
+
+class ExpiredReservationTests(OrderFixtureMixin, TestCase):
+    def expire_holds(self):
+        StockReservation.objects.filter(status='held').update(expires_at=timezone.now() - timedelta(minutes=1))
+
+    def test_sweep_cancels_pending_inquiry_orders(self):
+        order_id = self.inquire(self.products[0])
+        self.assertEqual(self.stock(self.products[0]), 99)
+        self.expire_holds()
+
+        self.assertEqual(release_expired_reservations(), 1)
+        self.assertEqual(Order.objects.get(pk=order_id).status, 'cancelled')
+        self.assertEqual(self.stock(self.products[0]), 100)
+
+    def test_confirmed_orders_keep_their_stock(self):
+        order_id = self.inquire(self.products[0])
+        response = self.client_for(self.shops[0].owner).post(
+            '/api/orders/transition/', {'orders': [order_id], 'status': 'confirmed'}, format='json'
+        )
+        self.assertEqual(response.data['updated'], 1)
+        self.expire_holds()
+
+        self.assertEqual(release_expired_reservations(), 0)
+        self.assertEqual(Order.objects.get(pk=order_id).status, 'confirmed')
+        self.assertEqual(self.stock(self.products[0]), 99)
+
+
+class FlashSaleTests(OrderFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        caches['flash_sale'].clear()
+        self.addCleanup(caches['flash_sale'].clear)
+        self.product = self.products[0]
+        # The tests flush in their own thread, inside the test transaction
+        patcher = mock.patch('orders.views.ensure_flusher')
+        self.ensure_flusher = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def toggle(self, active):
+        return self.client_for(self.shops[0].owner).post(
+            f'/api/flash-sales/{self.product.pk}/', {'active': active}, format='json'
+        )
+
+    def start(self):
+        self.assertEqual(self.toggle(True).status_code, 200)
+
+    def counter(self):
+        return caches['flash_sale'].get(counter_key(self.product.pk))
+
+    def test_local_memory_sells_through_an_in_process_flusher(self):
+        self.assertEqual([warning.id for warning in check_flash_sale_cache(None)], ['orders.W001'])
+        self.start()
+        response = self.client_for(self.buyer).post('/api/orders/', {
+            'product': self.product.pk, 'quantity': 2, 'buyer_phone': '555-0100'
+        }, format='json')
+        self.assertEqual(response.status_code, 202, response.data)
+        self.ensure_flusher.assert_called_once_with()
+        self.assertEqual((self.counter(), self.stock(self.product)), (98, 100))
+
+        self.assertEqual(flush_all(), (1, 0))
+        self.assertEqual(self.stock(self.product), 98)
+
+    @mock.patch('orders.flash_sale.cache_is_supported', return_value=False)
+    def test_refuses_to_start_on_an_unsupported_cache(self, _):
+        response = self.toggle(True)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('FLASH_SALE_CACHE_BACKEND', response.data['error'])
+        self.assertFalse(FlashSale.objects.exists())
+
+        # A sale left active from another configuration falls back to database checkouts
+        FlashSale.objects.create(product=self.product, is_active=True)
+        response = self.client_for(self.buyer).post('/api/orders/', {
+            'product': self.product.pk, 'quantity': 2, 'buyer_phone': '555-0100'
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.stock(self.product), 98)
+
+    def test_inquiries_cancellations_and_edits_move_the_counter(self):
+        self.start()
+        self.assertEqual(self.counter(), 100)
+
+        order_id = self.inquire(self.product)
+        self.assertEqual((self.counter(), self.stock(self.product)), (99, 99))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(self.shops[0].owner).post(
+                '/api/orders/transition/', {'orders': [order_id], 'status': 'cancelled'}, format='json'
+            )
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual((self.counter(), self.stock(self.product)), (100, 100))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            adjust_stock(self.product.pk, -40)
+        self.assertEqual((self.counter(), self.stock(self.product)), (60, 60))
+
+    def test_claims_never_oversell_the_database(self):
+        self.start()
+        with self.captureOnCommitCallbacks(execute=True):
+            adjust_stock(self.product.pk, -70)
+        claimed = []
+
+        def buyer_claims():
+            for _ in range(10):
+                try:
+                    claimed.append(claim(self.product, 1, self.buyer))
+                except InsufficientStock:
+                    pass
+
+        threads = [threading.Thread(target=buyer_claims) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(claimed), 30)
+        # An inquiry competes for the same units and finds none left, so it holds no order
+        response = self.client_for(self.buyer).post(f'/api/shops/{self.shops[0].pk}/contact-seller/', {
+            'product': self.product.pk, 'phone': '555-0100', 'message': 'Any left?'
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.stock(self.product), 30)
+
+        self.assertEqual(flush_all(), (30, 0))
+        self.assertEqual(self.stock(self.product), 0)
+        self.assertEqual(Order.objects.filter(product=self.product, status='pending').count(), 30)
+
+    def test_flush_all_gets_past_a_batch_of_dead_claim_numbers(self):
+        self.start()
+        # A worker took a claim number and died before logging the claim
+        caches['flash_sale'].incr(SEQUENCE_KEY)
+        claim(self.product, 2, self.buyer)
+        with mock.patch('orders.flash_sale.GAP_TIMEOUT', 0), override_settings(FLASH_SALE_FLUSH_BATCH=1):
+            self.assertEqual(flush_all(), (1, 0))
+        self.assertEqual(self.stock(self.product), 98)
+
+    def test_a_flush_killed_after_commit_is_not_written_again(self):
+        self.start()
+        claims = [claim(self.product, 1, self.buyer) for _ in range(3)]
+        flash_cache = caches['flash_sale']
+        # The batch commits, then the flusher dies before it cleans the claims out of the cache
+        with mock.patch.object(flash_cache, 'delete_many', side_effect=ConnectionError('flusher killed')):
+            with self.assertRaises(ConnectionError):
+                flush_claims()
+        self.assertEqual(Order.objects.filter(product=self.product).count(), 3)
+
+        self.assertEqual(flush_all(), (0, 0))
+        self.assertEqual(Order.objects.filter(product=self.product).count(), 3)
+        self.assertEqual(self.stock(self.product), 97)
+
+        # A cold cache numbers claims on from the database, so none is mistaken for a flushed one
+        flash_cache.clear()
+        self.assertEqual(claim(self.product, 1, self.buyer), claims[-1] + 1)
+        self.assertEqual(flush_all(), (1, 0))
+        self.assertEqual(self.stock(self.product), 96)
+
+
+class UnreadCounterTests(OrderFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = self.shops[0].owner
+
+    def unread(self):
+        self.seller.refresh_from_db(fields=['unread_notification_count'])
+        with self.assertNumQueries(0):
+            response = self.client_for(self.seller).get('/api/notifications/unread-count/')
+        return response.data['unread']
+
+    def test_counter_follows_notification_writes(self):
+        first, second = self.checkout(1, 0, 0) + self.checkout(2, 0, 0)
+        self.inquire(self.products[0])
+        self.assertEqual(self.unread(), 3)
+
+        notification = SellerNotification.objects.filter(order_id=first).get()
+        response = self.client_for(self.seller).post(f'/api/notifications/{notification.pk}/read/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.unread(), 2)
+
+        # Deleting an order cascades to its notification
+        Order.objects.filter(pk=second).delete()
+        self.assertEqual(self.unread(), 1)
+
+        self.client_for(self.seller).post('/api/notifications/read-all/')
+        self.assertEqual(self.unread(), 0)
+        self.assertEqual(self.unread(), SellerNotification.objects.filter(seller=self.seller, is_read=False).count())
+
+    def test_recount_repairs_a_drifted_counter(self):
+        self.checkout(1, 0, 0)
+        User.objects.filter(pk=self.seller.pk).update(unread_notification_count=7)
+        recount_unread_counts([self.seller.pk])
+        self.assertEqual(self.unread(), 1)
+
+
+class SalesRollupTests(OrderFixtureMixin, TestCase):
+    def rollup(self):
+        """Non-empty rollup rows, which rebuild_rollups must reproduce"""
+        return sorted(
+            DailySalesRollup.objects.exclude(order_count=0, units=0, revenue=0)
+            .values_list('shop_id', 'product_id', 'day', 'status', 'order_count', 'units', 'revenue')
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.rollup()
+        rebuild_rollups()
+        self.assertEqual(incremental, self.rollup())
+
+    def test_deletes_take_orders_out(self):
+        first, = self.checkout(1, 0, 2)
+        self.checkout(3, 1, 0)
+        Order.objects.filter(pk=first).delete()
+        self.assertMatchesRebuild()
+
+        # Cascades from the buyer
+        self.buyer.delete()
+        self.assertEqual(self.rollup(), [])
+
+    def test_admin_line_edits_update_the_rollup(self):
+        order_id, = self.checkout(1, 0, 2)
+        order = Order.objects.get(pk=order_id)
+        first, second = order.items.order_by('pk')
+        admin = User.objects.create_superuser(username='rollup-admin', email='rollup-admin@example.com',
+                                              password=None, role='admin')
+        self.client.force_login(admin)
+        response = self.client.post(f'/admin/orders/order/{order_id}/change/', {
+            'buyer': order.buyer_id, 'shop': order.shop_id, 'quantity': 5, 'status': 'confirmed',
+            'buyer_phone': '', 'buyer_message': '',
+            'items-TOTAL_FORMS': 2, 'items-INITIAL_FORMS': 2, 'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+            'items-0-id': first.pk, 'items-0-order': order_id, 'items-0-product': first.product_id,
+            'items-0-quantity': 5,
+            'items-1-id': second.pk, 'items-1-order': order_id, 'items-1-product': second.product_id,
+            'items-1-quantity': 2, 'items-1-DELETE': 'on',
+        })
+        self.assertEqual(response.status_code, 302, response.context and response.context['errors'])
+        self.assertEqual(list(order.items.values_list('quantity', flat=True)), [5])
+        self.assertEqual(self.rollup()[0][3:], ('confirmed', 1, 5, first.unit_price * 5))
+        self.assertMatchesRebuild()
+
+    def test_totals_count_order_lines(self):
+        self.checkout(1, 0, 2)
+        summary = sales_summary(self.shops[0].pk, 90)
+        self.assertEqual(summary['totals']['order_lines'], 2)
+        self.assertEqual([product['orders'] for product in summary['products']], [1, 1])
@@ -0,0 +1,86 @@
+"""
+Order status transitions.
+
+Order.STATUS_TRANSITIONS is the state machine. A batch of orders is authorized with one
+query that locks the rows, then moved with one conditional UPDATE. Stock, the sales rollup
+and seller notifications are settled in the same transaction.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import record_status_change
+from .models import Order, SellerNotification
+from .notifications import mark_read
+from .reservations import commit_reservations, release_reservations
+
+MAX_TRANSITION_ORDERS = 500
+
+# fulfill_order delivers in one step from any open status
+FULFILLABLE_STATUSES = ['pending', 'confirmed', 'shipped']
+
+
+class TransitionConflict(Exception):
+    """Orders changed status between the authorization query and the update"""
+
+
+def sources_for(new_status):
+    """Statuses the state machine lets an order leave for new_status"""
+    return [status for status, targets in Order.STATUS_TRANSITIONS.items() if new_status in targets]
+
+
+def transition_orders(user, order_ids, new_status, from_statuses=None):
+    """
+    Move the given orders to new_status on behalf of a seller (their shop's orders) or an admin.
+    from_statuses defaults to the state machine's sources for new_status.
+    Returns (outcomes, updated): outcomes maps each order id to 'updated', 'not_found',
+    'forbidden' or the status that could not make the transition; updated lists the moved ids.
+    Raises TransitionConflict, leaving nothing written, when an order changed concurrently.
+    """
+    if from_statuses is None:
+        from_statuses = sources_for(new_status)
+    order_ids = list(dict.fromkeys(order_ids))
+
+    with transaction.atomic():
+        # One query authorizes the whole batch. Order rows (not their shop) are locked in id
+        # order, before any reservation, the same lock order as release_expired_reservations
+        rows = {
+            order_id: (current_status, owner_id)
+            for order_id, current_status, owner_id in Order.objects.select_for_update(of=('self',))
+            .filter(pk__in=order_ids).order_by('pk').values_list('pk', 'status', 'shop__owner_id')
+        }
+
+        outcomes = {}
+        previous_statuses = {}
+        for order_id in order_ids:
+            if order_id not in rows:
+                outcomes[order_id] = 'not_found'
+                continue
+            current_status, owner_id = rows[order_id]
+            if user.role != 'admin' and owner_id != user.id:
+                outcomes[order_id] = 'forbidden'
+            elif current_status not in from_statuses:
+                outcomes[order_id] = current_status
+            else:
+                outcomes[order_id] = 'updated'
+                previous_statuses[order_id] = current_status
+
+        updated = list(previous_statuses)
+        if not updated:
+            return outcomes, updated
+
+        changed = Order.objects.filter(pk__in=updated, status__in=from_statuses).update(
+            status=new_status, updated_at=timezone.now()
+        )
+        if changed != len(updated):
+            raise TransitionConflict(f'{len(updated) - changed} order(s) changed status concurrently')
+
+        record_status_change(previous_statuses, new_status)
+        if new_status == 'cancelled':
+            release_reservations(updated)
+        elif 'pending' in previous_statuses.values():
+            # Stock still on hold for an accepted order is now sold
+            commit_reservations(updated)
+        if new_status in ('delivered', 'cancelled'):
+            mark_read(SellerNotification.objects.filter(order_id__in=updated))
+
+    return outcomes, updated
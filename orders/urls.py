@@ -3,9 +3,15 @@ from . import views
 
 urlpatterns = [
     path('orders/', views.OrderListCreateView.as_view(), name='order-list-create'),
+    path('orders/checkout/', views.checkout, name='order-checkout'),
+    path('orders/transition/', views.bulk_transition_orders, name='order-bulk-transition'),
+    path('orders/export/', views.export_orders, name='order-export'),
     path('orders/<int:pk>/', views.OrderDetailView.as_view(), name='order-detail'),
     path('orders/<int:order_id>/fulfill/', views.fulfill_order, name='order-fulfill'),
+    path('analytics/sales/', views.sales_analytics, name='sales-analytics'),
+    path('flash-sales/<int:product_id>/', views.toggle_flash_sale, name='flash-sale-toggle'),
     path('notifications/', views.SellerNotificationListView.as_view(), name='seller-notifications'),
+    path('notifications/unread-count/', views.unread_notification_count, name='notification-unread-count'),
     path('notifications/<int:notification_id>/read/', views.mark_notification_read, name='mark-notification-read'),
     path('notifications/read-all/', views.mark_all_notifications_read, name='mark-all-notifications-read'),
 ]
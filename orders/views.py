@@ -1,26 +1,83 @@
-from rest_framework import generics, status
+from rest_framework import generics, serializers, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
-from django.db.models import Q
-from .models import Order, SellerNotification
-from .serializers import OrderSerializer, OrderCreateSerializer, SellerNotificationSerializer
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from django.db.models import F, Prefetch
+from shops.models import Shop
+from .analytics import ANALYTICS_RANGES, SALES_STATUSES, sales_summary
+from .models import Order, OrderItem, SellerNotification
+from .notifications import mark_read, unread_count
+from .reservations import InsufficientStock
+from .transitions import FULFILLABLE_STATUSES, TransitionConflict, transition_orders
+from .flash_sale import (
+    FlashSaleUnavailable, active_flash_sale_ids, cache_is_shared, claim, end_flash_sale, ensure_flusher,
+    start_flash_sale
+)
+from .serializers import (
+    CheckoutSerializer, OrderSerializer, OrderCreateSerializer, OrderTransitionSerializer, SellerNotificationSerializer
+)
+from weshop.conditional import ConditionalGetMixin
+from weshop.fieldsets import SparseFieldsetViewMixin
+from weshop.exports import EXPORT_FORMATS, parse_time_bound, stream_export
 from django.views.generic import TemplateView
 
+# Orders embed product and shop names
+ORDER_VALIDATOR_FIELDS = ['updated_at', 'shop__updated_at', 'items__product__updated_at']
 
-class OrderListCreateView(generics.ListCreateAPIView):
+
+def orders_visible_to(user):
+    if user.role == 'admin':
+        return Order.objects.all()
+    elif user.role == 'seller':
+        # Orders placed with seller's shop, on the denormalized shop column: a subquery, no join
+        return Order.objects.filter(shop_id__in=Shop.objects.filter(owner=user).values('pk'))
+    else:  # buyer
+        return Order.objects.filter(buyer=user)
+
+
+def filter_orders(orders, params):
+    """Apply ?status=a,b, ?shop=<id>, and ?since=/?until= given as dates or datetimes"""
+    statuses = [part for value in params.getlist('status') for part in value.split(',') if part]
+    if statuses:
+        valid_statuses = dict(Order.ORDER_STATUS_CHOICES)
+        unknown = [value for value in statuses if value not in valid_statuses]
+        if unknown:
+            raise ValidationError({'status': f'Unknown status: {", ".join(unknown)}'})
+        orders = orders.filter(status__in=statuses)
+
+    shop_id = params.get('shop')
+    if shop_id:
+        if not shop_id.isdigit():
+            raise ValidationError({'shop': 'Must be a shop id'})
+        orders = orders.filter(shop_id=shop_id)
+
+    try:
+        if params.get('since'):
+            orders = orders.filter(created_at__gte=parse_time_bound(params['since']))
+        if params.get('until'):
+            orders = orders.filter(created_at__lte=parse_time_bound(params['until'], end_of_day=True))
+    except ValueError as e:
+        raise ValidationError({'date': str(e)})
+    return orders
+
+
+def with_items(orders):
+    return orders.select_related('buyer', 'shop', 'product').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('id'))
+    )
+
+
+class OrderListCreateView(ConditionalGetMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
+    validator_fields = ORDER_VALIDATOR_FIELDS
     
     def get_queryset(self):
-        user = self.request.user
-        
-        if user.role == 'admin':
-            return Order.objects.all()
-        elif user.role == 'seller':
-            # Orders containing products from seller's shop
-            return Order.objects.filter(product__shop__owner=user)
-        else:  # buyer
-            return Order.objects.filter(buyer=user)
+        orders = with_items(orders_visible_to(self.request.user))
+        if self.request.method == 'GET':
+            orders = filter_orders(orders, self.request.query_params)
+        return orders
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -32,63 +89,160 @@ class OrderListCreateView(generics.ListCreateAPIView):
         if request.user.role != 'buyer':
             return Response({'error': 'Only buyers can create orders'}, 
                           status=status.HTTP_403_FORBIDDEN)
-        return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product = serializer.validated_data['product']
+        if product.pk not in active_flash_sale_ids():
+            self.perform_create(serializer)
+            headers = self.get_success_headers(serializer.data)
+            return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
-class OrderDetailView(generics.RetrieveAPIView):
+        # Hot item: claim from the cache counter; the order row is written by the flusher
+        if not cache_is_shared():
+            ensure_flusher()
+        try:
+            claim_number = claim(
+                product,
+                serializer.validated_data['quantity'],
+                request.user,
+                serializer.validated_data.get('buyer_phone', ''),
+                serializer.validated_data.get('buyer_message', '')
+            )
+        except InsufficientStock:
+            return Response({'non_field_errors': ['Insufficient stock']}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {'status': 'queued', 'claim': claim_number, 'product': product.pk,
+             'quantity': serializer.validated_data['quantity']},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+class OrderDetailView(ConditionalGetMixin, SparseFieldsetViewMixin, generics.RetrieveAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    validator_fields = ORDER_VALIDATOR_FIELDS
     
     def get_queryset(self):
-        user = self.request.user
-        
-        if user.role == 'admin':
-            return Order.objects.all()
-        elif user.role == 'seller':
-            return Order.objects.filter(product__shop__owner=user)
-        else:  # buyer
-            return Order.objects.filter(buyer=user)
+        return with_items(orders_visible_to(self.request.user))
+
+
+ORDER_EXPORT_COLUMNS = [
+    'id', 'created_at', 'status', 'shop_id', 'shop_name', 'product_id', 'product_sku', 'product_name', 'quantity',
+    'total_price', 'buyer_username', 'buyer_phone', 'buyer_message'
+]
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_orders(request):
+    """Stream the caller's orders as CSV or NDJSON (?output=, status=, shop=, since=, until=)"""
+    export_format = request.query_params.get('output', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return Response({'error': f'output must be one of {", ".join(EXPORT_FORMATS)}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    orders = filter_orders(orders_visible_to(request.user), request.query_params)
+    rows = orders.order_by('created_at', 'id').values(
+        'id', 'created_at', 'status', 'shop_id', 'product_id', 'quantity', 'total_price', 'buyer_phone', 'buyer_message',
+        shop_name=F('shop__name'),
+        product_sku=F('product__sku'),
+        product_name=F('product__name'),
+        buyer_username=F('buyer__username')
+    ).iterator(chunk_size=2000)
+    return stream_export(rows, ORDER_EXPORT_COLUMNS, export_format, 'orders', request=request)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def checkout(request):
+    """
+    Place a multi-item order in one transaction: {"items": [{"product": id, "quantity": n}, ...],
+    "buyer_phone": "", "buyer_message": ""}. Creates one order per shop.
+    """
+    if request.user.role != 'buyer':
+        return Response({'error': 'Only buyers can create orders'}, status=status.HTTP_403_FORBIDDEN)
+    serializer = CheckoutSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    orders = serializer.save()
+    return Response({'orders': OrderSerializer(orders, many=True).data}, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def toggle_flash_sale(request, product_id):
+    """Start or end flash-sale checkout for one of the seller's products ({"active": true|false})"""
+    from products.models import Product
+    try:
+        product = Product.objects.select_related('shop').get(id=product_id)
+    except Product.DoesNotExist:
+        return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    user = request.user
+    if not (user.role == 'admin' or (user.role == 'seller' and product.shop.owner_id == user.id)):
+        return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+
+    active = serializers.BooleanField().to_internal_value(request.data.get('active', True))
+    if active:
+        try:
+            start_flash_sale(product)
+        except FlashSaleUnavailable as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    else:
+        end_flash_sale(product)
+    product.refresh_from_db(fields=['stock_quantity'])
+    return Response({'product': product.pk, 'flash_sale': active, 'stock_quantity': product.stock_quantity})
 
 
-class SellerNotificationListView(generics.ListAPIView):
+class NotificationCursorPagination(CursorPagination):
+    page_size = 20
+    ordering = ('-created_at', '-id')
+
+
+class SellerNotificationListView(SparseFieldsetViewMixin, generics.ListAPIView):
+    """Newest first, cursor-paginated so polling never counts the feed; ?unread=true for unread only"""
     serializer_class = SellerNotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = NotificationCursorPagination
     
     def get_queryset(self):
-        # Only sellers can view their notifications
-        if self.request.user.role != 'seller':
+        # Sellers see order alerts; admins receive broadcast shop alerts
+        if self.request.user.role not in ('seller', 'admin'):
             return SellerNotification.objects.none()
-        return SellerNotification.objects.filter(seller=self.request.user)
+        notifications = SellerNotification.objects.filter(seller=self.request.user).select_related(
+            'order__product', 'order__buyer'
+        )
+        if self.request.query_params.get('unread') in ('1', 'true'):
+            notifications = notifications.filter(is_read=False)
+        return notifications
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def unread_notification_count(request):
+    """Unread notifications for the current user, read from the counter loaded with the user"""
+    if request.user.role not in ('seller', 'admin'):
+        return Response({'unread': 0})
+    return Response({'unread': unread_count(request.user)})
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def mark_notification_read(request, notification_id):
     """Mark a notification as read"""
-    try:
-        notification = SellerNotification.objects.get(
-            id=notification_id, 
-            seller=request.user
-        )
-        notification.is_read = True
-        notification.save()
-        return Response({'status': 'success'})
-    except SellerNotification.DoesNotExist:
+    notifications = SellerNotification.objects.filter(id=notification_id, seller=request.user)
+    if not mark_read(notifications) and not notifications.exists():
         return Response({'error': 'Notification not found'}, 
                        status=status.HTTP_404_NOT_FOUND)
+    return Response({'status': 'success'})
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def mark_all_notifications_read(request):
-    """Mark all notifications as read for the current seller"""
-    if request.user.role != 'seller':
-        return Response({'error': 'Only sellers can mark notifications'}, 
+    """Mark all notifications as read for the current seller or admin"""
+    if request.user.role not in ('seller', 'admin'):
+        return Response({'error': 'Only sellers and admins can mark notifications'}, 
                        status=status.HTTP_403_FORBIDDEN)
     
-    SellerNotification.objects.filter(
-        seller=request.user, 
-        is_read=False
-    ).update(is_read=True)
+    mark_read(SellerNotification.objects.filter(seller=request.user))
     
     return Response({'status': 'success'})
 
@@ -96,26 +250,87 @@ def mark_all_notifications_read(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def fulfill_order(request, order_id):
-    """Mark an order as delivered and mark related notifications read"""
+    """Mark an open order as delivered and mark related notifications read"""
     try:
-        order = Order.objects.get(id=order_id)
-    except Order.DoesNotExist:
-        return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+        outcomes, _ = transition_orders(request.user, [order_id], 'delivered', from_statuses=FULFILLABLE_STATUSES)
+    except TransitionConflict:
+        return Response({'error': 'Order was changed by another request, please retry'},
+                        status=status.HTTP_409_CONFLICT)
 
-    # Only seller of the product's shop or admin can fulfill
-    user = request.user
-    if not (user.role == 'admin' or (user.role == 'seller' and order.product.shop.owner_id == user.id)):
+    outcome = outcomes[order_id]
+    if outcome == 'not_found':
+        return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+    if outcome == 'forbidden':
         return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+    if outcome != 'updated':
+        return Response({'error': f'Order is already {outcome}'}, status=status.HTTP_409_CONFLICT)
 
-    # Update order status
-    order.status = 'delivered'
-    order.save()
+    # Everything the response serializes, in two queries
+    order = with_items(Order.objects.filter(id=order_id)).get()
+    return Response({'status': 'success', 'order': OrderSerializer(order).data})
 
-    # Mark related notifications as read
-    SellerNotification.objects.filter(order=order, seller=order.product.shop.owner, is_read=False).update(is_read=True)
 
-    return Response({'status': 'success', 'order': OrderSerializer(order).data})
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_transition_orders(request):
+    """
+    Move many orders to one status: {"orders": [id, ...], "status": "confirmed|shipped|delivered|cancelled"}.
+    Answers with an outcome per order; cancelling gives the orders' stock back.
+    """
+    if request.user.role not in ('seller', 'admin'):
+        return Response({'error': 'Only sellers and admins can update orders'}, status=status.HTTP_403_FORBIDDEN)
+    serializer = OrderTransitionSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    new_status = serializer.validated_data['status']
+
+    try:
+        outcomes, updated = transition_orders(request.user, serializer.validated_data['orders'], new_status)
+    except TransitionConflict as e:
+        return Response({'error': f'{e}, please retry'}, status=status.HTTP_409_CONFLICT)
+
+    results = []
+    for order_id, outcome in outcomes.items():
+        if outcome == 'updated':
+            results.append({'order': order_id, 'outcome': 'updated', 'status': new_status})
+        elif outcome in ('not_found', 'forbidden'):
+            results.append({'order': order_id, 'outcome': outcome})
+        else:
+            results.append({'order': order_id, 'outcome': 'invalid_transition', 'status': outcome,
+                            'error': f'Cannot move a {outcome} order to {new_status}'})
+    return Response({'status': new_status, 'updated': len(updated), 'results': results})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sales_analytics(request):
+    """
+    Revenue, units and order lines for the seller's shop over ?range=90|365 days, with daily
+    moving averages and a comparison against the preceding period. Admins pass ?shop=<id>;
+    ?status=a,b overrides the statuses counted as sales.
+    """
+    user = request.user
+    params = request.query_params
+    if user.role == 'admin':
+        shop_id = params.get('shop', '')
+        if not shop_id.isdigit():
+            return Response({'error': 'shop is required'}, status=status.HTTP_400_BAD_REQUEST)
+        shop_id = int(shop_id)
+    elif user.role == 'seller' and hasattr(user, 'shop'):
+        shop_id = user.shop.pk
+    else:
+        return Response({'error': 'Only sellers can view sales analytics'}, status=status.HTTP_403_FORBIDDEN)
+
+    days = params.get('range', str(ANALYTICS_RANGES[0]))
+    if not days.isdigit() or int(days) not in ANALYTICS_RANGES:
+        return Response({'error': f'range must be one of {", ".join(map(str, ANALYTICS_RANGES))}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    statuses = [part for part in params.get('status', '').split(',') if part] or SALES_STATUSES
+    unknown = [value for value in statuses if value not in dict(Order.ORDER_STATUS_CHOICES)]
+    if unknown:
+        return Response({'error': f'Unknown status: {", ".join(unknown)}'}, status=status.HTTP_400_BAD_REQUEST)
 
+    return Response(sales_summary(shop_id, int(days), statuses=statuses))
 
 
 class FrontendAppView(TemplateView):
@@ -0,0 +1,147 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 6 * 60 * 60
+CLAIM_LEASE_SECONDS = 10 * 60
+
+
+def enqueue_email(subject, message, recipient_list, html_message=None, from_email=None):
+    """Queue an email for the delivery worker; call inside the request's transaction"""
+    recipients = [address for address in recipient_list if address]
+    if not recipients:
+        return None
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=message,
+        html_body=html_message or '',
+        from_email=from_email or getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@weshop.com'),
+        recipients=recipients,
+    )
+
+
+def enqueue_emails(messages):
+    """Queue many emails with one bulk insert; each message is a dict of enqueue_email arguments"""
+    default_from = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@weshop.com')
+    rows = []
+    for message in messages:
+        recipients = [address for address in message['recipient_list'] if address]
+        if recipients:
+            rows.append(OutgoingEmail(
+                subject=message['subject'],
+                body=message['message'],
+                html_body=message.get('html_message') or '',
+                from_email=message.get('from_email') or default_from,
+                recipients=recipients,
+            ))
+    return OutgoingEmail.objects.bulk_create(rows)
+
+
+def retry_delay(attempts):
+    """Exponential backoff after the given number of failed attempts"""
+    base = getattr(settings, 'EMAIL_OUTBOX_BACKOFF_SECONDS', DEFAULT_BACKOFF_SECONDS)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS))
+
+
+def claim_batch(batch_size):
+    """Lease up to batch_size due emails so concurrent workers skip them"""
+    now = timezone.now()
+    with transaction.atomic():
+        due = (
+            OutgoingEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='queued', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        ids = list(due)
+        if ids:
+            OutgoingEmail.objects.filter(pk__in=ids).update(
+                next_attempt_at=now + timedelta(seconds=CLAIM_LEASE_SECONDS)
+            )
+    return list(OutgoingEmail.objects.filter(pk__in=ids).order_by('pk'))
+
+
+def _build_message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.recipients,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def _record_failure(email, exc, max_attempts):
+    """Schedule a retry with backoff, or dead-letter the email; returns True when dead-lettered"""
+    attempts = email.attempts + 1
+    failed = attempts >= max_attempts
+    OutgoingEmail.objects.filter(pk=email.pk).update(
+        attempts=attempts,
+        status='failed' if failed else 'queued',
+        next_attempt_at=timezone.now() + retry_delay(attempts),
+        last_error=f'{type(exc).__name__}: {exc}',
+    )
+    if failed:
+        logger.error('Giving up on outgoing email %s after %s attempts: %s', email.pk, attempts, exc)
+    return failed
+
+
+def deliver_batch(batch_size=50, max_attempts=None):
+    """Send one claimed batch over a single backend connection; returns (sent, retried, dead)"""
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0, 0
+
+    sent_ids = []
+    retried = dead = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        # Server unreachable: every email in the batch counts one failed attempt
+        for email in emails:
+            if _record_failure(email, exc, max_attempts):
+                dead += 1
+            else:
+                retried += 1
+        return 0, retried, dead
+
+    try:
+        for email in emails:
+            try:
+                _build_message(email, connection).send()
+            except Exception as exc:
+                if _record_failure(email, exc, max_attempts):
+                    dead += 1
+                else:
+                    retried += 1
+            else:
+                sent_ids.append(email.pk)
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            logger.exception('Failed to close email connection')
+
+    if sent_ids:
+        OutgoingEmail.objects.filter(pk__in=sent_ids).update(
+            status='sent', sent_at=timezone.now(), last_error=''
+        )
+    return len(sent_ids), retried, dead
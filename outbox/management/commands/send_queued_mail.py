@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from outbox.mail import deliver_batch
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outgoing emails in batches over one connection per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--max-attempts', type=int, default=None,
+                            help='Attempts before an email is dead-lettered (default EMAIL_OUTBOX_MAX_ATTEMPTS or 5)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when the queue is empty')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep between polls in --loop mode')
+
+    def handle(self, *args, **options):
+        totals = [0, 0, 0]
+        while True:
+            sent, retried, dead = deliver_batch(options['batch_size'], options['max_attempts'])
+            totals = [totals[0] + sent, totals[1] + retried, totals[2] + dead]
+            if sent or retried or dead:
+                self.stdout.write(f'Batch: {sent} sent, {retried} to retry, {dead} dead-lettered')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {totals[0]} sent, {totals[1]} to retry, {totals[2]} dead-lettered'
+        ))
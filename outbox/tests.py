@@ -0,0 +1,114 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .mail import CLAIM_LEASE_SECONDS, claim_batch, deliver_batch, enqueue_email, enqueue_emails
+from .models import OutgoingEmail
+
+
+class BouncingBackend(EmailBackend):
+    """Local-memory backend that refuses mail for bounce@ addresses"""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any(address.startswith('bounce@') for address in message.to):
+                raise ConnectionError('550 mailbox unavailable')
+        return super().send_messages(messages)
+
+
+class UnreachableBackend(EmailBackend):
+    def open(self):
+        raise ConnectionRefusedError('smtp.example.com:587 refused')
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', EMAIL_OUTBOX_BACKOFF_SECONDS=30)
+class OutboxDeliveryTests(TestCase):
+    def queue(self, *recipients):
+        return [enqueue_email(f'Hello {address}', 'body', [address]) for address in recipients]
+
+    def make_due(self):
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+    def test_batch_goes_over_one_connection(self):
+        enqueue_emails([
+            {'subject': f'Order {index}', 'message': 'body', 'recipient_list': [f'buyer{index}@example.com', '']}
+            for index in range(3)
+        ] + [{'subject': 'Nobody', 'message': 'body', 'recipient_list': ['']}])
+        self.assertEqual(OutgoingEmail.objects.count(), 3)
+
+        with mock.patch('outbox.mail.get_connection', wraps=get_connection) as connections:
+            self.assertEqual(deliver_batch(batch_size=10), (3, 0, 0))
+        connections.assert_called_once()
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         ['buyer0@example.com', 'buyer1@example.com', 'buyer2@example.com'])
+        self.assertEqual(set(OutgoingEmail.objects.values_list('status', flat=True)), {'sent'})
+
+        # Nothing left to claim
+        self.assertEqual(deliver_batch(batch_size=10), (0, 0, 0))
+
+    @override_settings(EMAIL_BACKEND='outbox.tests.BouncingBackend')
+    def test_failed_send_is_retried_with_backoff(self):
+        bounced, delivered = self.queue('bounce@example.com', 'buyer@example.com')
+        started = timezone.now()
+        self.assertEqual(deliver_batch(max_attempts=5), (1, 1, 0))
+
+        bounced.refresh_from_db()
+        self.assertEqual((bounced.status, bounced.attempts), ('queued', 1))
+        self.assertIn('550 mailbox unavailable', bounced.last_error)
+        self.assertGreaterEqual(bounced.next_attempt_at, started + timedelta(seconds=30))
+        # Not due yet
+        self.assertEqual(deliver_batch(max_attempts=5), (0, 0, 0))
+
+        self.make_due()
+        started = timezone.now()
+        self.assertEqual(deliver_batch(max_attempts=5), (0, 1, 0))
+        bounced.refresh_from_db()
+        self.assertEqual(bounced.attempts, 2)
+        self.assertGreaterEqual(bounced.next_attempt_at, started + timedelta(seconds=60))
+        self.assertEqual([message.to for message in mail.outbox], [['buyer@example.com']])
+
+    @override_settings(EMAIL_BACKEND='outbox.tests.BouncingBackend')
+    def test_dead_letter_after_max_attempts(self):
+        bounced, = self.queue('bounce@example.com')
+        self.assertEqual(deliver_batch(max_attempts=2), (0, 1, 0))
+        self.make_due()
+        self.assertEqual(deliver_batch(max_attempts=2), (0, 0, 1))
+
+        bounced.refresh_from_db()
+        self.assertEqual((bounced.status, bounced.attempts), ('failed', 2))
+        self.make_due()
+        self.assertEqual(deliver_batch(max_attempts=2), (0, 0, 0))
+
+    @override_settings(EMAIL_BACKEND='outbox.tests.UnreachableBackend')
+    def test_unreachable_server_counts_an_attempt_for_the_whole_batch(self):
+        self.queue('one@example.com', 'two@example.com')
+        self.assertEqual(deliver_batch(max_attempts=5), (0, 2, 0))
+        self.assertEqual(set(OutgoingEmail.objects.values_list('attempts', flat=True)), {1})
+
+    def test_lease_hides_claimed_rows_until_it_expires(self):
+        self.queue('one@example.com', 'two@example.com')
+        claimed = claim_batch(10)
+        self.assertEqual(len(claimed), 2)
+        self.assertGreater(claimed[0].next_attempt_at, timezone.now() + timedelta(seconds=CLAIM_LEASE_SECONDS - 60))
+        # A second worker finds nothing while the lease runs
+        self.assertEqual(claim_batch(10), [])
+
+        # The first worker died: once the lease runs out the rows are claimed again and sent once
+        self.make_due()
+        self.assertEqual(deliver_batch(batch_size=10), (2, 0, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(set(OutgoingEmail.objects.values_list('attempts', 'status')), {(0, 'sent')})
+
+    def test_command_drains_the_queue_in_batches(self):
+        self.queue(*[f'buyer{index}@example.com' for index in range(5)])
+        out = StringIO()
+        call_command('send_queued_mail', '--batch-size', '2', stdout=out)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertIn('Done: 5 sent, 0 to retry, 0 dead-lettered', out.getvalue())
@@ -8,3 +8,17 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ('name', 'shop__name')
     ordering = ('-created_at',)
     readonly_fields = ('created_at', 'updated_at')
+
+    def save_model(self, request, obj, form, change):
+        if not (change and 'stock_quantity' in form.changed_data):
+            return super().save_model(request, obj, form, change)
+        from orders.reservations import adjust_stock
+        # The edit is applied as a difference, so orders placed since the form loaded still count
+        # and a running flash sale's counter moves with it
+        delta = obj.stock_quantity - form.initial['stock_quantity']
+        obj.save(update_fields=[
+            field.name for field in obj._meta.concrete_fields
+            if not field.primary_key and field.name != 'stock_quantity'
+        ])
+        adjust_stock(obj.pk, delta)
+        obj.refresh_from_db(fields=['stock_quantity'])
@@ -0,0 +1,25 @@
+from django.core.checks import Tags, Warning, register
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+
+from .search import missing_search_structures
+
+
+@register(Tags.database)
+def check_search_index(app_configs, databases=None, **kwargs):
+    """
+    `manage.py check --database default`: the full-text search structures exist. A warning, not
+    an error, so that `migrate` still runs and its post_migrate handler repairs them.
+    """
+    warnings = []
+    for alias in databases or []:
+        if ('products', '0005_product_search') not in MigrationRecorder(connections[alias]).applied_migrations():
+            continue
+        missing = missing_search_structures(alias)
+        if missing:
+            warnings.append(Warning(
+                f'Product search is missing {", ".join(missing)} in database {alias!r}',
+                hint='Run `python manage.py migrate` or `python manage.py rebuild_product_search`',
+                id='products.W001',
+            ))
+    return warnings
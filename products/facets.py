@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from django.db.models import Count, Q
+
+from .models import Product
+
+# (key, lower bound inclusive, upper bound exclusive)
+PRICE_BUCKETS = [
+    ('0-25', None, Decimal('25')),
+    ('25-50', Decimal('25'), Decimal('50')),
+    ('50-100', Decimal('50'), Decimal('100')),
+    ('100-250', Decimal('100'), Decimal('250')),
+    ('250-500', Decimal('250'), Decimal('500')),
+    ('500+', Decimal('500'), None),
+]
+
+
+def _price_condition(lower, upper):
+    condition = Q()
+    if lower is not None:
+        condition &= Q(price__gte=lower)
+    if upper is not None:
+        condition &= Q(price__lt=upper)
+    return condition
+
+
+def compute_facets(queryset):
+    """
+    Category, price-bucket and stock counts for a filtered Product queryset.
+    One GROUP BY category query with conditional counts; the other facets are summed from its rows.
+    """
+    aggregates = {'total': Count('id')}
+    for key, lower, upper in PRICE_BUCKETS:
+        aggregates[f'price_{key}'] = Count('id', filter=_price_condition(lower, upper))
+    aggregates['in_stock'] = Count('id', filter=Q(stock_quantity__gt=0))
+
+    rows = list(queryset.order_by().values('category').annotate(**aggregates))
+
+    labels = dict(Product.CATEGORY_CHOICES)
+    return {
+        'category': [
+            {'value': row['category'], 'label': labels.get(row['category'], row['category']), 'count': row['total']}
+            for row in sorted(rows, key=lambda row: (-row['total'], row['category']))
+        ],
+        'price': [
+            {
+                'value': key,
+                'min': lower,
+                'max': upper,
+                'count': sum(row[f'price_{key}'] for row in rows),
+            }
+            for key, lower, upper in PRICE_BUCKETS
+        ],
+        'availability': {
+            'in_stock': sum(row['in_stock'] for row in rows),
+            'out_of_stock': sum(row['total'] - row['in_stock'] for row in rows),
+        },
+    }
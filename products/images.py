@@ -0,0 +1,133 @@
+"""
+Resized product image variants.
+
+Variants are rendered outside the request by the ``process_product_images`` command and
+stored next to the original as ``<name>_<size>.<ext>``. ``Product.image_variants_source``
+records which upload they were made from, so a re-uploaded image is picked up again and
+its stale variants removed.
+"""
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F, Q
+from django.utils import timezone
+
+from weshop.cache import invalidate_catalog
+
+# size name -> longest edge in pixels; originals are never upscaled
+VARIANT_SIZES = {
+    'thumbnail': 160,
+    'card': 480,
+    'full': 1200,
+}
+
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def pending_products(queryset):
+    """Products with an image whose variants are missing or were made from an older upload"""
+    return queryset.exclude(Q(image='') | Q(image__isnull=True)).exclude(image_variants_source=F('image'))
+
+
+def variant_name(image_name, size, extension):
+    root, _ = os.path.splitext(image_name)
+    return f'{root}_{size}.{extension}'
+
+
+def render_variants(image_name):
+    """
+    Render and store every variant of one stored image.
+    Runs in pool workers, so it touches storage only, never the database.
+    Returns {size: {'width', 'height', <format>: storage name}}.
+    """
+    from PIL import Image, ImageOps
+
+    with default_storage.open(image_name, 'rb') as original:
+        image = Image.open(original)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    variants = {}
+    for size, edge in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((edge, edge), Image.LANCZOS)
+        entry = {'width': resized.width, 'height': resized.height}
+        for extension, (pil_format, options) in VARIANT_FORMATS.items():
+            frame = resized.convert('RGB') if pil_format == 'JPEG' else resized
+            buffer = io.BytesIO()
+            frame.save(buffer, pil_format, **options)
+            name = variant_name(image_name, size, extension)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            entry[extension] = default_storage.save(name, ContentFile(buffer.getvalue()))
+        variants[size] = entry
+    return variants
+
+
+def _render_safely(image_name):
+    try:
+        return image_name, render_variants(image_name), None
+    except Exception as exc:
+        return image_name, None, f'{type(exc).__name__}: {exc}'
+
+
+def variant_files(variants):
+    return {
+        name
+        for entry in (variants or {}).values()
+        for extension, name in entry.items()
+        if extension in VARIANT_FORMATS
+    }
+
+
+def process_batch(queryset, batch_size=50, workers=None):
+    """
+    Render variants for up to batch_size pending products of queryset.
+    Returns (processed product ids, [(product id, error)]).
+    """
+    from .models import Product
+
+    batch = list(pending_products(queryset).order_by('pk').values('pk', 'image', 'image_variants')[:batch_size])
+    if not batch:
+        return [], []
+
+    names = [row['image'] for row in batch]
+    if workers == 1 or len(batch) == 1:
+        rendered = [_render_safely(name) for name in names]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rendered = list(pool.map(_render_safely, names))
+
+    processed, failed = [], []
+    for row, (image_name, variants, error) in zip(batch, rendered):
+        if error:
+            # Mark the upload as handled so a broken file is not retried forever
+            if Product.objects.filter(pk=row['pk'], image=image_name).update(
+                image_variants={}, image_variants_source=image_name
+            ):
+                for name in variant_files(row['image_variants']):
+                    default_storage.delete(name)
+            failed.append((row['pk'], error))
+            continue
+        # Guarded on the image name: a re-upload during rendering leaves the row pending
+        updated = Product.objects.filter(pk=row['pk'], image=image_name).update(
+            image_variants=variants, image_variants_source=image_name, updated_at=timezone.now()
+        )
+        stale = variant_files(row['image_variants']) - variant_files(variants)
+        if not updated:
+            stale = variant_files(variants)
+        for name in stale:
+            default_storage.delete(name)
+        if updated:
+            processed.append(row['pk'])
+    invalidate_catalog(product_ids=processed)
+    return processed, failed
@@ -0,0 +1,163 @@
+"""
+Bulk product import keyed by seller SKU.
+
+Rows are read lazily from CSV or JSON Lines, validated a batch at a time and written with
+one upsert (bulk_create on the shop/sku constraint) per batch, so memory stays bounded by
+the batch size.
+"""
+import csv
+import io
+import json
+from decimal import Decimal
+
+from django.db import transaction
+from rest_framework import serializers
+
+from orders.flash_sale import adjust_counters
+from weshop.cache import invalidate_catalog
+
+from .models import Product
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+IMPORT_FIELDS = ['sku', 'name', 'description', 'price', 'stock_quantity', 'category', 'is_active']
+UPDATE_FIELDS = ['name', 'description', 'price', 'stock_quantity', 'category', 'is_active']
+# Columns a row must fill in when its SKU is new; rows for existing SKUs may leave any out
+CREATE_FIELDS = ['name', 'description', 'price']
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFormatError(Exception):
+    pass
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    """
+    One import row. A plain Serializer, reused for every row via run_validation(): a
+    ModelSerializer per row rebuilds its fields and constraint validators each time.
+    CREATE_FIELDS are required only for new SKUs, checked once the batch's SKUs are looked up.
+    """
+    sku = serializers.CharField(max_length=64)
+    name = serializers.CharField(max_length=200, required=False)
+    description = serializers.CharField(required=False)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), required=False)
+    stock_quantity = serializers.IntegerField(min_value=0, required=False)
+    category = serializers.ChoiceField(choices=Product.CATEGORY_CHOICES, required=False)
+    is_active = serializers.BooleanField(required=False)
+
+
+def detect_format(filename, requested=None):
+    file_format = (requested or filename.rsplit('.', 1)[-1]).lower()
+    if file_format in ('ndjson', 'json'):
+        file_format = 'jsonl'
+    if file_format not in IMPORT_FORMATS:
+        raise ImportFormatError(f'Unsupported import format: {file_format} (use csv or jsonl)')
+    return file_format
+
+
+def iter_rows(stream, file_format):
+    """Yield (line number, row dict) from a binary stream without reading it all into memory"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, exc
+            continue
+        yield line_number, row if isinstance(row, dict) else ValueError('Expected a JSON object')
+
+
+def _report_error(report, line_number, sku, errors):
+    report['error_count'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append({'row': line_number, 'sku': sku, 'errors': errors})
+
+
+def _import_batch(shop, batch, report, validator):
+    # sku -> (line number of its last row, validated columns)
+    valid = {}
+    for line_number, row in batch:
+        sku = None
+        if isinstance(row, Exception):
+            errors = {'non_field_errors': [str(row)]}
+        else:
+            sku = row.get('sku')
+            # Blank CSV cells mean "use the default", not "empty string"
+            row = {key: value for key, value in row.items() if key in IMPORT_FIELDS and value not in ('', None)}
+            try:
+                data = validator.run_validation(row)
+            except serializers.ValidationError as exc:
+                errors = exc.detail
+            else:
+                # A SKU repeated within the batch merges its rows, later columns winning
+                earlier = valid.get(data['sku'], (None, {}))[1]
+                valid[data['sku']] = (line_number, {**earlier, **data})
+                continue
+        _report_error(report, line_number, sku, errors)
+
+    if not valid:
+        return
+
+    with transaction.atomic():
+        # Existing values fill in columns a row leaves out, and let unchanged rows be skipped
+        existing = {
+            row['sku']: row
+            for row in Product.objects.filter(shop=shop, sku__in=list(valid)).values('pk', 'sku', *UPDATE_FIELDS)
+        }
+        writes, updated_ids, stock_changes = [], [], {}
+        for sku, (line_number, data) in valid.items():
+            current = existing.get(sku)
+            if current is None:
+                missing = [field for field in CREATE_FIELDS if field not in data]
+                if missing:
+                    _report_error(report, line_number, sku,
+                                  {field: ['This field is required for a new SKU.'] for field in missing})
+                    continue
+            else:
+                data = {**{field: current[field] for field in UPDATE_FIELDS}, **data}
+                if all(data[field] == current[field] for field in UPDATE_FIELDS):
+                    report['unchanged'] += 1
+                    continue
+                updated_ids.append(current['pk'])
+                stock_changes[current['pk']] = data['stock_quantity'] - current['stock_quantity']
+            writes.append(Product(shop=shop, **data))
+        if writes:
+            Product.objects.bulk_create(
+                writes,
+                update_conflicts=True,
+                unique_fields=['shop', 'sku'],
+                update_fields=UPDATE_FIELDS + ['updated_at'],
+            )
+            # Products on flash sale move their counters by the same amounts
+            adjust_counters(stock_changes)
+            invalidate_catalog(shop_ids=[shop.pk], product_ids=updated_ids)
+
+    report['created'] += len(writes) - len(updated_ids)
+    report['updated'] += len(updated_ids)
+
+
+def import_products(shop, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Create or update shop's products from (line number, row) pairs, matching on sku.
+    Valid rows are saved batch by batch; returns counts and a per-row error report.
+    """
+    report = {'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'error_count': 0, 'errors': []}
+    validator = ProductImportRowSerializer()
+    batch = []
+    for item in rows:
+        report['rows'] += 1
+        batch.append(item)
+        if len(batch) >= batch_size:
+            _import_batch(shop, batch, report, validator)
+            batch = []
+    if batch:
+        _import_batch(shop, batch, report, validator)
+    return report
@@ -0,0 +1,90 @@
+import random
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from products.models import Product
+from products.search import search_products
+from shops.models import Shop
+
+ADJECTIVES = ['wireless', 'organic', 'leather', 'vintage', 'compact', 'smart', 'ceramic', 'waterproof',
+              'handmade', 'portable', 'bamboo', 'stainless', 'cotton', 'ergonomic', 'solar', 'classic']
+NOUNS = ['headphones', 'teapot', 'backpack', 'lamp', 'speaker', 'jacket', 'notebook', 'blender',
+         'sneakers', 'charger', 'blanket', 'mug', 'keyboard', 'tent', 'bicycle', 'watch', 'novel', 'puzzle']
+FILLER = ['great', 'quality', 'everyday', 'gift', 'durable', 'lightweight', 'premium', 'design',
+          'home', 'travel', 'office', 'outdoor', 'kids', 'fast', 'shipping', 'warranty']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark product full-text search against a LIKE scan over a synthetic catalog (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def _time(self, label, queries, build):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            list(build(query)[:20])
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f'{label:<12} p50 {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms   '
+            f'{len(timings) / (sum(timings) / 1000):8.1f} queries/s'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        categories = [choice for choice, _ in Product.CATEGORY_CHOICES]
+
+        with transaction.atomic():
+            username = f'search-bench-{uuid.uuid4().hex[:8]}'
+            # Email is unique: a blank one collides with any existing user without an address
+            owner = get_user_model().objects.create_user(
+                username=username, email=f'{username}@bench.invalid', password=None, role='seller'
+            )
+            shop = Shop.objects.create(name='Search Benchmark', owner=owner, verification_status='verified')
+
+            started = time.perf_counter()
+            batch = []
+            for index in range(options['products']):
+                batch.append(Product(
+                    shop=shop,
+                    name=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {index}',
+                    description=' '.join(rng.choices(FILLER + ADJECTIVES + NOUNS, k=25)),
+                    price=Decimal(rng.randint(100, 100000)) / 100,
+                    stock_quantity=rng.randint(0, 50),
+                    category=rng.choice(categories),
+                ))
+                if len(batch) == 5000:
+                    Product.objects.bulk_create(batch)
+                    batch = []
+            Product.objects.bulk_create(batch)
+            self.stdout.write(f'Inserted {options["products"]} products in {time.perf_counter() - started:.1f}s')
+
+            queries = [
+                ' '.join(rng.sample(ADJECTIVES + NOUNS, k=rng.choice([1, 2])))
+                for _ in range(options['queries'])
+            ]
+            catalog = Product.objects.filter(is_active=True)
+
+            def like_scan(query):
+                condition = Q()
+                for term in query.split():
+                    condition &= Q(name__icontains=term) | Q(description__icontains=term) | Q(category__icontains=term)
+                return catalog.filter(condition)
+
+            self._time('full-text', queries, lambda query: search_products(catalog, query).order_by('-search_rank'))
+            self._time('LIKE scan', queries, like_scan)
+
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Benchmark data rolled back'))
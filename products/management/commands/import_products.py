@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.imports import DEFAULT_BATCH_SIZE, ImportFormatError, detect_format, import_products, iter_rows
+from shops.models import Shop
+
+
+class Command(BaseCommand):
+    help = 'Create or update a shop\'s products from a CSV or JSON Lines file, matched by sku'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--shop', type=int, required=True, help='Shop id the products belong to')
+        parser.add_argument('--type', choices=['csv', 'jsonl'], help='File format (default: from the extension)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            shop = Shop.objects.get(pk=options['shop'])
+            file_format = detect_format(options['path'], options['type'])
+        except Shop.DoesNotExist:
+            raise CommandError(f'Shop {options["shop"]} not found')
+        except ImportFormatError as exc:
+            raise CommandError(str(exc))
+
+        started = time.monotonic()
+        with open(options['path'], 'rb') as stream:
+            report = import_products(shop, iter_rows(stream, file_format), options['batch_size'])
+        elapsed = time.monotonic() - started
+
+        for error in report['errors']:
+            self.stderr.write(f'Row {error["row"]} ({error["sku"] or "no sku"}): {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{report["rows"]} rows in {elapsed:.1f}s: {report["created"]} created, '
+            f'{report["updated"]} updated, {report["unchanged"]} unchanged, {report["error_count"]} rejected'
+        ))
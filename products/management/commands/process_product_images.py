@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.images import process_batch
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Render resized WebP/JPEG variants for product images that are new or were re-uploaded'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes per batch (default: one per CPU; 1 renders in-process)')
+        parser.add_argument('--product', type=int, action='append', dest='products',
+                            help='Only process this product id (repeatable)')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Regenerate variants for every selected product, not just pending ones')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new uploads instead of exiting')
+        parser.add_argument('--interval', type=float, default=10.0, help='Seconds to sleep between polls in --loop mode')
+
+    def handle(self, *args, **options):
+        queryset = Product.objects.all()
+        if options['products']:
+            queryset = queryset.filter(pk__in=options['products'])
+        if options['rebuild']:
+            queryset.update(image_variants_source='')
+
+        processed_total = failed_total = 0
+        while True:
+            processed, failed = process_batch(queryset, options['batch_size'], options['workers'])
+            processed_total += len(processed)
+            failed_total += len(failed)
+            for product_id, error in failed:
+                self.stderr.write(f'Product {product_id}: {error}')
+            if processed or failed:
+                self.stdout.write(f'Batch: {len(processed)} processed, {len(failed)} failed')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {processed_total} processed, {failed_total} failed'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from products.search import install_search_index
+
+
+class Command(BaseCommand):
+    help = 'Recreate the full-text search index for products (FTS5 on SQLite, tsvector/GIN on Postgres)'
+
+    def handle(self, *args, **options):
+        with connection.schema_editor() as schema_editor:
+            install_search_index(schema_editor)
+        self.stdout.write(self.style.SUCCESS(f'Product search index rebuilt ({connection.vendor})'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_category_product_image'),
+        ('shops', '0010_shop_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['shop'], name='product_active_shop_idx'),
+        ),
+    ]
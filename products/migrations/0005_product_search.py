@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from products.search import drop_search_index, install_search_index
+
+
+def install(apps, schema_editor):
+    install_search_index(schema_editor)
+
+
+def uninstall(apps, schema_editor):
+    drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_active_shop_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
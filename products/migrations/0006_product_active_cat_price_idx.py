@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_search'),
+        ('shops', '0010_shop_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'category', 'price'], name='product_active_cat_price_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:19
+
+from django.db import migrations, models
+
+from products.search import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    # SQLite rebuilds products_product to add these columns, which drops the FTS triggers
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_active_cat_price_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_variants_source',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:32
+
+from django.db import migrations, models
+
+from products.search import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    # SQLite rebuilds products_product to add the unique constraint, which drops the FTS triggers
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_image_variants'),
+        ('shops', '0010_shop_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('shop', 'sku'), name='product_shop_sku_uniq'),
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
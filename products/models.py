@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from .search import FTS_TABLE, FullTextDocumentField
+
 class Product(models.Model):
     CATEGORY_CHOICES = [
         ('electronics', 'Electronics'),
@@ -16,12 +18,17 @@ class Product(models.Model):
     ]
     
     name = models.CharField(max_length=200)
+    # Seller's own stock-keeping code; bulk imports match existing products on it
+    sku = models.CharField(max_length=64, blank=True, null=True)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     shop = models.ForeignKey('shops.Shop', on_delete=models.CASCADE, related_name='products')
     stock_quantity = models.PositiveIntegerField(default=0)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='other')
     image = models.ImageField(upload_to='product_images/', blank=True, null=True)
+    # Resized copies written by products.images; only valid while image_variants_source == image
+    image_variants = models.JSONField(default=dict, blank=True)
+    image_variants_source = models.CharField(max_length=255, blank=True, default='')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -31,3 +38,29 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Backs the shop directory's has_products filter
+            models.Index(fields=['shop'], condition=models.Q(is_active=True), name='product_active_shop_idx'),
+            # Backs category/price filtering and the facet aggregate
+            models.Index(fields=['is_active', 'category', 'price'], name='product_active_cat_price_idx'),
+        ]
+        constraints = [
+            # NULLs never collide, so products without a SKU are unaffected; also the bulk import's upsert target
+            models.UniqueConstraint(fields=['shop', 'sku'], name='product_shop_sku_uniq'),
+        ]
+
+
+class ProductSearchDocument(models.Model):
+    """
+    A product's row in the SQLite FTS5 index (products.search), for joining by rowid.
+    Read-only; the table and its triggers come from migrations, and Postgres has no such table.
+    """
+    product = models.OneToOneField(
+        Product, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', db_constraint=False,
+        related_name='search_document'
+    )
+    document = FullTextDocumentField(db_column=FTS_TABLE)
+
+    class Meta:
+        managed = False
+        db_table = FTS_TABLE
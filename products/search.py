@@ -0,0 +1,172 @@
+"""
+Full-text product search.
+
+Postgres keeps a weighted tsvector in a generated ``search_vector`` column with a GIN
+index, matched through RawSQL. SQLite keeps an FTS5 table in sync through triggers and
+reaches it through the unmanaged ProductSearchDocument model, joined by rowid. Both are
+created by migration 0005; a post_migrate handler reinstalls whatever a later table
+rebuild dropped.
+"""
+import re
+
+from django.db import connection, connections, models, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import BooleanField, F, FloatField, Func, Lookup, Q, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'products_product_fts'
+
+SQLITE_FTS_STATEMENTS = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, description, category, content='products_product', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON products_product BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, description, category) "
+    "VALUES (new.id, new.name, new.description, new.category); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON products_product BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, category) "
+    "VALUES ('delete', old.id, old.name, old.description, old.category); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, description, category "
+    f"ON products_product BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, category) "
+    "VALUES ('delete', old.id, old.name, old.description, old.category); "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, description, category) "
+    "VALUES (new.id, new.name, new.description, new.category); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_FTS_DROP_STATEMENTS = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+POSTGRES_SEARCH_STATEMENTS = [
+    "ALTER TABLE products_product ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')) STORED",
+    'CREATE INDEX IF NOT EXISTS product_search_vector_idx ON products_product USING GIN (search_vector)',
+]
+
+POSTGRES_SEARCH_DROP_STATEMENTS = [
+    'DROP INDEX IF EXISTS product_search_vector_idx',
+    'ALTER TABLE products_product DROP COLUMN IF EXISTS search_vector',
+]
+
+
+class FullTextMatch(Lookup):
+    """``document__match=<FTS5 query>``"""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+class FullTextDocumentField(models.TextField):
+    """FTS5's hidden column named after its table; MATCH against it searches every column"""
+
+
+FullTextDocumentField.register_lookup(FullTextMatch)
+
+
+class BM25(Func):
+    """FTS5 relevance of a matched row, lower is better; one weight per indexed column"""
+    function = 'bm25'
+    output_field = FloatField()
+
+
+def install_search_index(schema_editor):
+    """
+    Create (or repair) the backend's search structures.
+    SQLite table rebuilds during later migrations drop triggers, so those migrations call this again.
+    """
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_SEARCH_STATEMENTS, 'sqlite': SQLITE_FTS_STATEMENTS}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_SEARCH_DROP_STATEMENTS, 'sqlite': SQLITE_FTS_DROP_STATEMENTS}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def missing_search_structures(using='default'):
+    """Names of the search table, triggers, column or index the database lacks"""
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        expected = [FTS_TABLE, f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au']
+        sql = "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s"
+        params = [f'{FTS_TABLE}%']
+    elif connection.vendor == 'postgresql':
+        expected = ['search_vector', 'product_search_vector_idx']
+        sql = (
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = 'products_product' AND column_name = 'search_vector' "
+            "UNION ALL SELECT indexname FROM pg_indexes "
+            "WHERE tablename = 'products_product' AND indexname = 'product_search_vector_idx'"
+        )
+        params = []
+    else:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        present = {row[0] for row in cursor.fetchall()}
+    return [name for name in expected if name not in present]
+
+
+def repair_search_index(sender, using='default', **kwargs):
+    """
+    post_migrate handler: reinstall the search structures once migration 0005 has run. SQLite
+    drops the FTS triggers whenever a migration rebuilds products_product.
+    """
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    if ('products', '0005_product_search') not in applied or not missing_search_structures(using):
+        return
+    statements = {'postgresql': POSTGRES_SEARCH_STATEMENTS, 'sqlite': SQLITE_FTS_STATEMENTS}[connection.vendor]
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())[:16]
+
+
+def search_products(queryset, query):
+    """Filter a Product queryset to matches for query, annotated with search_rank (higher is better)"""
+    terms = _terms(query)
+    if not terms:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    table = queryset.model._meta.db_table
+    if connection.vendor == 'postgresql':
+        tsquery = "plainto_tsquery('english', %s)"
+        text = ' '.join(terms)
+        return queryset.filter(
+            RawSQL(f'{table}.search_vector @@ {tsquery}', [text], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(f'ts_rank_cd({table}.search_vector, {tsquery})', [text], output_field=FloatField())
+        )
+
+    if connection.vendor == 'sqlite':
+        # Quote every term so user input can never form FTS5 syntax; the last term is a prefix
+        match = ' '.join(f'"{term}"' for term in terms[:-1])
+        match = f'{match} "{terms[-1]}"*'.strip()
+        # Join the FTS table once instead of probing it per row; bm25 is lower-is-better,
+        # weighted name over description over category
+        return queryset.filter(search_document__document__match=match).annotate(
+            search_rank=-BM25(F('search_document__document'), Value(10.0), Value(1.0), Value(4.0))
+        )
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(name__icontains=term) | Q(description__icontains=term) | Q(category__icontains=term)
+    return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
@@ -1,14 +1,53 @@
 from rest_framework import serializers
+from django.core.files.storage import default_storage
+from weshop.fieldsets import SparseFieldsetSerializerMixin
+from .images import VARIANT_FORMATS
 from .models import Product
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     shop_name = serializers.CharField(source='shop.name', read_only=True)
+    image_variants = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    sparse_field_sources = {
+        'shop_name': ['shop__name'],
+        'image_variants': ['image', 'image_variants', 'image_variants_source'],
+        'image_srcset': ['image', 'image_variants', 'image_variants_source'],
+    }
     
     class Meta:
         model = Product
-        fields = ['id', 'name', 'description', 'price', 'shop', 'shop_name', 'stock_quantity', 'category', 'image', 'is_active', 'created_at']
+        fields = ['id', 'sku', 'name', 'description', 'price', 'shop', 'shop_name', 'stock_quantity', 'category', 'image',
+                  'image_variants', 'image_srcset', 'is_active', 'created_at']
         read_only_fields = ['shop', 'created_at']
 
+    def _url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def _current_variants(self, obj):
+        # Variants of a replaced image are stale until the worker catches up
+        if not obj.image or obj.image_variants_source != obj.image.name:
+            return {}
+        return obj.image_variants or {}
+
+    def get_image_variants(self, obj):
+        return {
+            size: {
+                key: self._url(value) if key in VARIANT_FORMATS else value
+                for key, value in entry.items()
+            }
+            for size, entry in self._current_variants(obj).items()
+        }
+
+    def get_image_srcset(self, obj):
+        """One srcset string per format, e.g. {'webp': '<url> 160w, <url> 480w, ...'}"""
+        variants = sorted(self._current_variants(obj).values(), key=lambda entry: entry['width'])
+        return {
+            extension: ', '.join(f"{self._url(entry[extension])} {entry['width']}w" for entry in variants)
+            for extension in VARIANT_FORMATS
+        } if variants else {}
+
 class ProductCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from weshop.cache import forget_parent, invalidate_catalog
+
+from .models import Product
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_cached_product(sender, instance, **kwargs):
+    invalidate_catalog(product_ids=[instance.pk])
+    forget_parent('product', instance.pk)
@@ -0,0 +1,251 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.apps import apps
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from shops.models import Shop
+from users.models import User
+
+from .models import Product
+from .search import FTS_TABLE, missing_search_structures, repair_search_index, search_products
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user(username='cond-owner', email='cond-owner@example.com', role='seller')
+        self.shop = Shop.objects.create(name='Conditional Shop', owner=owner, verification_status='verified')
+        self.products = [
+            Product.objects.create(shop=self.shop, name=f'Item {index}', description='d', price=5, stock_quantity=1)
+            for index in range(3)
+        ]
+        # Authenticated, so the anonymous response cache stays out of the way
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(username='cond-buyer', email='cond-buyer@example.com', role='buyer')
+        )
+
+    def backdate(self, hours=1):
+        Product.objects.update(updated_at=timezone.now() - timedelta(hours=hours))
+        Shop.objects.update(updated_at=timezone.now() - timedelta(hours=hours))
+
+    def test_list_sends_etag_only(self):
+        self.backdate()
+        response = self.client.get('/api/products/')
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_list_is_not_modified_only_by_date(self):
+        # Deleting a row leaves MAX(updated_at) where it was
+        self.backdate()
+        etag = self.client.get('/api/products/')['ETag']
+        self.products[0].delete()
+
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        later = http_date((timezone.now() + timedelta(minutes=5)).timestamp())
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=later).status_code, 200)
+
+    def test_detail_last_modified_once_a_second_old(self):
+        url = f'/api/products/{self.products[0].pk}/'
+        self.backdate()
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        Product.objects.filter(pk=self.products[0].pk).update(name='Renamed', updated_at=timezone.now())
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 200)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        self.shops = [
+            Shop.objects.create(
+                name=f'Cached Shop {index}', verification_status='verified',
+                owner=User.objects.create_user(username=f'cache-owner{index}', email=f'cache-owner{index}@example.com',
+                                               role='seller'),
+            )
+            for index in range(2)
+        ]
+        self.products = [
+            Product.objects.create(shop=shop, name=f'Cached item {index}', description='d', price=5, stock_quantity=1)
+            for index, shop in enumerate(self.shops)
+        ]
+        self.client = APIClient()
+
+    def fetch(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['X-Cache'], response.data
+
+    def test_list_is_served_from_cache_until_a_product_changes(self):
+        self.assertEqual(self.fetch('/api/products/')[0], 'MISS')
+        self.assertEqual(self.fetch('/api/products/')[0], 'HIT')
+        self.assertEqual(self.fetch('/api/products/?category=other')[0], 'MISS')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.products[0].pk).update(name='Renamed')
+        # An update() sends no signal, so the entry is still served
+        self.assertEqual(self.fetch('/api/products/')[0], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].save()
+        state, data = self.fetch('/api/products/')
+        self.assertEqual(state, 'MISS')
+        self.assertIn('Cached item 0', [product['name'] for product in data['results']])
+
+    def test_shop_edit_bumps_one_counter_for_all_its_products(self):
+        urls = [f'/api/products/{product.pk}/' for product in self.products]
+        for url in urls:
+            self.assertEqual(self.fetch(url)[0], 'MISS')
+            self.assertEqual(self.fetch(url)[0], 'HIT')
+
+        shop = self.shops[0]
+        shop.name = 'Renamed Shop'
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as captured:
+            shop.save()
+        self.assertFalse([query for query in captured if 'products_product' in query['sql']])
+
+        state, data = self.fetch(urls[0])
+        self.assertEqual((state, data['shop_name']), ('MISS', 'Renamed Shop'))
+        # The other shop's product keeps its entry
+        self.assertEqual(self.fetch(urls[1])[0], 'HIT')
+
+    def test_hits_and_revalidation_run_no_query(self):
+        etags = {}
+        for url in ('/api/products/', f'/api/products/{self.products[0].pk}/'):
+            etags[url] = self.client.get(url)['ETag']
+            with self.assertNumQueries(0):
+                self.assertEqual(self.fetch(url)[0], 'HIT')
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etags[url]).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].save()
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual((response.status_code, response['X-Cache']), (200, 'MISS'))
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_signed_in_users_bypass_the_cache(self):
+        self.fetch('/api/products/')
+        self.client.force_authenticate(self.shops[0].owner)
+        response = self.client.get('/api/products/')
+        self.assertNotIn('X-Cache', response)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user(username='search-owner', email='search-owner@example.com', role='seller')
+        self.shop = Shop.objects.create(name='Search Shop', owner=owner, verification_status='verified')
+        self.teapot = self.add('Ceramic teapot', 'Holds four cups')
+        self.mug = self.add('Travel mug', 'Pairs well with a ceramic teapot')
+        self.add('Leather backpack', 'Fits a laptop')
+
+    def add(self, name, description):
+        return Product.objects.create(shop=self.shop, name=name, description=description, price=5, stock_quantity=1)
+
+    def search(self, query):
+        return list(search_products(Product.objects.all(), query).order_by('-search_rank').values_list('pk', flat=True))
+
+    def test_name_matches_rank_first_and_last_term_is_a_prefix(self):
+        self.assertEqual(self.search('teapot'), [self.teapot.pk, self.mug.pk])
+        self.assertEqual(self.search('ceramic tea'), [self.teapot.pk, self.mug.pk])
+        self.assertEqual(self.search('backpack teapot'), [])
+
+    def test_query_syntax_is_treated_as_words(self):
+        self.assertEqual(self.search('"mug" (*'), [self.mug.pk])
+        self.assertEqual(self.search('mug OR teapot'), [])
+        self.assertEqual(self.search('!!!'), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'FTS5 triggers are SQLite only')
+    def test_post_migrate_reinstalls_dropped_triggers(self):
+        # What a migration that rebuilds products_product leaves behind
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {FTS_TABLE}_ai')
+        self.assertEqual(missing_search_structures(), [f'{FTS_TABLE}_ai'])
+
+        repair_search_index(sender=apps.get_app_config('products'))
+        self.assertEqual(missing_search_structures(), [])
+        lamp = self.add('Brass lamp', 'Warm light')
+        self.assertEqual(self.search('lamp'), [lamp.pk])
+
+    @skipUnless(connection.vendor == 'postgresql', 'tsvector search is Postgres only')
+    def test_postgres_search_uses_the_gin_index(self):
+        self.assertEqual(missing_search_structures(), [])
+        queryset = search_products(Product.objects.all(), 'teapot')
+        with connection.cursor() as cursor:
+            # Tiny test tables always favour sequential scans; ask whether the index is usable
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        self.assertIn('product_search_vector_idx', plan)
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user(username='import-owner', email='import-owner@example.com', role='seller')
+        self.shop = Shop.objects.create(name='Import Shop', owner=owner, verification_status='verified')
+        self.mug = Product.objects.create(shop=self.shop, sku='MUG-1', name='Mug', description='Holds tea', price=6,
+                                          stock_quantity=4)
+        self.client = APIClient()
+        self.client.force_authenticate(owner)
+
+    def upload(self, filename, content):
+        response = self.client.post('/api/products/import/', {'file': SimpleUploadedFile(filename, content.encode())},
+                                    format='multipart')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def errors(self, report):
+        return sorted((error['row'], error['sku'], sorted(error['errors'])) for error in report['errors'])
+
+    def test_csv_partial_rows_update_existing_skus_only(self):
+        report = self.upload('catalog.csv', '\n'.join([
+            'sku,name,description,price,stock_quantity',
+            'MUG-1,,,,25',
+            'LAMP-1,Brass lamp,Warm light,12.50,3',
+            'LAMP-2,,,,5',
+            'LAMP-3,Bad lamp,Dim,-1,1',
+        ]))
+        self.assertEqual((report['rows'], report['created'], report['updated'], report['error_count']), (4, 1, 1, 2))
+        self.assertEqual(self.errors(report), [
+            (4, 'LAMP-2', ['description', 'name', 'price']),
+            (5, 'LAMP-3', ['price']),
+        ])
+
+        self.mug.refresh_from_db()
+        self.assertEqual((self.mug.stock_quantity, self.mug.name, self.mug.price), (25, 'Mug', 6))
+        lamp = Product.objects.get(shop=self.shop, sku='LAMP-1')
+        self.assertEqual((lamp.name, lamp.stock_quantity), ('Brass lamp', 3))
+        self.assertFalse(Product.objects.filter(sku__in=['LAMP-2', 'LAMP-3']).exists())
+
+    def test_jsonl_rows_merge_per_sku_and_report_bad_lines(self):
+        report = self.upload('catalog.jsonl', '\n'.join([
+            '{"sku": "MUG-1", "price": "7.50"}',
+            '{"sku": "MUG-1", "is_active": false}',
+            'not json',
+            '{"sku": "TRAY-1", "name": "Tray"}',
+            '{"sku": "TRAY-2", "name": "Big tray", "description": "Oak", "price": "20", "category": "other"}',
+            '{"sku": "MUG-1"}',
+        ]))
+        self.assertEqual((report['created'], report['updated'], report['error_count']), (1, 1, 2))
+        self.assertEqual(self.errors(report), [
+            (3, None, ['non_field_errors']),
+            (4, 'TRAY-1', ['description', 'price']),
+        ])
+        self.mug.refresh_from_db()
+        self.assertEqual((self.mug.price, self.mug.is_active, self.mug.stock_quantity), (Decimal('7.50'), False, 4))
+        self.assertTrue(Product.objects.filter(shop=self.shop, sku='TRAY-2', stock_quantity=0).exists())
+
+        # Nothing new: the row matches what is stored
+        report = self.upload('again.jsonl', '{"sku": "MUG-1", "price": "7.50"}')
+        self.assertEqual((report['updated'], report['unchanged']), (0, 1))
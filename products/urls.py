@@ -3,5 +3,7 @@ from . import views
 
 urlpatterns = [
     path('products/', views.ProductListCreateView.as_view(), name='product-list-create'),
+    path('products/export/', views.export_products, name='product-export'),
+    path('products/import/', views.bulk_import_products, name='product-bulk-import'),
     path('products/<int:pk>/', views.ProductDetailView.as_view(), name='product-detail'),
 ]
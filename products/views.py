@@ -1,13 +1,31 @@
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.parsers import MultiPartParser
 from django.db.models import Q
+from shops.models import Shop
 from .models import Product
 from .serializers import ProductSerializer, ProductCreateSerializer
+from .search import search_products
+from .facets import compute_facets
+from .imports import ImportFormatError, detect_format, import_products, iter_rows
+import csv
+from decimal import Decimal, InvalidOperation
+from rest_framework.exceptions import ValidationError
+from weshop.cache import AnonymousResponseCacheMixin, parent_id, version_key
+from weshop.conditional import ConditionalGetMixin
+from weshop.fieldsets import SparseFieldsetViewMixin
+from weshop.exports import EXPORT_FORMATS, stream_export
 from django.views.generic import TemplateView
 
 
-class ProductListCreateView(generics.ListCreateAPIView):
+class ProductListCreateView(ConditionalGetMixin, AnonymousResponseCacheMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView):
+    # Responses embed the shop name
+    validator_fields = ['updated_at', 'shop__updated_at']
+    
+    def get_cache_version_keys(self):
+        return [version_key('product_list')]
     
     def get_permissions(self):
         if self.request.method == 'GET':
@@ -19,6 +37,24 @@ class ProductListCreateView(generics.ListCreateAPIView):
         shop_id = self.request.query_params.get('shop', None)
         if shop_id:
             queryset = queryset.filter(shop_id=shop_id)
+        params = self.request.query_params
+        category = params.get('category')
+        if category:
+            queryset = queryset.filter(category__in=category.split(','))
+        try:
+            if params.get('min_price'):
+                queryset = queryset.filter(price__gte=Decimal(params['min_price']))
+            if params.get('max_price'):
+                queryset = queryset.filter(price__lt=Decimal(params['max_price']))
+        except InvalidOperation:
+            raise ValidationError({'price': 'min_price and max_price must be numbers'})
+        in_stock = params.get('in_stock')
+        if in_stock in ('true', 'false'):
+            queryset = queryset.filter(stock_quantity__gt=0) if in_stock == 'true' else queryset.filter(stock_quantity=0)
+        query = self.request.query_params.get('q', '').strip()
+        if query:
+            # Full-text match over name/category/description, best matches first
+            queryset = search_products(queryset, query).order_by('-search_rank', '-created_at')
         return queryset
     
     def get_serializer_class(self):
@@ -26,6 +62,13 @@ class ProductListCreateView(generics.ListCreateAPIView):
             return ProductCreateSerializer
         return ProductSerializer
     
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets') == 'true':
+            # Counts over the same filtered queryset as the page, in one aggregate query
+            response.data['facets'] = compute_facets(self.filter_queryset(self.get_queryset()))
+        return response
+    
     def create(self, request, *args, **kwargs):
         # Only sellers can create products
         if request.user.role != 'seller':
@@ -33,10 +76,76 @@ class ProductListCreateView(generics.ListCreateAPIView):
                           status=status.HTTP_403_FORBIDDEN)
         return super().create(request, *args, **kwargs)
 
-class ProductDetailView(generics.RetrieveAPIView):
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser])
+def bulk_import_products(request):
+    """Create or update the seller's products from an uploaded CSV or JSON Lines file, matched by sku"""
+    if request.user.role != 'seller':
+        return Response({'error': 'Only sellers can import products'}, status=status.HTTP_403_FORBIDDEN)
+    shop = Shop.objects.filter(owner=request.user).first()
+    if shop is None or shop.verification_status != 'verified':
+        return Response({'error': 'You must have a verified shop to import products'},
+                        status=status.HTTP_403_FORBIDDEN)
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Upload the import as multipart field "file"'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        file_format = detect_format(upload.name, request.query_params.get('type'))
+    except ImportFormatError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        report = import_products(shop, iter_rows(upload, file_format))
+    except (UnicodeDecodeError, csv.Error) as exc:
+        return Response({'error': f'Could not read import file: {exc}'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report)
+
+PRODUCT_EXPORT_COLUMNS = [
+    'id', 'sku', 'name', 'description', 'category', 'price', 'stock_quantity', 'is_active', 'created_at', 'updated_at'
+]
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_products(request):
+    """Stream the seller's catalog (admins: every shop, or ?shop=) as CSV or NDJSON (?output=)"""
+    export_format = request.query_params.get('output', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return Response({'error': f'output must be one of {", ".join(EXPORT_FORMATS)}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    if request.user.role == 'admin':
+        products = Product.objects.all()
+        columns = ['shop_id'] + PRODUCT_EXPORT_COLUMNS
+        shop_ids = [part for value in request.query_params.getlist('shop') for part in value.split(',') if part]
+        if shop_ids:
+            if not all(shop_id.isdigit() for shop_id in shop_ids):
+                return Response({'error': 'shop must be a list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+            products = products.filter(shop_id__in=shop_ids)
+    elif request.user.role == 'seller':
+        products = Product.objects.filter(shop__owner=request.user)
+        columns = PRODUCT_EXPORT_COLUMNS
+    else:
+        return Response({'error': 'Only sellers can export products'}, status=status.HTTP_403_FORBIDDEN)
+
+    rows = products.order_by('id').values(*columns).iterator(chunk_size=2000)
+    return stream_export(rows, columns, export_format, 'products', request=request)
+
+class ProductDetailView(ConditionalGetMixin, AnonymousResponseCacheMixin, SparseFieldsetViewMixin, generics.RetrieveAPIView):
     queryset = Product.objects.filter(is_active=True)
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]
+    validator_fields = ['updated_at', 'shop__updated_at']
+
+    def get_cache_version_keys(self):
+        pk = self.kwargs['pk']
+        keys = [version_key('product', pk)]
+        # The response embeds the shop name
+        shop_id = parent_id('product', pk, Product.objects.filter(pk=pk).values_list('shop_id', flat=True).first)
+        if shop_id is not None:
+            keys.append(version_key('shop', shop_id))
+        return keys
 
 from django.views.generic import View
 from django.http import HttpResponse
@@ -1,8 +1,9 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
 from django.urls import reverse
 from django.http import HttpResponseRedirect
 from .models import Shop
+from .verification import bulk_update_verification
 
 @admin.register(Shop)
 class ShopAdmin(admin.ModelAdmin):
@@ -11,6 +12,7 @@ class ShopAdmin(admin.ModelAdmin):
     search_fields = ('name', 'owner__username', 'description')
     ordering = ('-created_at',)
     readonly_fields = ('created_at', 'updated_at')
+    actions = ['bulk_verify', 'bulk_reject']
     
     def get_verification_status(self, obj):
         status_colors = {
@@ -60,12 +62,35 @@ class ShopAdmin(admin.ModelAdmin):
     
     def verify_shop(self, request, shop_id):
         shop = Shop.objects.get(pk=shop_id)
-        shop.verification_status = 'verified'
-        shop.save()
+        result, = bulk_update_verification([shop.pk], 'verify', request.user, ip_address=request.META.get('REMOTE_ADDR'))
         
-        self.message_user(request, f'Shop "{shop.name}" has been successfully verified!')
+        if result['success']:
+            self.message_user(request, f'Shop "{shop.name}" has been successfully verified!')
+        else:
+            self.message_user(request, f'Shop "{shop.name}" was not verified: {result["error"]}', level=messages.ERROR)
         return HttpResponseRedirect(reverse('admin:shops_shop_changelist'))
     
+    def _apply_bulk_verification(self, request, queryset, action):
+        results = bulk_update_verification(
+            list(queryset.values_list('pk', flat=True)), action, request.user,
+            ip_address=request.META.get('REMOTE_ADDR')
+        )
+        succeeded = [result for result in results if result['success']]
+        failed = [result for result in results if not result['success']]
+        if succeeded:
+            self.message_user(request, f'{len(succeeded)} shops {"verified" if action == "verify" else "rejected"}.')
+        if failed:
+            details = '; '.join(f'#{result["shop_id"]}: {result["error"]}' for result in failed[:20])
+            self.message_user(request, f'{len(failed)} shops skipped ({details})', level=messages.WARNING)
+    
+    @admin.action(description='Verify selected shops')
+    def bulk_verify(self, request, queryset):
+        self._apply_bulk_verification(request, queryset, 'verify')
+    
+    @admin.action(description='Reject selected shops')
+    def bulk_reject(self, request, queryset):
+        self._apply_bulk_verification(request, queryset, 'reject')
+    
     fieldsets = (
         ('Shop Information', {
             'fields': ('name', 'description', 'owner')
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from shops.uploads import expire_stale_uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned resumable document uploads and their partial files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-hours', type=float, default=None,
+                            help='Idle time before an unfinished upload expires (default DOCUMENT_UPLOAD_EXPIRY_HOURS or 24)')
+
+    def handle(self, *args, **options):
+        hours = options['older_than_hours']
+        uploads, files = expire_stale_uploads(None if hours is None else timedelta(hours=hours))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {uploads} stale uploads and {files} partial files'))
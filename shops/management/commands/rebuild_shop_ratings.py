@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from shops.ratings import rebuild_rating_summaries
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized shop rating summaries from ShopComment'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', type=int, action='append', dest='shop_ids',
+                            help='Only rebuild the given shop id (repeatable)')
+
+    def handle(self, *args, **options):
+        written = rebuild_rating_summaries(options['shop_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating summaries for {written} shops'))
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_rating_summaries(apps, schema_editor):
+    ShopComment = apps.get_model('shops', 'ShopComment')
+    ShopRatingSummary = apps.get_model('shops', 'ShopRatingSummary')
+    rows = ShopComment.objects.values('shop_id').annotate(
+        review_count=Count('id'),
+        rating_total=Sum('rating'),
+        **{f'stars_{star}': Count('id', filter=Q(rating=star)) for star in range(1, 6)}
+    ).order_by()
+    ShopRatingSummary.objects.bulk_create([ShopRatingSummary(**row) for row in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shops', '0006_productinquiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopRatingSummary',
+            fields=[
+                ('shop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to='shops.shop')),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_total', models.PositiveIntegerField(default=0)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_rating_summaries, migrations.RunPython.noop),
+    ]
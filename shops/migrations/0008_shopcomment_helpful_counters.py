@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:04
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_helpful_counts(apps, schema_editor):
+    ShopComment = apps.get_model('shops', 'ShopComment')
+    CommentHelpful = apps.get_model('shops', 'CommentHelpful')
+
+    def vote_count(is_helpful):
+        votes = CommentHelpful.objects.filter(comment=OuterRef('pk'), is_helpful=is_helpful)
+        counted = votes.order_by().values('comment').annotate(total=Count('id')).values('total')
+        return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+    ShopComment.objects.update(helpful_count=vote_count(True), not_helpful_count=vote_count(False))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shops', '0007_shopratingsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shopcomment',
+            name='helpful_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shopcomment',
+            name='not_helpful_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_helpful_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:10
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, FloatField, Value
+from django.db.models.functions import NullIf
+
+NAME_PREFIX_INDEX = 'shop_status_name_prefix_idx'
+
+
+def backfill_average_rating(apps, schema_editor):
+    ShopRatingSummary = apps.get_model('shops', 'ShopRatingSummary')
+    ShopRatingSummary.objects.update(average_rating=ExpressionWrapper(
+        F('rating_total') * Value(1.0) / NullIf(F('review_count'), 0), output_field=FloatField()
+    ))
+
+
+def create_name_prefix_index(apps, schema_editor):
+    # Case-insensitive prefix search (name__istartswith) needs a backend-specific index:
+    # Postgres compares UPPER(name) with LIKE, SQLite uses LIKE against a NOCASE column.
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX {NAME_PREFIX_INDEX} ON shops_shop (verification_status, UPPER(name) text_pattern_ops)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE INDEX {NAME_PREFIX_INDEX} ON shops_shop (verification_status, name COLLATE NOCASE)'
+        )
+
+
+def drop_name_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute(f'DROP INDEX IF EXISTS {NAME_PREFIX_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shops', '0009_documentupload'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shopratingsummary',
+            name='average_rating',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='shop',
+            index=models.Index(fields=['verification_status', '-created_at'], name='shop_status_created_idx'),
+        ),
+        migrations.RunPython(backfill_average_rating, migrations.RunPython.noop),
+        migrations.RunPython(create_name_prefix_index, drop_name_prefix_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shops', '0010_shop_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentupload',
+            name='block_digests',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
@@ -59,6 +59,10 @@ class Shop(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['verification_status', '-created_at'], name='shop_status_created_idx'),
+            # shop_status_name_prefix_idx (case-insensitive name prefix) is backend-specific, see migration 0010
+        ]
 
 class VerificationLog(models.Model):
     ACTION_CHOICES = [
@@ -81,6 +85,39 @@ class VerificationLog(models.Model):
     class Meta:
         ordering = ['-timestamp']
 
+class DocumentUpload(models.Model):
+    """Resumable chunked upload of one verification document, attached to the shop on completion"""
+    DOCUMENT_FIELD_CHOICES = [
+        ('business_license_document', 'Business License'),
+        ('tax_certificate', 'Tax Certificate'),
+        ('identity_document', 'Identity Document'),
+    ]
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='document_uploads')
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='document_uploads')
+    document_field = models.CharField(max_length=30, choices=DOCUMENT_FIELD_CHOICES)
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    received_size = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='uploading')
+    # SHA-256 of the SHA-256s of the document's 1 MiB blocks (see shops.uploads)
+    sha256 = models.CharField(max_length=64, blank=True)
+    # Hex SHA-256 of each complete block received so far, concatenated: the running digest
+    block_digests = models.TextField(blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.shop_id} {self.document_field} ({self.received_size}/{self.total_size})"
+
 class ShopComment(models.Model):
     shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -92,6 +129,9 @@ class ShopComment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_verified_purchase = models.BooleanField(default=False)
+    # Vote counters maintained by record_helpful_vote
+    helpful_count = models.PositiveIntegerField(default=0)
+    not_helpful_count = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['-created_at']
@@ -100,6 +140,27 @@ class ShopComment(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.shop.name} ({self.rating}★)"
 
+class ShopRatingSummary(models.Model):
+    """Denormalized review statistics for a shop, kept in step with ShopComment writes"""
+    shop = models.OneToOneField(Shop, on_delete=models.CASCADE, primary_key=True, related_name='rating_summary')
+    review_count = models.PositiveIntegerField(default=0)
+    rating_total = models.PositiveIntegerField(default=0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    # Stored rather than derived so the shop directory can sort by it through an index
+    average_rating = models.FloatField(null=True, blank=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def distribution(self):
+        return {str(star): getattr(self, f'stars_{star}') for star in range(1, 6)}
+
+    def __str__(self):
+        return f"{self.shop_id} - {self.average_rating} ({self.review_count} reviews)"
+
 class CommentHelpful(models.Model):
     comment = models.ForeignKey(ShopComment, on_delete=models.CASCADE, related_name='helpful_votes')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -0,0 +1,141 @@
+from django.db import transaction
+from django.db.models import (
+    Count, ExpressionWrapper, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+)
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+
+from weshop.cache import invalidate_catalog
+
+from .models import CommentHelpful, Shop, ShopComment, ShopRatingSummary
+
+STAR_VALUES = range(1, 6)
+
+
+def apply_rating_change(shop_id, old_rating=None, new_rating=None):
+    """Shift a shop's summary counters when a review is added, edited or removed"""
+    if old_rating == new_rating:
+        return
+
+    deltas = {}
+    if old_rating:
+        deltas['review_count'] = deltas.get('review_count', 0) - 1
+        deltas['rating_total'] = deltas.get('rating_total', 0) - old_rating
+        deltas[f'stars_{old_rating}'] = deltas.get(f'stars_{old_rating}', 0) - 1
+    if new_rating:
+        deltas['review_count'] = deltas.get('review_count', 0) + 1
+        deltas['rating_total'] = deltas.get('rating_total', 0) + new_rating
+        deltas[f'stars_{new_rating}'] = deltas.get(f'stars_{new_rating}', 0) + 1
+
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not updates:
+        return
+
+    # SET expressions read pre-update values, so the new average is computed from the deltas
+    count_delta = deltas.get('review_count', 0)
+    total_delta = deltas.get('rating_total', 0)
+    updates['average_rating'] = ExpressionWrapper(
+        (F('rating_total') + total_delta) * Value(1.0) / NullIf(F('review_count') + count_delta, 0),
+        output_field=FloatField()
+    )
+
+    # queryset.update() skips auto_now; conditional GETs of the shop rely on it
+    updates['updated_at'] = timezone.now()
+
+    if new_rating and not old_rating:
+        # First review for the shop creates its row
+        ShopRatingSummary.objects.get_or_create(shop_id=shop_id)
+    if not ShopRatingSummary.objects.filter(shop_id=shop_id).update(**updates):
+        # No row to shift (a shop from before the backfill, or a lost insert): recount the
+        # shop once this write is committed rather than drop the change
+        transaction.on_commit(lambda: repair_rating_summary(shop_id))
+
+
+def repair_rating_summary(shop_id):
+    """
+    Recount one shop's summary from its reviews and upsert it.
+    Skipped once the shop itself is gone, so a cascading shop delete never recreates the row.
+    """
+    with transaction.atomic():
+        # Repairs of one shop serialize on its row, so the last one sees every committed review
+        if not Shop.objects.select_for_update().filter(pk=shop_id).exists():
+            return
+        row = ShopComment.objects.filter(shop_id=shop_id).aggregate(
+            review_count=Count('id'),
+            rating_total=Coalesce(Sum('rating'), 0),
+            **{f'stars_{star}': Count('id', filter=Q(rating=star)) for star in STAR_VALUES}
+        )
+        summary = ShopRatingSummary(
+            shop_id=shop_id,
+            average_rating=row['rating_total'] / row['review_count'] if row['review_count'] else None,
+            **row
+        )
+        ShopRatingSummary.objects.bulk_create(
+            [summary],
+            update_conflicts=True,
+            unique_fields=['shop'],
+            update_fields=['review_count', 'rating_total', 'average_rating', 'updated_at',
+                           *[f'stars_{star}' for star in STAR_VALUES]],
+        )
+    invalidate_catalog(shop_ids=[shop_id])
+
+
+def rebuild_rating_summaries(shop_ids=None):
+    """Recompute summaries from ShopComment with one grouped aggregate; returns rows written"""
+    comments = ShopComment.objects.all()
+    if shop_ids is not None:
+        comments = comments.filter(shop_id__in=shop_ids)
+
+    aggregates = comments.values('shop_id').annotate(
+        review_count=Count('id'),
+        rating_total=Sum('rating'),
+        **{f'stars_{star}': Count('id', filter=Q(rating=star)) for star in STAR_VALUES}
+    ).order_by()
+
+    summaries = [
+        ShopRatingSummary(average_rating=row['rating_total'] / row['review_count'], **row)
+        for row in aggregates
+    ]
+
+    with transaction.atomic():
+        stale = ShopRatingSummary.objects.all()
+        if shop_ids is not None:
+            stale = stale.filter(shop_id__in=shop_ids)
+        stale.delete()
+        ShopRatingSummary.objects.bulk_create(summaries, batch_size=500)
+        invalidate_catalog(shop_ids=shop_ids or (), all_shops=shop_ids is None)
+
+    return len(summaries)
+
+
+def _vote_count_subquery(is_helpful):
+    votes = CommentHelpful.objects.filter(comment=OuterRef('pk'), is_helpful=is_helpful)
+    counted = votes.order_by().values('comment').annotate(total=Count('id')).values('total')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def refresh_helpful_counts(comments):
+    """Recount helpful/not-helpful votes for the given ShopComment queryset in one UPDATE"""
+    return comments.update(
+        helpful_count=_vote_count_subquery(True),
+        not_helpful_count=_vote_count_subquery(False),
+    )
+
+
+def record_helpful_vote(comment_id, user, is_helpful):
+    """Upsert a user's vote and refresh the review's counters; returns None if the review is gone"""
+    with transaction.atomic():
+        # Votes on one review serialize on its row lock, so the recount sees every committed vote
+        locked = list(ShopComment.objects.select_for_update().filter(pk=comment_id).values_list('pk', flat=True))
+        if not locked:
+            return None
+
+        vote = CommentHelpful(comment_id=comment_id, user=user, is_helpful=is_helpful)
+        CommentHelpful.objects.bulk_create(
+            [vote],
+            update_conflicts=True,
+            unique_fields=['comment', 'user'],
+            update_fields=['is_helpful'],
+        )
+        refresh_helpful_counts(ShopComment.objects.filter(pk=comment_id))
+    return vote
@@ -1,10 +1,33 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Shop, VerificationLog, ShopComment, CommentHelpful, ProductInquiry
+from .models import (
+    Shop, VerificationLog, ShopComment, CommentHelpful, ProductInquiry, ShopRatingSummary, DocumentUpload
+)
+from .uploads import DEFAULT_CHUNK_SIZE, max_document_size
+from .ratings import record_helpful_vote
+from .verification import submit_documents_if_complete
+from orders.notifications import broadcast_notification, create_notifications
+from weshop.fieldsets import SparseFieldsetSerializerMixin
 
-class ShopSerializer(serializers.ModelSerializer):
+LATEST_LOG_COUNT = 5
+
+class ShopSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     owner_username = serializers.CharField(source='owner.username', read_only=True)
     documents_complete = serializers.BooleanField(read_only=True)
     verification_logs = serializers.SerializerMethodField()
+    average_rating = serializers.SerializerMethodField()
+    review_count = serializers.SerializerMethodField()
+    rating_distribution = serializers.SerializerMethodField()
+    sparse_field_sources = {
+        'owner_username': ['owner__username'],
+        'is_verified': ['verification_status'],
+        'documents_complete': [
+            'business_license_document', 'tax_certificate', 'identity_document', 'business_license_number', 'tax_id',
+        ],
+        'average_rating': ['rating_summary__average_rating'],
+        'review_count': ['rating_summary__review_count'],
+        'rating_distribution': [f'rating_summary__stars_{star}' for star in range(1, 6)],
+    }
     
     class Meta:
         model = Shop
@@ -14,15 +37,60 @@ class ShopSerializer(serializers.ModelSerializer):
             'business_phone', 'business_email',
             'joined_fee_paid', 'verification_status', 'is_verified',
             'documents_complete', 'verified_by', 'verified_at',
-            'rejection_reason', 'created_at', 'verification_logs'
+            'rejection_reason', 'created_at', 'verification_logs',
+            'average_rating', 'review_count', 'rating_distribution'
         ]
         read_only_fields = [
             'owner', 'verification_status', 'verified_by', 
             'verified_at', 'created_at', 'documents_complete'
         ]
     
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Join owner and rating summary, and fetch the latest logs for every shop in one windowed query"""
+        latest_logs = VerificationLog.objects.select_related('performed_by')[:LATEST_LOG_COUNT]
+        return queryset.select_related('owner', 'rating_summary').prefetch_related(
+            Prefetch('verification_logs', queryset=latest_logs, to_attr='latest_verification_logs')
+        )
+
     def get_verification_logs(self, obj):
-        return VerificationLogSerializer(obj.verification_logs.all()[:5], many=True).data
+        logs = getattr(obj, 'latest_verification_logs', None)
+        if logs is None:
+            logs = obj.verification_logs.select_related('performed_by')[:LATEST_LOG_COUNT]
+        return VerificationLogSerializer(logs, many=True).data
+
+    def _rating_summary(self, obj):
+        # Views select_related('rating_summary'), so a missing row costs no query
+        try:
+            return obj.rating_summary
+        except ShopRatingSummary.DoesNotExist:
+            return None
+
+    def get_average_rating(self, obj):
+        summary = self._rating_summary(obj)
+        if summary is None or summary.average_rating is None:
+            return None
+        return round(summary.average_rating, 2)
+
+    def get_review_count(self, obj):
+        summary = self._rating_summary(obj)
+        return summary.review_count if summary else 0
+
+    def get_rating_distribution(self, obj):
+        summary = self._rating_summary(obj)
+        if summary:
+            return summary.distribution
+        return {str(star): 0 for star in range(1, 6)}
+
+class ShopListSerializer(ShopSerializer):
+    """List representation without the per-shop audit log"""
+
+    class Meta(ShopSerializer.Meta):
+        fields = [field for field in ShopSerializer.Meta.fields if field != 'verification_logs']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('owner', 'rating_summary')
 
 class ShopCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -54,23 +122,31 @@ class ShopDocumentUploadSerializer(serializers.ModelSerializer):
     
     def update(self, instance, validated_data):
         shop = super().update(instance, validated_data)
-        
-        # Update status if documents are complete
-        if shop.documents_complete and shop.verification_status == 'pending':
-            shop.verification_status = 'documents_submitted'
-            shop.save()
-            
-            # Create audit log
-            VerificationLog.objects.create(
-                shop=shop,
-                action='documents_submitted',
-                performed_by=self.context['request'].user,
-                notes='All required documents submitted',
-                ip_address=self.context['request'].META.get('REMOTE_ADDR')
-            )
-        
+        request = self.context['request']
+        submit_documents_if_complete(shop, request.user, request.META.get('REMOTE_ADDR'))
         return shop
 
+class DocumentUploadSerializer(serializers.ModelSerializer):
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DocumentUpload
+        fields = [
+            'id', 'shop', 'document_field', 'filename', 'total_size',
+            'received_size', 'status', 'sha256', 'chunk_size', 'created_at'
+        ]
+        read_only_fields = ['shop', 'received_size', 'status', 'sha256', 'created_at']
+
+    def get_chunk_size(self, obj):
+        return DEFAULT_CHUNK_SIZE
+
+    def validate_total_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('File is empty')
+        if value > max_document_size():
+            raise serializers.ValidationError(f'File exceeds the {max_document_size()} byte limit')
+        return value
+
 class ShopVerificationSerializer(serializers.ModelSerializer):
     verification_notes = serializers.CharField(write_only=True, required=False)
     
@@ -99,32 +175,60 @@ class ShopVerificationSerializer(serializers.ModelSerializer):
             notes=verification_notes or f'Status changed from {old_status} to {shop.verification_status}',
             ip_address=self.context['request'].META.get('REMOTE_ADDR')
         )
+
+        if shop.verification_status in ('verified', 'rejected') and old_status != shop.verification_status:
+            broadcast_notification(
+                [shop.owner_id],
+                notification_type=f'shop_{shop.verification_status}',
+                title=f'Shop {shop.get_verification_status_display()} - {shop.name}',
+                message=shop.rejection_reason or f'Your shop "{shop.name}" is now {shop.verification_status}.'
+            )
         
         return shop
 
+class ShopBulkVerificationSerializer(serializers.Serializer):
+    shop_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    action = serializers.ChoiceField(choices=['verify', 'reject'])
+    rejection_reason = serializers.CharField(required=False, allow_blank=True, default='')
+    verification_notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+class ShopCommentListSerializer(serializers.ListSerializer):
+    """Loads the requesting user's votes for the whole page in one query"""
+
+    def to_representation(self, data):
+        comments = list(data.all() if hasattr(data, 'all') else data)
+        request = self.context.get('request')
+        votes = {}
+        if request and request.user.is_authenticated and comments:
+            votes = dict(CommentHelpful.objects.filter(
+                user=request.user,
+                comment_id__in=[comment.pk for comment in comments]
+            ).values_list('comment_id', 'is_helpful'))
+        self.child._user_votes = votes
+        return super().to_representation(comments)
+
 class ShopCommentSerializer(serializers.ModelSerializer):
     user_username = serializers.CharField(source='user.username', read_only=True)
-    helpful_count = serializers.SerializerMethodField()
     user_found_helpful = serializers.SerializerMethodField()
     
     class Meta:
         model = ShopComment
+        list_serializer_class = ShopCommentListSerializer
         fields = [
             'id', 'shop', 'user', 'user_username', 'rating', 'comment',
             'created_at', 'updated_at', 'is_verified_purchase',
-            'helpful_count', 'user_found_helpful'
+            'helpful_count', 'not_helpful_count', 'user_found_helpful'
         ]
-        read_only_fields = ['user', 'created_at', 'updated_at']
-    
-    def get_helpful_count(self, obj):
-        return obj.helpful_votes.filter(is_helpful=True).count()
+        read_only_fields = ['user', 'created_at', 'updated_at', 'helpful_count', 'not_helpful_count']
     
     def get_user_found_helpful(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            helpful_vote = obj.helpful_votes.filter(user=request.user).first()
-            return helpful_vote.is_helpful if helpful_vote else None
-        return None
+        if not (request and request.user.is_authenticated):
+            return None
+        votes = getattr(self, '_user_votes', None)
+        if votes is None:
+            votes = dict(obj.helpful_votes.filter(user=request.user).values_list('comment_id', 'is_helpful'))
+        return votes.get(obj.pk)
     
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
@@ -137,18 +241,11 @@ class CommentHelpfulSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'created_at']
     
     def create(self, validated_data):
-        validated_data['user'] = self.context['request'].user
-        # Update or create helpful vote
-        comment = validated_data['comment']
-        user = validated_data['user']
-        is_helpful = validated_data['is_helpful']
-        
-        helpful_vote, created = CommentHelpful.objects.update_or_create(
-            comment=comment,
-            user=user,
-            defaults={'is_helpful': is_helpful}
+        return record_helpful_vote(
+            validated_data['comment'].pk,
+            self.context['request'].user,
+            validated_data.get('is_helpful', True)
         )
-        return helpful_vote
 
 class VerificationLogSerializer(serializers.ModelSerializer):
     performed_by_username = serializers.CharField(source='performed_by.username', read_only=True)
@@ -187,11 +284,13 @@ class ProductInquirySerializer(serializers.ModelSerializer):
         
     def validate_product_id(self, value):
         from products.models import Product
-        try:
-            product = Product.objects.get(id=value)
+        # The view passes the product it already loaded
+        product = self.context.get('product')
+        if product is not None and product.pk == value:
             return value
-        except Product.DoesNotExist:
+        if not Product.objects.filter(id=value).exists():
             raise serializers.ValidationError("Invalid product ID")
+        return value
     
     def create(self, validated_data):
         request = self.context.get('request')
@@ -205,11 +304,15 @@ class ProductInquirySerializer(serializers.ModelSerializer):
                 'product': 'Product ID is required'
             })
             
-        # Get the product and shop
+        # Get the product and shop, reusing the ones the view already loaded
         from products.models import Product
+        product = self.context.get('product')
+        shop = self.context.get('shop')
         try:
-            product = Product.objects.get(id=product_id)
-            shop = Shop.objects.get(id=view.kwargs.get('shop_id'))
+            if product is None or product.pk != int(product_id):
+                product = Product.objects.get(id=product_id)
+            if shop is None:
+                shop = Shop.objects.select_related('owner').get(id=view.kwargs.get('shop_id'))
         except (Product.DoesNotExist, Shop.DoesNotExist) as e:
             raise serializers.ValidationError({
                 'product': 'Invalid product or shop'
@@ -226,27 +329,39 @@ class ProductInquirySerializer(serializers.ModelSerializer):
         )
 
         # Also create a pending order and seller notification so both sides can track it
-        try:
-            from orders.models import Order, SellerNotification
-            # Create a lightweight pending order (quantity defaults to 1)
+        from django.utils import timezone
+        from orders.models import Order, OrderItem, SellerNotification, StockReservation
+        from orders.analytics import record_new_orders
+        from orders.reservations import hold_expires_at, take_stock
+        order = None
+        # A lightweight pending order (quantity 1) holding one unit until the hold expires.
+        # Stock is taken first so nothing needs undoing when it has run out.
+        if take_stock(product.pk, 1):
             order = Order.objects.create(
                 buyer=request.user,
+                shop=shop,
                 product=product,
                 quantity=1,
+                total_price=product.price,
                 buyer_phone=inquiry.phone,
                 buyer_message=inquiry.message,
-                status='pending'
+                status='pending',
+                seller_notified=True,
+                notification_sent_at=timezone.now()
             )
-            # Notify seller with order context
-            SellerNotification.objects.create(
-                seller=shop.owner,
-                order=order,
-                notification_type='new_order',
-                title=f'New Inquiry for {product.name}',
-                message=f'Buyer {request.user.username} is interested in {product.name}. Phone: {inquiry.phone}'
+            item = OrderItem.objects.create(order=order, product=product, quantity=1, unit_price=product.price)
+            StockReservation.objects.create(
+                order=order, product=product, quantity=1, status='held', expires_at=hold_expires_at()
             )
-        except Exception:
-            # Silently continue if orders app is unavailable
-            pass
+            record_new_orders([(order, [item])])
+        # Notify seller with order context
+        create_notifications([SellerNotification(
+            seller_id=shop.owner_id,
+            order=order,
+            notification_type='new_order',
+            title=f'New Inquiry for {product.name}',
+            message=f'Buyer {request.user.username} is interested in {product.name}. Phone: {inquiry.phone}'
+                    + ('' if order else ' (currently out of stock)')
+        )])
 
         return inquiry
@@ -0,0 +1,50 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from weshop.cache import invalidate_catalog
+
+from .models import Shop, ShopComment, VerificationLog
+from .ratings import apply_rating_change
+
+
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+def invalidate_cached_shop(sender, instance, **kwargs):
+    # Product responses embed the shop name: the list and product pages depend on this counter too
+    invalidate_catalog(shop_ids=[instance.pk])
+
+
+@receiver(post_save, sender=VerificationLog)
+def invalidate_cached_shop_logs(sender, instance, created, **kwargs):
+    invalidate_catalog(shop_ids=[instance.shop_id])
+
+
+@receiver(pre_save, sender=ShopComment)
+def remember_previous_rating(sender, instance, **kwargs):
+    """Stash the stored rating so post_save can apply the difference"""
+    instance._previous_rating = None
+    instance._previous_shop_id = None
+    if instance.pk:
+        previous = ShopComment.objects.filter(pk=instance.pk).values('rating', 'shop_id').first()
+        if previous:
+            instance._previous_rating = previous['rating']
+            instance._previous_shop_id = previous['shop_id']
+
+
+@receiver(post_save, sender=ShopComment)
+def update_rating_summary_on_save(sender, instance, created, **kwargs):
+    previous_rating = getattr(instance, '_previous_rating', None)
+    previous_shop_id = getattr(instance, '_previous_shop_id', None)
+
+    if previous_shop_id and previous_shop_id != instance.shop_id:
+        apply_rating_change(previous_shop_id, old_rating=previous_rating)
+        previous_rating = None
+
+    apply_rating_change(instance.shop_id, old_rating=previous_rating, new_rating=instance.rating)
+    invalidate_catalog(shop_ids=[shop_id for shop_id in (previous_shop_id, instance.shop_id) if shop_id])
+
+
+@receiver(post_delete, sender=ShopComment)
+def update_rating_summary_on_delete(sender, instance, **kwargs):
+    apply_rating_change(instance.shop_id, old_rating=instance.rating)
+    invalidate_catalog(shop_ids=[instance.shop_id])
@@ -0,0 +1,281 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from products.models import Product
+from users.models import User
+
+from .models import DocumentUpload, Shop, ShopComment, ShopRatingSummary, VerificationLog
+from .uploads import DIGEST_BLOCK_SIZE
+
+
+def make_user(username, role='buyer'):
+    return User.objects.create_user(username=username, email=f'{username}@example.com', password=None, role=role)
+
+
+def make_shop(name, status='verified', **fields):
+    owner = make_user(f'owner-{name.lower().replace(" ", "-")}', role='seller')
+    return Shop.objects.create(name=name, owner=owner, verification_status=status, **fields)
+
+
+class RatingSummaryTests(TestCase):
+    def setUp(self):
+        self.shop = make_shop('Rated Shop')
+        self.buyers = [make_user(f'reviewer{index}') for index in range(3)]
+
+    def review(self, buyer, rating):
+        return ShopComment.objects.create(shop=self.shop, user=buyer, rating=rating, comment='ok')
+
+    def assertSummary(self, review_count, rating_total, average):
+        summary = ShopRatingSummary.objects.get(shop=self.shop)
+        self.assertEqual((summary.review_count, summary.rating_total), (review_count, rating_total))
+        self.assertEqual(summary.average_rating, average)
+
+    def test_add_edit_delete_keep_summary_in_step(self):
+        first = self.review(self.buyers[0], 5)
+        self.review(self.buyers[1], 3)
+        self.assertSummary(2, 8, 4.0)
+
+        first.rating = 1
+        first.save()
+        self.assertSummary(2, 4, 2.0)
+        self.assertEqual(ShopRatingSummary.objects.get(shop=self.shop).distribution['1'], 1)
+
+        first.delete()
+        self.assertSummary(1, 3, 3.0)
+
+    def test_missing_row_is_recounted_on_edit_and_delete(self):
+        first = self.review(self.buyers[0], 5)
+        self.review(self.buyers[1], 3)
+
+        ShopRatingSummary.objects.filter(shop=self.shop).delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            first.rating = 4
+            first.save()
+        self.assertSummary(2, 7, 3.5)
+
+        ShopRatingSummary.objects.filter(shop=self.shop).delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertSummary(1, 3, 3.0)
+
+    def test_deleting_the_shop_does_not_recreate_its_summary(self):
+        self.review(self.buyers[0], 5)
+        shop_id = self.shop.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shop.delete()
+        self.assertFalse(ShopRatingSummary.objects.filter(shop_id=shop_id).exists())
+
+
+class ShopDirectoryTests(TestCase):
+    def setUp(self):
+        self.shops = {
+            name: make_shop(name, status=status)
+            for name, status in [
+                ('Apple Corner', 'verified'), ('apricot Stand', 'verified'), ('Banana Barn', 'verified'),
+                ('Cherry Cart', 'pending'), ('Date Depot', 'rejected'),
+            ]
+        }
+        Product.objects.create(shop=self.shops['Apple Corner'], name='Apple', description='d', price=1)
+        Product.objects.create(shop=self.shops['Banana Barn'], name='Banana', description='d', price=1,
+                               is_active=False)
+        for index, (name, rating) in enumerate([('Banana Barn', 5), ('Apple Corner', 3)]):
+            ShopComment.objects.create(shop=self.shops[name], user=make_user(f'rater{index}'), rating=rating,
+                                       comment='ok')
+
+    def names(self, query='', user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        response = client.get(f'/api/shops/?{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return [shop['name'] for shop in response.data['results']]
+
+    def test_visitors_see_verified_shops_newest_first(self):
+        self.assertEqual(self.names(), ['Banana Barn', 'apricot Stand', 'Apple Corner'])
+        self.assertEqual(self.names('status=pending'), [])
+
+    def test_sellers_also_see_their_own_shop(self):
+        owner = self.shops['Cherry Cart'].owner
+        self.assertEqual(self.names('status=pending', user=owner), ['Cherry Cart'])
+        self.assertNotIn('Date Depot', self.names(user=owner))
+
+    def test_admins_filter_by_status(self):
+        admin = make_user('directory-admin', role='admin')
+        self.assertEqual(self.names('status=pending,rejected', user=admin), ['Date Depot', 'Cherry Cart'])
+        response = APIClient().get('/api/shops/?status=closed')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('closed', response.data['status'])
+
+    def test_name_is_a_case_insensitive_prefix(self):
+        self.assertEqual(self.names('name=AP&sort=name'), ['Apple Corner', 'apricot Stand'])
+        self.assertEqual(self.names('name=corner'), [])
+
+    def test_has_products_counts_active_products_only(self):
+        self.assertEqual(self.names('has_products=true'), ['Apple Corner'])
+        self.assertEqual(self.names('has_products=false'), ['Banana Barn', 'apricot Stand'])
+
+    def test_sort_orders(self):
+        self.assertEqual(self.names('sort=oldest'), ['Apple Corner', 'apricot Stand', 'Banana Barn'])
+        self.assertEqual(self.names('sort=name'), ['Apple Corner', 'Banana Barn', 'apricot Stand'])
+        # Unrated shops come last
+        self.assertEqual(self.names('sort=rating'), ['Banana Barn', 'Apple Corner', 'apricot Stand'])
+        self.assertEqual(APIClient().get('/api/shops/?sort=popular').status_code, 400)
+
+    def test_access_paths_use_their_indexes(self):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest(f'No plan check for {connection.vendor}')
+        checks = [
+            ('', 'shop_status_created_idx'),
+            ('status=verified', 'shop_status_created_idx'),
+            ('name=ab&sort=name', 'shop_status_name_prefix_idx'),
+            ('has_products=true', 'product_active_shop_idx'),
+        ]
+        for query, index in checks:
+            with self.subTest(query=query), CaptureQueriesContext(connection) as captured:
+                APIClient().get(f'/api/shops/?{query}')
+            page_sql = captured.captured_queries[-1]['sql']
+            with transaction.atomic(), connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    # Tiny test tables always favour sequential scans; ask whether the index is usable
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                    cursor.execute(f'EXPLAIN {page_sql}')
+                else:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {page_sql}')
+                plan = ' '.join(str(column) for row in cursor.fetchall() for column in row)
+            self.assertIn(index, plan)
+
+
+class DocumentUploadTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media, DOCUMENT_UPLOAD_TEMP_DIR=f'{media}/partial')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.shop = make_shop('Uploading Shop', status='pending')
+        self.client = APIClient()
+        self.client.force_authenticate(self.shop.owner)
+
+    def upload(self, content=b'%PDF-1.4 licence', chunk_size=None, sent=None):
+        base = f'/api/shops/{self.shop.pk}/documents/uploads/'
+        response = self.client.post(base, {
+            'document_field': 'business_license_document', 'filename': 'licence.pdf', 'total_size': len(content)
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        upload_id = response.data['id']
+        chunk_size = chunk_size or len(content)
+        for offset in range(0, len(content) if sent is None else sent, chunk_size):
+            response = self.client.put(f'{base}{upload_id}/?offset={offset}', content[offset:offset + chunk_size],
+                                       content_type='application/octet-stream')
+            self.assertEqual(response.status_code, 200, response.data)
+        return f'{base}{upload_id}/complete/', upload_id
+
+    def test_complete_attaches_the_document(self):
+        complete_url, upload_id = self.upload()
+        response = self.client.post(complete_url)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.shop.refresh_from_db()
+        self.assertTrue(self.shop.business_license_document.name.startswith('business_documents/sha256-blocks/'))
+        self.assertEqual(DocumentUpload.objects.get(pk=upload_id).status, 'complete')
+
+    def test_digest_is_built_as_chunks_arrive(self):
+        block = DIGEST_BLOCK_SIZE
+        content = bytes(range(256)) * (block * 5 // 2 // 256)
+        expected = hashlib.sha256(b''.join(
+            hashlib.sha256(content[start:start + block]).digest() for start in range(0, len(content), block)
+        )).hexdigest()
+
+        complete_url, upload_id = self.upload(content, chunk_size=700 * 1024)
+        # Two full blocks are hashed already; completing only hashes the last half block
+        self.assertEqual(len(DocumentUpload.objects.get(pk=upload_id).block_digests), 2 * 64)
+        with mock.patch('shops.uploads.hashlib.sha256', wraps=hashlib.sha256) as sha256:
+            self.assertEqual(self.client.post(complete_url).status_code, 200)
+        self.assertEqual(sha256.call_args_list[0], mock.call(content[2 * block:]))
+        self.assertEqual(DocumentUpload.objects.get(pk=upload_id).sha256, expected)
+
+        # Chunked differently, the same document gets the same address
+        self.shop.business_license_document = ''
+        self.shop.save()
+        complete_url, upload_id = self.upload(content, chunk_size=block)
+        self.assertEqual(self.client.post(complete_url).status_code, 200)
+        self.assertEqual(DocumentUpload.objects.get(pk=upload_id).sha256, expected)
+
+    def test_sweep_expires_abandoned_uploads_and_orphan_files(self):
+        content = b'x' * 1000
+        _, stale_id = self.upload(content, chunk_size=100, sent=300)
+        _, fresh_id = self.upload(content, chunk_size=100, sent=300)
+        DocumentUpload.objects.filter(pk=stale_id).update(updated_at=timezone.now() - timedelta(hours=30))
+        long_ago = (timezone.now() - timedelta(hours=30)).timestamp()
+        directory = settings.DOCUMENT_UPLOAD_TEMP_DIR
+        os.utime(f'{directory}/{stale_id}.part', (long_ago, long_ago))
+        # Left behind by an upload deleted with its shop
+        orphan = f'{directory}/{uuid.uuid4()}.part'
+        with open(orphan, 'wb') as partial:
+            partial.write(b'x')
+        os.utime(orphan, (long_ago, long_ago))
+
+        out = StringIO()
+        call_command('expire_document_uploads', stdout=out)
+        self.assertIn('Deleted 1 stale uploads and 2 partial files', out.getvalue())
+        self.assertEqual(list(DocumentUpload.objects.values_list('pk', flat=True)), [uuid.UUID(fresh_id)])
+        self.assertEqual(os.listdir(directory), [f'{fresh_id}.part'])
+
+    def test_complete_rechecks_status_under_the_lock(self):
+        complete_url, upload_id = self.upload()
+        stale = DocumentUpload.objects.get(pk=upload_id)
+        self.assertEqual(self.client.post(complete_url).status_code, 200)
+
+        # A second request that read the upload before the first one committed
+        with mock.patch('shops.views.get_object_or_404', return_value=stale):
+            response = self.client.post(complete_url)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Upload already completed')
+
+
+class AuditLogExportTests(TestCase):
+    url = '/api/shops/audit-logs/export/?output=csv'
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='auditor', email='auditor@example.com', password=None, role='admin', is_staff=True
+        )
+        shop = make_shop('Audited Shop', status='pending')
+        VerificationLog.objects.bulk_create([
+            VerificationLog(shop=shop, action='status_changed', performed_by=self.admin, notes=f'step {index}')
+            for index in range(25)
+        ])
+        self.auth = f'Bearer {RefreshToken.for_user(self.admin).access_token}'
+
+    def test_wsgi_streams_csv(self):
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 26)
+        self.assertTrue(lines[0].startswith('id,shop_id,shop_name,action'))
+
+    async def test_asgi_streams_chunks_without_buffering(self):
+        with mock.patch('weshop.exports.ASYNC_CHUNK_LINES', 10):
+            response = await AsyncClient().get(self.url, headers={'Authorization': self.auth})
+            self.assertEqual(response.status_code, 200)
+            # An async body is sent chunk by chunk; a sync one would be listed in full first
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(len(b''.join(chunks).decode().splitlines()), 26)
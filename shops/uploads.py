@@ -0,0 +1,175 @@
+"""
+Resumable document uploads.
+
+A document is addressed by the SHA-256 of the SHA-256s of its 1 MiB blocks. Each block's
+digest is stored on the upload row as soon as the block is complete, so finishing an upload
+only hashes its last, short block instead of reading the assembled file again. A client
+sending the advertised chunk size can compute the same digest from its per-chunk hashes.
+"""
+import hashlib
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+BLOCK_SIZE = 64 * 1024
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DIGEST_BLOCK_SIZE = DEFAULT_CHUNK_SIZE
+DIGEST_HEX_LENGTH = 64
+DEFAULT_MAX_DOCUMENT_SIZE = 25 * 1024 * 1024
+DEFAULT_UPLOAD_EXPIRY_HOURS = 24
+
+
+class ChunkError(Exception):
+    pass
+
+
+def max_document_size():
+    return getattr(settings, 'DOCUMENT_UPLOAD_MAX_SIZE', DEFAULT_MAX_DOCUMENT_SIZE)
+
+
+def partial_directory():
+    # Kept outside MEDIA_ROOT so half-uploaded documents are never served
+    directory = getattr(settings, 'DOCUMENT_UPLOAD_TEMP_DIR', os.path.join(settings.BASE_DIR, 'partial_uploads'))
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def partial_path(upload):
+    return os.path.join(partial_directory(), f'{upload.pk}.part')
+
+
+def _digested_size(upload):
+    """Bytes at the start of the file whose blocks are already in upload.block_digests"""
+    return len(upload.block_digests) // DIGEST_HEX_LENGTH * DIGEST_BLOCK_SIZE
+
+
+def write_chunk(upload, stream, offset, expected_sha256=None):
+    """
+    Stream a request body into the partial file at offset, hashing as it goes, and add the
+    digests of the blocks it completes to upload.block_digests (the caller saves the row).
+    Returns the number of bytes written; raises ChunkError without advancing on mismatch.
+    """
+    if offset != upload.received_size:
+        raise ChunkError(f'Expected offset {upload.received_size}, got {offset}')
+
+    path = partial_path(upload)
+    digest = hashlib.sha256()
+    written = 0
+    completed = []
+    block_start = _digested_size(upload)
+    mode = 'r+b' if os.path.exists(path) else 'wb'
+    with open(path, mode) as partial:
+        # The block in progress continues from bytes earlier chunks left in the file
+        block_digest = hashlib.sha256()
+        block_fill = offset - block_start
+        if block_fill:
+            partial.seek(block_start)
+            block_digest.update(partial.read(block_fill))
+        partial.seek(offset)
+        # Drop bytes from an earlier interrupted attempt at this offset
+        partial.truncate()
+        while True:
+            block = stream.read(BLOCK_SIZE)
+            if not block:
+                break
+            written += len(block)
+            if offset + written > upload.total_size:
+                partial.truncate(offset)
+                raise ChunkError('Chunk exceeds declared file size')
+            digest.update(block)
+            partial.write(block)
+            while block:
+                part, block = block[:DIGEST_BLOCK_SIZE - block_fill], block[DIGEST_BLOCK_SIZE - block_fill:]
+                block_digest.update(part)
+                block_fill += len(part)
+                if block_fill == DIGEST_BLOCK_SIZE:
+                    completed.append(block_digest.hexdigest())
+                    block_digest, block_fill = hashlib.sha256(), 0
+
+        if expected_sha256 and digest.hexdigest() != expected_sha256.lower():
+            partial.truncate(offset)
+            raise ChunkError('Chunk checksum mismatch')
+
+    upload.block_digests += ''.join(completed)
+    return written
+
+
+def document_digest(upload):
+    """The document's address: stored block digests plus the digest of its last, short block"""
+    block_start = _digested_size(upload)
+    digests = bytes.fromhex(upload.block_digests)
+    if block_start < upload.total_size:
+        with open(partial_path(upload), 'rb') as assembled:
+            assembled.seek(block_start)
+            digests += hashlib.sha256(assembled.read()).digest()
+    return hashlib.sha256(digests).hexdigest()
+
+
+def store_deduplicated(upload):
+    """
+    Move the assembled file into content-addressed storage.
+    Returns (storage name, sha256); an identical earlier upload is reused instead of stored again.
+    """
+    path = partial_path(upload)
+    sha256 = document_digest(upload)
+    extension = os.path.splitext(upload.filename)[1].lower()[:10]
+    name = f'business_documents/sha256-blocks/{sha256[:2]}/{sha256}{extension}'
+
+    if not default_storage.exists(name):
+        with open(path, 'rb') as assembled:
+            name = default_storage.save(name, File(assembled))
+    os.remove(path)
+    return name, sha256
+
+
+def discard_partial(upload):
+    path = partial_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def expire_stale_uploads(max_age=None):
+    """
+    Delete unfinished uploads idle for longer than max_age (DOCUMENT_UPLOAD_EXPIRY_HOURS by
+    default), then partial files that no upload owns and that were not written within it.
+    Returns (uploads deleted, files removed).
+    """
+    from .models import DocumentUpload
+
+    if max_age is None:
+        max_age = timedelta(hours=getattr(settings, 'DOCUMENT_UPLOAD_EXPIRY_HOURS', DEFAULT_UPLOAD_EXPIRY_HOURS))
+    cutoff = timezone.now() - max_age
+    uploads, _ = DocumentUpload.objects.filter(status='uploading', updated_at__lt=cutoff).delete()
+
+    # Files of the uploads just deleted, of uploads deleted with their shop, or of a crashed completion
+    directory = partial_directory()
+    stale = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith('.part') and entry.stat().st_mtime < cutoff.timestamp():
+                stale[entry.name[:-len('.part')]] = entry.path
+    ids = []
+    for name in stale:
+        try:
+            ids.append(uuid.UUID(name))
+        except ValueError:
+            pass
+    owned = set()
+    for start in range(0, len(ids), 500):
+        owned.update(
+            str(pk) for pk in DocumentUpload.objects.filter(pk__in=ids[start:start + 500]).values_list('pk', flat=True)
+        )
+    removed = 0
+    for name, path in stale.items():
+        if name not in owned:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+    return uploads, removed
@@ -5,9 +5,14 @@ urlpatterns = [
     path('shops/', views.ShopListCreateView.as_view(), name='shop-list-create'),
     path('shops/<int:pk>/', views.ShopDetailView.as_view(), name='shop-detail'),
     path('shops/join-payment/', views.join_payment, name='shop-join-payment'),
+    path('shops/bulk-verify/', views.bulk_verify_shops, name='shop-bulk-verify'),
     path('shops/<int:shop_id>/verify/', views.verify_shop, name='shop-verify'),
     path('shops/<int:shop_id>/documents/', views.upload_documents, name='shop-document-upload'),
+    path('shops/<int:shop_id>/documents/uploads/', views.start_document_upload, name='shop-document-upload-start'),
+    path('shops/<int:shop_id>/documents/uploads/<uuid:upload_id>/', views.document_upload_chunk, name='shop-document-upload-chunk'),
+    path('shops/<int:shop_id>/documents/uploads/<uuid:upload_id>/complete/', views.complete_document_upload, name='shop-document-upload-complete'),
     path('<int:shop_id>/audit-trail/', views.verification_audit_trail, name='verification-audit-trail'),
+    path('shops/audit-logs/export/', views.export_verification_logs, name='verification-log-export'),
     path('<int:shop_id>/comments/', views.ShopCommentListCreateView.as_view(), name='shop-comments'),
     path('comments/helpful/', views.CommentHelpfulView.as_view(), name='comment-helpful'),
     path('shops/<int:shop_id>/contact-seller/', views.ProductInquiryView.as_view(), name='contact-seller'),
@@ -0,0 +1,136 @@
+from django.db import transaction
+from django.utils import timezone
+
+from weshop.cache import invalidate_catalog
+
+from .models import Shop, VerificationLog
+
+REVIEWABLE_STATUSES = ['pending', 'documents_submitted', 'under_review']
+
+
+def submit_documents_if_complete(shop, performed_by, ip_address=None):
+    """Move a pending shop to documents_submitted once every document is on file"""
+    from orders.notifications import notify_admins
+
+    if not (shop.documents_complete and shop.verification_status == 'pending'):
+        return False
+
+    shop.verification_status = 'documents_submitted'
+    shop.save()
+
+    # Create audit log
+    VerificationLog.objects.create(
+        shop=shop,
+        action='documents_submitted',
+        performed_by=performed_by,
+        notes='All required documents submitted',
+        ip_address=ip_address
+    )
+
+    notify_admins(
+        notification_type='shop_pending_review',
+        title=f'Shop Documents Submitted - {shop.name}',
+        message=f'Shop "{shop.name}" has submitted all documents and is ready for review.'
+    )
+    return True
+
+
+def _verify_error(shop):
+    if shop.verification_status == 'verified':
+        return 'Shop is already verified'
+    if not shop.documents_complete:
+        return 'Shop verification requires all documents to be submitted'
+    if not shop.joined_fee_paid:
+        return 'Shop verification requires join fee to be paid'
+    return None
+
+
+def _reject_error(shop):
+    if shop.verification_status not in REVIEWABLE_STATUSES:
+        return f'Cannot reject a {shop.verification_status} shop'
+    return None
+
+
+def bulk_update_verification(shop_ids, action, performed_by, rejection_reason='', notes='', ip_address=None):
+    """
+    Verify or reject many shops in one transaction.
+    Returns one result dict per requested shop id, in request order.
+    """
+    from orders.models import SellerNotification
+    from orders.notifications import create_notifications
+    from outbox.mail import enqueue_emails
+
+    if action not in ('verify', 'reject'):
+        raise ValueError(f'Unknown verification action: {action}')
+    new_status = 'verified' if action == 'verify' else 'rejected'
+    check = _verify_error if action == 'verify' else _reject_error
+
+    shop_ids = list(dict.fromkeys(shop_ids))
+    now = timezone.now()
+
+    with transaction.atomic():
+        shops = {
+            shop.pk: shop
+            for shop in Shop.objects.select_for_update(of=('self',)).select_related('owner').filter(pk__in=shop_ids)
+        }
+
+        results = {}
+        eligible = []
+        for shop_id in shop_ids:
+            shop = shops.get(shop_id)
+            if shop is None:
+                results[shop_id] = {'shop_id': shop_id, 'success': False, 'error': 'Shop not found'}
+                continue
+            error = check(shop)
+            if error:
+                results[shop_id] = {'shop_id': shop_id, 'success': False, 'error': error}
+            else:
+                eligible.append(shop)
+
+        if eligible:
+            updates = {'verification_status': new_status, 'updated_at': now}
+            if action == 'verify':
+                updates.update(verified_by=performed_by, verified_at=now)
+            else:
+                updates['rejection_reason'] = rejection_reason
+            Shop.objects.filter(pk__in=[shop.pk for shop in eligible]).update(**updates)
+
+            VerificationLog.objects.bulk_create([
+                VerificationLog(
+                    shop=shop,
+                    action='verified' if action == 'verify' else 'rejected',
+                    performed_by=performed_by,
+                    notes=notes or f'Status changed from {shop.verification_status} to {new_status} (bulk)',
+                    ip_address=ip_address
+                )
+                for shop in eligible
+            ])
+
+            create_notifications([
+                SellerNotification(
+                    seller_id=shop.owner_id,
+                    notification_type=f'shop_{new_status}',
+                    title=f'Shop {new_status.title()} - {shop.name}',
+                    message=rejection_reason or f'Your shop "{shop.name}" is now {new_status}.'
+                )
+                for shop in eligible
+            ])
+
+            if action == 'verify':
+                subject, body = 'Shop Verification Approved', 'Congratulations! Your shop "{name}" has been verified.'
+            else:
+                subject, body = 'Shop Verification Rejected', 'Your shop "{name}" was not approved. {reason}'
+            enqueue_emails(
+                {
+                    'subject': subject,
+                    'message': body.format(name=shop.name, reason=rejection_reason).strip(),
+                    'recipient_list': [shop.owner.email],
+                }
+                for shop in eligible
+            )
+
+            for shop in eligible:
+                results[shop.pk] = {'shop_id': shop.pk, 'success': True, 'status': new_status}
+            invalidate_catalog(shop_ids=[shop.pk for shop in eligible])
+
+    return [results[shop_id] for shop_id in shop_ids]
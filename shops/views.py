@@ -1,26 +1,86 @@
-from rest_framework import generics, status
+from rest_framework import generics, serializers, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from rest_framework.exceptions import ValidationError
+from products.models import Product
+from rest_framework.pagination import CursorPagination
+from weshop.exports import EXPORT_FORMATS, parse_time_bound, stream_export
+from weshop.cache import AnonymousResponseCacheMixin, version_key
+from weshop.conditional import ConditionalGetMixin
+from weshop.fieldsets import SparseFieldsetViewMixin
 
 
-from .models import Shop, VerificationLog, ShopComment, CommentHelpful, ProductInquiry
+from .models import Shop, VerificationLog, ShopComment, CommentHelpful, ProductInquiry, DocumentUpload
+from .ratings import record_helpful_vote
+from .verification import bulk_update_verification, submit_documents_if_complete
+from .uploads import ChunkError, write_chunk, store_deduplicated, discard_partial
+from outbox.mail import enqueue_email
 from .serializers import (
-    ShopSerializer, ShopCreateSerializer, ShopDocumentUploadSerializer,
-    ShopVerificationSerializer, VerificationLogSerializer,
-    ShopCommentSerializer, CommentHelpfulSerializer, ProductInquirySerializer
+    ShopSerializer, ShopListSerializer, ShopCreateSerializer, ShopDocumentUploadSerializer,
+    ShopVerificationSerializer, ShopBulkVerificationSerializer, VerificationLogSerializer,
+    ShopCommentSerializer, CommentHelpfulSerializer, ProductInquirySerializer,
+    DocumentUploadSerializer
 )
 from django.views.generic import TemplateView
 
 from django.views.generic import View
 from django.http import HttpResponse
+import io
 import os
-class ShopListCreateView(generics.ListCreateAPIView):
-    queryset = Shop.objects.all()
+class ShopListCreateView(SparseFieldsetViewMixin, generics.ListCreateAPIView):
+    """
+    Shop directory. GET supports ?status=, ?name= (prefix), ?has_products=true|false
+    and ?sort=newest|oldest|name|rating; buyers and visitors only ever see verified shops.
+    """
+    SORT_ORDERS = {
+        'newest': ['-created_at', '-id'],
+        'oldest': ['created_at', 'id'],
+        'name': ['name', 'id'],
+        'rating': [F('rating_summary__average_rating').desc(nulls_last=True), '-created_at', '-id'],
+    }
+    
+    def get_queryset(self):
+        queryset = ShopListSerializer.setup_eager_loading(Shop.objects.all())
+        if self.request.method != 'GET':
+            return queryset
+        
+        user = self.request.user
+        params = self.request.query_params
+        
+        if not (user.is_authenticated and (user.role == 'admin' or user.is_staff)):
+            if user.is_authenticated and user.role == 'seller':
+                # Sellers also see their own shop while it is being verified
+                queryset = queryset.filter(Q(verification_status='verified') | Q(owner=user))
+            else:
+                queryset = queryset.filter(verification_status='verified')
+        
+        statuses = [value for value in params.get('status', '').split(',') if value]
+        if statuses:
+            valid = dict(Shop.VERIFICATION_STATUS_CHOICES)
+            unknown = [value for value in statuses if value not in valid]
+            if unknown:
+                raise ValidationError({'status': f'Unknown status: {", ".join(unknown)}'})
+            queryset = queryset.filter(verification_status__in=statuses)
+        
+        name = params.get('name', '').strip()
+        if name:
+            queryset = queryset.filter(name__istartswith=name)
+        
+        has_products = params.get('has_products')
+        if has_products in ('true', 'false'):
+            active_products = Product.objects.filter(shop=OuterRef('pk'), is_active=True)
+            queryset = queryset.filter(Exists(active_products) if has_products == 'true' else ~Exists(active_products))
+        
+        sort = params.get('sort', 'newest')
+        if sort not in self.SORT_ORDERS:
+            raise ValidationError({'sort': f'Must be one of {", ".join(self.SORT_ORDERS)}'})
+        return queryset.order_by(*self.SORT_ORDERS[sort])
     
     def get_permissions(self):
         if self.request.method == 'GET':
@@ -30,7 +90,7 @@ class ShopListCreateView(generics.ListCreateAPIView):
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return ShopCreateSerializer
-        return ShopSerializer
+        return ShopListSerializer
     
     def perform_create(self, serializer):
         # Only sellers can create shops
@@ -38,10 +98,14 @@ class ShopListCreateView(generics.ListCreateAPIView):
             raise PermissionError("Only sellers can create shops")
         serializer.save()
 
-class ShopDetailView(generics.RetrieveAPIView):
-    queryset = Shop.objects.all()
+class ShopDetailView(ConditionalGetMixin, AnonymousResponseCacheMixin, SparseFieldsetViewMixin, generics.RetrieveAPIView):
+    queryset = ShopSerializer.setup_eager_loading(Shop.objects.all())
     serializer_class = ShopSerializer
     permission_classes = [AllowAny]
+    validator_fields = ['updated_at', 'rating_summary__updated_at', 'verification_logs__timestamp']
+
+    def get_cache_version_keys(self):
+        return [version_key('shop', self.kwargs['pk']), version_key('shops')]
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -67,17 +131,13 @@ def join_payment(request):
             notes='Join fee payment completed',
             ip_address=request.META.get('REMOTE_ADDR')
         )
-        # Create notification for admin
-        from orders.models import SellerNotification
-        from django.contrib.auth import get_user_model
-        admin_users = get_user_model().objects.filter(role='admin')
-        for admin in admin_users:
-            SellerNotification.objects.create(
-                seller=admin,  # Admin as "seller" for notification purposes
-                notification_type='shop_verified',
-                title=f'Shop Payment Completed - {shop.name}',
-                message=f'Shop "{shop.name}" has completed payment and is ready for verification.'
-            )
+        # Notify all admins with one bulk insert
+        from orders.notifications import notify_admins
+        notify_admins(
+            notification_type='shop_pending_review',
+            title=f'Shop Payment Completed - {shop.name}',
+            message=f'Shop "{shop.name}" has completed payment and is ready for verification.'
+        )
         return Response({
             'message': 'Join fee payment successful! Your shop is now ready for admin verification.',
             'shop_status': shop.verification_status,
@@ -117,20 +177,16 @@ def verify_shop(request, shop_id):
     )
     
     if serializer.is_valid():
-        updated_shop = serializer.save()
-        
-        # Send notification email (if configured)
-        try:
+        with transaction.atomic():
+            updated_shop = serializer.save()
+            
+            # Queue notification email; delivered by the send_queued_mail worker
             if updated_shop.verification_status == 'verified':
-                send_mail(
+                enqueue_email(
                     subject='Shop Verification Approved',
                     message=f'Congratulations! Your shop "{updated_shop.name}" has been verified.',
-                    from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@weshop.com'),
-                    recipient_list=[updated_shop.owner.email] if updated_shop.owner.email else [],
-                    fail_silently=True
+                    recipient_list=[updated_shop.owner.email]
                 )
-        except Exception:
-            pass  # Email sending is optional
         
         return Response({
             'message': f'Shop verification status updated to {updated_shop.verification_status}',
@@ -140,13 +196,30 @@ def verify_shop(request, shop_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def upload_documents(request, shop_id):
-    """Secure document upload endpoint"""
-    shop = get_object_or_404(Shop, id=shop_id)
+@permission_classes([IsAdminUser])
+def bulk_verify_shops(request):
+    """Verify or reject a batch of shops in one transaction with a per-shop report"""
+    serializer = ShopBulkVerificationSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
     
+    results = bulk_update_verification(
+        data['shop_ids'],
+        data['action'],
+        performed_by=request.user,
+        rejection_reason=data['rejection_reason'],
+        notes=data['verification_notes'],
+        ip_address=request.META.get('REMOTE_ADDR')
+    )
+    succeeded = sum(1 for result in results if result['success'])
+    return Response({
+        'message': f'{succeeded} of {len(results)} shops updated',
+        'results': results
+    })
+
+def _document_upload_error(shop, user):
     # Only shop owner can upload documents
-    if shop.owner != request.user:
+    if shop.owner_id != user.id:
         return Response({
             'error': 'Only shop owner can upload documents'
         }, status=status.HTTP_403_FORBIDDEN)
@@ -156,6 +229,17 @@ def upload_documents(request, shop_id):
         return Response({
             'error': f'Cannot upload documents for {shop.verification_status} shop'
         }, status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def upload_documents(request, shop_id):
+    """Secure document upload endpoint"""
+    shop = get_object_or_404(Shop, id=shop_id)
+    
+    error_response = _document_upload_error(shop, request.user)
+    if error_response:
+        return error_response
     
     serializer = ShopDocumentUploadSerializer(
         shop,
@@ -172,31 +256,158 @@ def upload_documents(request, shop_id):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def start_document_upload(request, shop_id):
+    """Begin a resumable chunked upload for one verification document"""
+    shop = get_object_or_404(Shop, id=shop_id)
+    error_response = _document_upload_error(shop, request.user)
+    if error_response:
+        return error_response
+    
+    serializer = DocumentUploadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    upload = serializer.save(shop=shop, uploaded_by=request.user)
+    return Response(DocumentUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+@api_view(['GET', 'PUT'])
+@permission_classes([IsAuthenticated])
+def document_upload_chunk(request, shop_id, upload_id):
+    """GET reports the resume offset; PUT appends the raw request body at ?offset="""
+    upload = get_object_or_404(DocumentUpload, pk=upload_id, shop_id=shop_id, uploaded_by=request.user)
+    if request.method == 'GET':
+        return Response(DocumentUploadSerializer(upload).data)
+    
+    try:
+        offset = int(request.query_params.get('offset', ''))
+    except ValueError:
+        return Response({'error': 'offset query parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    with transaction.atomic():
+        upload = DocumentUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status == 'complete':
+            return Response({'error': 'Upload already completed'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            written = write_chunk(upload, request.stream or io.BytesIO(), offset, request.headers.get('X-Chunk-SHA256'))
+        except ChunkError as e:
+            return Response({'error': str(e), 'offset': upload.received_size}, status=status.HTTP_409_CONFLICT)
+        upload.received_size += written
+        upload.save(update_fields=['received_size', 'block_digests', 'updated_at'])
+    
+    return Response({'offset': upload.received_size, 'total_size': upload.total_size})
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def complete_document_upload(request, shop_id, upload_id):
+    """Attach a fully received upload to the shop and advance verification if complete"""
+    upload = get_object_or_404(DocumentUpload, pk=upload_id, shop_id=shop_id, uploaded_by=request.user)
+    
+    with transaction.atomic():
+        shop = Shop.objects.select_for_update().get(pk=shop_id)
+        # Checked under the lock: a concurrent complete may already have moved the file
+        upload = DocumentUpload.objects.select_for_update().filter(pk=upload.pk).first()
+        if upload is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        if upload.status == 'complete':
+            return Response({'error': 'Upload already completed'}, status=status.HTTP_400_BAD_REQUEST)
+        if upload.received_size != upload.total_size:
+            return Response({
+                'error': 'Upload is incomplete',
+                'offset': upload.received_size
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        error_response = _document_upload_error(shop, request.user)
+        if error_response:
+            discard_partial(upload)
+            upload.delete()
+            return error_response
+        
+        name, sha256 = store_deduplicated(upload)
+        setattr(shop, upload.document_field, name)
+        shop.save(update_fields=[upload.document_field, 'updated_at'])
+        upload.status = 'complete'
+        upload.sha256 = sha256
+        upload.save(update_fields=['status', 'sha256', 'updated_at'])
+        
+        submit_documents_if_complete(shop, request.user, request.META.get('REMOTE_ADDR'))
+    
+    return Response({
+        'message': 'Document uploaded successfully',
+        'shop': ShopSerializer(shop).data
+    })
+
+class VerificationLogCursorPagination(CursorPagination):
+    page_size = 50
+    ordering = ('-timestamp', '-id')
+
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def verification_audit_trail(request, shop_id):
-    """Get complete audit trail for shop verification"""
-    shop = get_object_or_404(Shop, id=shop_id)
-    logs = shop.verification_logs.all()
+    """Get the audit trail for shop verification, cursor-paginated"""
+    shop = get_object_or_404(ShopSerializer.setup_eager_loading(Shop.objects.all()), id=shop_id)
+    logs = VerificationLog.objects.filter(shop=shop).select_related('performed_by')
     
-    from .serializers import VerificationLogSerializer
+    paginator = VerificationLogCursorPagination()
+    page = paginator.paginate_queryset(logs, request)
     return Response({
         'shop': ShopSerializer(shop).data,
-        'audit_trail': VerificationLogSerializer(logs, many=True).data
+        'audit_trail': VerificationLogSerializer(page, many=True).data,
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link()
     })
 
+AUDIT_EXPORT_COLUMNS = [
+    'id', 'shop_id', 'shop_name', 'action', 'performed_by_id',
+    'performed_by_username', 'notes', 'ip_address', 'timestamp'
+]
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_verification_logs(request):
+    """Stream audit logs for many shops as CSV or NDJSON (?output=, shop=, action=, since=, until=)"""
+    export_format = request.query_params.get('output', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return Response({'error': f'output must be one of {", ".join(EXPORT_FORMATS)}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    logs = VerificationLog.objects.all()
+    try:
+        shop_ids = [int(part) for value in request.query_params.getlist('shop') for part in value.split(',') if part]
+        since = request.query_params.get('since')
+        until = request.query_params.get('until')
+        if since:
+            logs = logs.filter(timestamp__gte=parse_time_bound(since))
+        if until:
+            logs = logs.filter(timestamp__lte=parse_time_bound(until, end_of_day=True))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if shop_ids:
+        logs = logs.filter(shop_id__in=shop_ids)
+    actions = [action for action in request.query_params.getlist('action') if action]
+    if actions:
+        logs = logs.filter(action__in=actions)
+    
+    rows = logs.order_by('timestamp', 'id').values(
+        'id', 'shop_id', 'action', 'performed_by_id', 'notes', 'ip_address', 'timestamp',
+        shop_name=F('shop__name'),
+        performed_by_username=F('performed_by__username')
+    ).iterator(chunk_size=2000)
+    return stream_export(rows, AUDIT_EXPORT_COLUMNS, export_format, 'verification_logs', request=request)
+
 class ShopCommentListCreateView(generics.ListCreateAPIView):
     serializer_class = ShopCommentSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         shop_id = self.kwargs.get('shop_id')
-        return ShopComment.objects.filter(shop_id=shop_id)
+        return ShopComment.objects.filter(shop_id=shop_id).select_related('user')
     
     def perform_create(self, serializer):
         shop_id = self.kwargs.get('shop_id')
         shop = get_object_or_404(Shop, id=shop_id)
-        serializer.save(shop=shop)
+        # Rating summary is updated by signal inside the same transaction
+        with transaction.atomic():
+            serializer.save(shop=shop)
 
 class CommentHelpfulView(generics.CreateAPIView):
     serializer_class = CommentHelpfulSerializer
@@ -210,34 +421,16 @@ class CommentHelpfulView(generics.CreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        try:
-            comment = ShopComment.objects.get(id=comment_id)
-        except ShopComment.DoesNotExist:
+        is_helpful = serializers.BooleanField().to_internal_value(request.data.get('is_helpful', True))
+
+        # Single upsert plus an in-place counter refresh; no read-then-save
+        helpful_vote = record_helpful_vote(comment_id, request.user, is_helpful)
+        if helpful_vote is None:
             return Response(
                 {"comment": [f"Invalid pk \"{comment_id}\" - object does not exist."]},
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        # Check if user already voted
-        helpful_vote = CommentHelpful.objects.filter(
-            comment=comment,
-            user=request.user
-        ).first()
-        
-        is_helpful = request.data.get('is_helpful', True)
-        
-        if helpful_vote:
-            # Update existing vote
-            helpful_vote.is_helpful = is_helpful
-            helpful_vote.save()
-        else:
-            # Create new vote
-            helpful_vote = CommentHelpful.objects.create(
-                comment=comment,
-                user=request.user,
-                is_helpful=is_helpful
-            )
-            
         serializer = self.get_serializer(helpful_vote)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -262,19 +455,16 @@ class ProductInquiryView(generics.CreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Validate shop exists
-        try:
-            shop = Shop.objects.get(id=shop_id)
-        except (ValueError, Shop.DoesNotExist):
-            return Response(
-                {"error": "Shop not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-            
-        # Validate product exists and belongs to shop
+        # Validate product exists and belongs to shop; one query loads both with the seller
         try:
-            product = Product.objects.get(id=product_id, shop=shop)
+            product = Product.objects.select_related('shop__owner').get(id=product_id, shop_id=shop_id)
+            shop = product.shop
         except (ValueError, Product.DoesNotExist):
+            if not Shop.objects.filter(id=shop_id).exists():
+                return Response(
+                    {"error": "Shop not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
             return Response(
                 {"error": "Product not found in this shop"},
                 status=status.HTTP_400_BAD_REQUEST
@@ -290,15 +480,18 @@ class ProductInquiryView(generics.CreateAPIView):
         # Create the inquiry
         serializer = self.get_serializer(data=data, context={
             'request': request,
-            'view': self
+            'view': self,
+            'shop': shop,
+            'product': product
         })
         
         try:
             serializer.is_valid(raise_exception=True)
-            inquiry = serializer.save()
-            
-            # Send notification to seller (you can implement email/notification here)
-            self._notify_seller(inquiry)
+            with transaction.atomic():
+                inquiry = serializer.save()
+                
+                # Queue notification email to seller in the same transaction
+                self._notify_seller(inquiry)
             
             return Response(
                 {"message": "Your inquiry has been sent to the seller"},
@@ -318,11 +511,9 @@ class ProductInquiryView(generics.CreateAPIView):
     
     def _notify_seller(self, inquiry):
         """
-        Send notification to seller about the new inquiry
-        In a real app, this would send an email or in-app notification
+        Queue an email to the seller about the new inquiry.
+        Delivery happens outside the request in the send_queued_mail worker.
         """
-        from django.core.mail import send_mail
-        from django.conf import settings
         from django.template.loader import render_to_string
         from django.utils.html import strip_tags
         
@@ -345,26 +536,9 @@ class ProductInquiryView(generics.CreateAPIView):
         # Create plain text version
         plain_message = strip_tags(html_message)
         
-        # Send email (in production, use Celery or similar for async)
-        try:
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@weshop.com'),
-                recipient_list=[seller.email],
-                html_message=html_message,
-                fail_silently=True
-            )
-        except Exception as e:
-            # Log the error but don't fail the request
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Failed to send inquiry notification: {str(e)}")
-        
-        # Here you could also add in-app notifications, WebSocket, or push notifications
-        # For example:
-        # notify_user(seller.id, {
-        #     'type': 'new_inquiry',
-        #     'message': f'New inquiry about {product.name} from {buyer.username}',
-        #     'inquiry_id': inquiry.id
-        # })
+        enqueue_email(
+            subject=subject,
+            message=plain_message,
+            recipient_list=[seller.email],
+            html_message=html_message
+        )
@@ -10,6 +10,8 @@ class User(AbstractUser):
     
     email = models.EmailField(unique=True, blank=True, null=True)
     role = models.CharField(max_length=10, choices=USER_ROLES, default='buyer')
+    # Unread SellerNotifications, kept in step by orders.notifications so polling never counts rows
+    unread_notification_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -0,0 +1,174 @@
+"""
+Response cache for anonymous catalog reads.
+
+Entries are keyed by path, query string and the version counters of everything the
+response depends on; saving a product or shop bumps its counter, so stale entries are
+simply never looked up again and age out. A product's responses depend on its own counter
+and its shop's, so a shop edit bumps one counter however many products the shop has. Works on any Django cache backend with
+add/incr (local-memory, file, database, Redis).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_PREFIX = 'catalog:v:'
+ENTRY_PREFIX = 'catalog:r:'
+PARENT_PREFIX = 'catalog:parent:'
+
+
+def _cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def version_key(scope, pk=None):
+    return f'{VERSION_PREFIX}{scope}' if pk is None else f'{VERSION_PREFIX}{scope}:{pk}'
+
+
+def get_versions(keys):
+    """Current value of each version counter, initializing missing ones"""
+    cache = _cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # A fresh counter (first use, or evicted) starts at a value no old entry was stored under
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def parent_id(scope, pk, lookup):
+    """
+    Id of the row whose counter an object's responses also depend on (a product's shop),
+    remembered in the cache so a hit costs no query; lookup() returns None for no object.
+    """
+    cache = _cache()
+    key = f'{PARENT_PREFIX}{scope}:{pk}'
+    value = cache.get(key)
+    if value is None:
+        value = lookup()
+        if value is not None:
+            cache.set(key, value, timeout=None)
+    return value
+
+
+def forget_parent(scope, pk):
+    """Look the parent up again after the object was saved or deleted"""
+    key = f'{PARENT_PREFIX}{scope}:{pk}'
+    transaction.on_commit(lambda: _cache().delete(key))
+
+
+def _bump(keys):
+    cache = _cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def bump_versions(keys):
+    """Invalidate everything cached under these counters once the current transaction commits"""
+    keys = list(dict.fromkeys(keys))
+    if keys:
+        transaction.on_commit(lambda: _bump(keys))
+
+
+def invalidate_catalog(shop_ids=(), product_ids=(), all_shops=False):
+    """
+    Bump the counters for changed shops and products.
+    Call it after queryset.update()/bulk_create() writes, which send no model signals.
+    """
+    keys = [version_key('product_list')]
+    if all_shops:
+        keys.append(version_key('shops'))
+    keys += [version_key('shop', pk) for pk in shop_ids]
+    keys += [version_key('product', pk) for pk in product_ids]
+    bump_versions(keys)
+
+
+def _entry_key(request, versions):
+    raw = '|'.join([request.path, request.META.get('QUERY_STRING', ''), *map(str, versions)])
+    return ENTRY_PREFIX + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cached_response_data(key, compute, timeout, stale_timeout, lock_timeout=10, wait=2.0):
+    """
+    Return (data, hit) for key, calling compute() -> (data, cacheable) on a miss.
+
+    Only one caller recomputes an expired entry: it takes a short lock with cache.add while
+    the others keep serving the stale copy, or wait briefly for the new one when there is none.
+    """
+    cache = _cache()
+    entry = cache.get(key)
+    if entry and entry['fresh_until'] > time.time():
+        return entry['data'], True
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, timeout=lock_timeout):
+        if entry:
+            return entry['data'], True
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry:
+                return entry['data'], True
+        lock_key = None
+
+    try:
+        data, cacheable = compute()
+        if cacheable:
+            cache.set(key, {'data': data, 'fresh_until': time.time() + timeout}, timeout=timeout + stale_timeout)
+    finally:
+        if lock_key:
+            cache.delete(lock_key)
+    return data, False
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Cache successful anonymous GET responses of a DRF view.
+    Subclasses list the version counters their output depends on in get_cache_version_keys().
+    """
+    cache_stale_timeout = 30
+
+    @property
+    def cache_timeout(self):
+        return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60)
+
+    def get_cache_version_keys(self):
+        raise NotImplementedError
+
+    def is_cached_request(self):
+        return not (self.request.user and self.request.user.is_authenticated)
+
+    def get_cache_versions(self):
+        """Values of this request's version counters, read once per request"""
+        if not hasattr(self, '_cache_versions'):
+            self._cache_versions = get_versions(self.get_cache_version_keys())
+        return self._cache_versions
+
+    def get(self, request, *args, **kwargs):
+        if not self.is_cached_request():
+            return super().get(request, *args, **kwargs)
+
+        versions = self.get_cache_versions()
+        response = None
+
+        def compute():
+            nonlocal response
+            response = super(AnonymousResponseCacheMixin, self).get(request, *args, **kwargs)
+            return response.data, response.status_code == status.HTTP_200_OK
+
+        data, hit = cached_response_data(
+            _entry_key(request, versions), compute, self.cache_timeout, self.cache_stale_timeout
+        )
+        if response is None:
+            response = Response(data)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
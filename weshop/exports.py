@@ -0,0 +1,82 @@
+import csv
+import json
+from datetime import datetime, time
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+# Lines pulled from the database iterator per hop into the sync thread when served over ASGI
+ASYNC_CHUNK_LINES = 2000
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row.get(column) for column in columns])
+
+
+def _ndjson_lines(rows, columns):
+    for row in rows:
+        yield json.dumps({column: row.get(column) for column in columns}, default=str) + '\n'
+
+
+async def _async_chunks(lines, chunk_lines):
+    """
+    Serve a sync line generator to an ASGI server one chunk at a time.
+    Each chunk is pulled in the request's sync thread, which owns the database cursor.
+    """
+    next_chunk = sync_to_async(lambda: ''.join(islice(lines, chunk_lines)), thread_sensitive=True)
+    try:
+        while True:
+            chunk = await next_chunk()
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(lines.close, thread_sensitive=True)()
+
+
+def parse_time_bound(value, end_of_day=False):
+    """Parse a since/until filter given as a date or datetime; raises ValueError"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        parsed = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def stream_export(rows, columns, export_format, filename, request=None):
+    """
+    Stream an iterable of dict rows as CSV or NDJSON without materializing it.
+    Pass a queryset's .values(...).iterator(chunk_size=...) so the database side streams too.
+    Pass the request: under ASGI the body is then an async iterator, because Django would
+    collect a sync one into a list before sending the first byte.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unsupported export format: {export_format}')
+    lines = _csv_lines(rows, columns) if export_format == 'csv' else _ndjson_lines(rows, columns)
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        lines = _async_chunks(lines, ASYNC_CHUNK_LINES)
+    response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
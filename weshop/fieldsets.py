@@ -0,0 +1,90 @@
+"""
+Sparse fieldsets: ``?fields=a,b`` or ``?exclude=c`` on GET requests.
+
+The serializer drops the other fields, and the view trims its queryset to the columns,
+joins and prefetches the remaining fields actually read, so a smaller payload is also a
+cheaper query.
+"""
+from django.db.models import Prefetch
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.serializers import ListSerializer
+
+
+def _param_list(request, name):
+    return [part.strip() for value in request.query_params.getlist(name) for part in value.split(',') if part.strip()]
+
+
+def requested_fields(request, available):
+    """Field names to render for this request, in serializer order"""
+    if request is None or request.method != 'GET':
+        return list(available)
+    include = _param_list(request, 'fields')
+    exclude = _param_list(request, 'exclude')
+    unknown = [name for name in include + exclude if name not in available]
+    if unknown:
+        raise ValidationError({'fields': f'Unknown field(s): {", ".join(unknown)}'})
+    return [name for name in available if (not include or name in include) and name not in exclude]
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    ModelSerializer mixin honouring ?fields=/?exclude= for the top-level serializer.
+
+    sparse_field_sources maps declared fields to the model paths they read; fields not
+    listed read the model field of the same name. Paths through many-valued relations keep
+    the matching prefetch_related lookups, other relation paths become select_related joins.
+    """
+    sparse_field_sources = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent.parent if isinstance(self.parent, ListSerializer) else self.parent
+        if parent is not None:
+            return fields
+        keep = requested_fields(self.context.get('request'), list(fields))
+        return {name: fields[name] for name in keep}
+
+    @classmethod
+    def trim_queryset(cls, queryset, request, keep=()):
+        """keep lists model fields to load whatever is rendered"""
+        available = list(cls.Meta.fields)
+        model = queryset.model
+        only, joins, prefetch_roots = set(keep), set(), set()
+        for name in requested_fields(request, available):
+            for path in cls.sparse_field_sources.get(name, [name]):
+                parts = path.split('__')
+                field = model._meta.get_field(parts[0])
+                if field.many_to_many or field.one_to_many:
+                    prefetch_roots.add(parts[0])
+                    continue
+                if len(parts) > 1:
+                    joins.add('__'.join(parts[:-1]))
+                only.add(path)
+
+        lookups = [
+            lookup for lookup in queryset._prefetch_related_lookups
+            if (lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup).split('__')[0] in prefetch_roots
+        ]
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if joins:
+            queryset = queryset.select_related(*joins)
+        if lookups:
+            queryset = queryset.prefetch_related(*lookups)
+        return queryset.only(*only) if only else queryset
+
+
+class SparseFieldsetViewMixin:
+    """Generic view mixin: trims list/detail querysets to the fields the serializer will render"""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if self.request.method != 'GET' or not hasattr(serializer_class, 'trim_queryset'):
+            return queryset
+        keep = ()
+        if isinstance(self.paginator, CursorPagination):
+            # The cursor is built from the last row's ordering fields
+            ordering = self.paginator.ordering
+            keep = [field.lstrip('-') for field in ([ordering] if isinstance(ordering, str) else ordering)]
+        return serializer_class.trim_queryset(queryset, self.request, keep=keep)
@@ -49,6 +49,7 @@ INSTALLED_APPS = [
     'chat',
     'channels',
     'comments',
+    'outbox',
 ]
 
 MIDDLEWARE = [
@@ -201,6 +202,38 @@ CORS_ALLOWED_HEADERS = [
 ]
 
 
+# Email outbox (delivered by `manage.py send_queued_mail`)
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+EMAIL_OUTBOX_BACKOFF_SECONDS = config('EMAIL_OUTBOX_BACKOFF_SECONDS', default=30, cast=int)
+
+# Cache (anonymous catalog responses); local memory by default, e.g.
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache CACHE_LOCATION=/var/tmp/weshop_cache
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='weshop'),
+    },
+    # Flash-sale stock counters and claim log: must never evict and support atomic incr/decr. In production
+    # they must be shared by every process and persistent, e.g. FLASH_SALE_CACHE_BACKEND=
+    # django.core.cache.backends.redis.RedisCache FLASH_SALE_CACHE_LOCATION=redis://127.0.0.1:6379/1.
+    # Local memory only serves a single process (check warning orders.W001)
+    'flash_sale': {
+        'BACKEND': config('FLASH_SALE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('FLASH_SALE_CACHE_LOCATION', default='weshop-flash-sale'),
+        'OPTIONS': {'MAX_ENTRIES': 10_000_000},
+    },
+}
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=60, cast=int)
+
+# Stock holds for pending orders (released by `manage.py release_expired_reservations`)
+STOCK_RESERVATION_TTL_MINUTES = config('STOCK_RESERVATION_TTL_MINUTES', default=30, cast=int)
+
+# Flash sales: claims are written to the database in batches by `manage.py flush_flash_sales --loop`
+# (by a thread in the web process when the flash_sale cache is local memory)
+FLASH_SALE_FLUSH_INTERVAL = config('FLASH_SALE_FLUSH_INTERVAL', default=1.0, cast=float)
+FLASH_SALE_FLUSH_BATCH = config('FLASH_SALE_FLUSH_BATCH', default=500, cast=int)
+
 # Custom user model
 AUTH_USER_MODEL = 'users.User'
 